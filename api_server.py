@@ -0,0 +1,402 @@
+"""Headless HTTP API (ASGI) for the repair flow
+
+Run:
+    python api_server.py                      # API_HOST / API_PORT / API_WORKERS
+    uvicorn api_server:app --workers 4        # or any ASGI server
+
+Endpoints:
+    POST /sessions                   create a session
+    GET  /sessions/{id}              session state (get_state_json)
+    POST /sessions/{id}/turns        {"input": "..."} -> stage response
+    POST /sessions/{id}/turns/stream {"input": "..."} -> Server-Sent Events
+    WS   /sessions/{id}/ws           send {"input": "..."}, receive events
+    GET  /devices/search?q=...       find_device + closest suggestions
+    GET  /devices?page=&page_size=&search=   paged catalog
+    POST /manuals/search             {"device_model", "symptoms_summary", "top_k"}
+    GET  /metrics                    span latency histograms (Prometheus text)
+    GET  /metrics/otlp               the same as OTLP/JSON
+    GET  /traces                     recent turn traces as OTLP/JSON
+    GET  /health
+
+With more than one worker, sessions must live in a shared store: set
+SESSION_STORE_PATH to a SQLite file (otherwise each worker keeps its own
+in-memory LRU store). Each worker also keeps the session objects it stepped
+last (API_LIVE_SESSIONS), so per-session engine state that is not persisted
+- memoized RAG candidates, the background RAG prefetch - survives between
+turns while the stored version is still the one this worker saved.
+
+Streaming endpoints emit events as the turn runs: "chunk" (partial agent
+text), then "stage" / "question" / "attempt" / "complete" (see
+RepairEngine.stage_events) and finally "done" with the full response, or
+"error". Idle WebSocket connections cost one coroutine each; a turn holds a
+threadpool thread only while the engine runs.
+
+With TRACING_ENABLED=true, turn responses carry debug.trace (the span tree)
+and the metrics/traces endpoints report this worker process.
+"""
+import asyncio
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route, WebSocketRoute
+from starlette.websockets import WebSocket, WebSocketDisconnect
+from repair_engine import RepairEngine, RepairSession
+from session_store import InMemorySessionStore, SessionStore, SQLiteSessionStore, StaleSessionError
+from tracing import Tracer
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
+
+# Events buffered per streaming turn before the engine waits for the client
+STREAM_BUFFER_EVENTS = int(os.getenv("API_STREAM_BUFFER_EVENTS", "64"))
+
+
+def create_session_store() -> SessionStore:
+    """SQLite store when SESSION_STORE_PATH is set (shared by workers), else in-memory"""
+    path = os.getenv("SESSION_STORE_PATH")
+    if path:
+        return SQLiteSessionStore(path)
+    return InMemorySessionStore(max_sessions=int(os.getenv("SESSION_STORE_MAX_SESSIONS", "10000")))
+
+
+class LiveSessions:
+    """
+    Per-worker LRU of the session objects this worker stepped last, keyed by
+    session id and version. A stored session holds only persisted fields;
+    the live object also carries the engine's transient state, so it is
+    used instead of the stored copy while the versions match.
+
+    A turn checks its session out, so concurrent turns on one session step
+    separate copies and the store's version check still rejects one of them.
+    """
+
+    def __init__(self, engine: RepairEngine, max_sessions: int = 1000):
+        self.engine = engine
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, RepairSession]" = OrderedDict()
+
+    def checkout(self, store: SessionStore, session_id: str) -> Optional[RepairSession]:
+        """The session to step: the live object if still current, else the stored one"""
+        with self._lock:
+            live = self._sessions.pop(session_id, None)
+        stored = store.load(session_id)
+        if live is None:
+            return stored
+        if stored is not None and stored.version == live.version:
+            return live
+        # Changed by another worker (or deleted): drop the stale transient state
+        self.engine.invalidate_rag_candidates(live)
+        return stored
+
+    def checkin(self, session: RepairSession):
+        """Keep a session after a successful save (finished sessions are not kept)"""
+        if session.session_complete:
+            return
+        with self._lock:
+            self._sessions[session.session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                self.engine.invalidate_rag_candidates(evicted)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    # One engine (catalog, RAG client, agents) per worker process
+    if not hasattr(app.state, "engine"):
+        app.state.engine = RepairEngine()
+    if not hasattr(app.state, "store"):
+        app.state.store = create_session_store()
+    if not hasattr(app.state, "live_sessions"):
+        app.state.live_sessions = LiveSessions(
+            app.state.engine,
+            max_sessions=int(os.getenv("API_LIVE_SESSIONS", "1000"))
+        )
+    yield
+
+
+def _error(status_code: int, message: str) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status_code)
+
+
+async def _json_body(request: Request) -> Optional[dict]:
+    try:
+        body = await request.json()
+    except ValueError:
+        return None
+    return body if isinstance(body, dict) else None
+
+
+def _int_param(params, name: str, default: int, minimum: int = 1) -> int:
+    """Integer query/body parameter; ValueError (-> 400) if malformed or below minimum"""
+    value = params.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"{name} must be an integer")
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer") from None
+    if number < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    return number
+
+
+async def create_session(request: Request) -> Response:
+    engine = request.app.state.engine
+    session = engine.new_session()
+    await run_in_threadpool(request.app.state.store.save, session)
+    return JSONResponse({
+        "session_id": session.session_id,
+        "stage": session.current_stage,
+        "version": session.version
+    }, status_code=201)
+
+
+async def get_session(request: Request) -> Response:
+    session = await run_in_threadpool(request.app.state.store.load, request.path_params["session_id"])
+    if session is None:
+        return _error(404, "Session not found")
+    return Response(request.app.state.engine.get_state_json(session), media_type="application/json")
+
+
+def _run_turn(app: Starlette, session_id: str, user_input: str):
+    """Load, step and save one session (blocking - runs in the threadpool)"""
+    live_sessions = app.state.live_sessions
+    session = live_sessions.checkout(app.state.store, session_id)
+    if session is None:
+        return None
+    # Saved before the turn's side effects (journal, step outcomes) are recorded
+    response = app.state.engine.step(session, user_input, persist=app.state.store.save)
+    live_sessions.checkin(session)
+    return {**response, "session_id": session.session_id, "version": session.version}
+
+
+async def post_turn(request: Request) -> Response:
+    body = await _json_body(request)
+    if body is None or not isinstance(body.get("input"), str):
+        return _error(400, 'Body must be JSON: {"input": "<text>"}')
+
+    try:
+        result = await run_in_threadpool(
+            _run_turn,
+            request.app,
+            request.path_params["session_id"],
+            body["input"]
+        )
+    except StaleSessionError as e:
+        # Another request advanced this session concurrently
+        return _error(409, str(e))
+
+    if result is None:
+        return _error(404, "Session not found")
+    return JSONResponse(result)
+
+
+async def stream_turn(app: Starlette, session_id: str, user_input: str) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    Run one turn in the threadpool and yield (event, data) pairs as they
+    happen. The queue is bounded: when the client reads slower than the
+    engine produces, the engine thread waits (per-connection backpressure).
+    Closing the generator early (client gone) lets the turn finish unobserved.
+    """
+    engine, store, live_sessions = app.state.engine, app.state.store, app.state.live_sessions
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue(maxsize=STREAM_BUFFER_EVENTS)
+    done = object()
+    abandoned = False
+
+    def emit(item):
+        if not abandoned:
+            asyncio.run_coroutine_threadsafe(events.put(item), loop).result()
+
+    def run():
+        try:
+            session = live_sessions.checkout(store, session_id)
+            if session is None:
+                emit(("error", {"status": 404, "error": "Session not found"}))
+                return
+            stage_before = session.current_stage_index
+            response = engine.step(
+                session,
+                user_input,
+                chunk_sink=lambda text: emit(("chunk", {"text": text})),
+                persist=store.save
+            )
+            live_sessions.checkin(session)
+            for event in engine.stage_events(session, stage_before, response):
+                emit(event)
+            emit(("done", {**response, "session_id": session.session_id, "version": session.version}))
+        except StaleSessionError as e:
+            emit(("error", {"status": 409, "error": str(e)}))
+        except Exception as e:
+            emit(("error", {"status": 500, "error": str(e)}))
+        finally:
+            emit(done)
+
+    turn = asyncio.ensure_future(run_in_threadpool(run))
+    try:
+        while True:
+            item = await events.get()
+            if item is done:
+                break
+            yield item
+    finally:
+        abandoned = True
+        # Unblock a producer waiting on a full queue
+        while not events.empty():
+            events.get_nowait()
+        await asyncio.shield(turn)
+
+
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def post_turn_stream(request: Request) -> Response:
+    body = await _json_body(request)
+    if body is None or not isinstance(body.get("input"), str):
+        return _error(400, 'Body must be JSON: {"input": "<text>"}')
+
+    async def body_iterator():
+        async for event, data in stream_turn(request.app, request.path_params["session_id"], body["input"]):
+            yield _sse(event, data)
+
+    return StreamingResponse(
+        body_iterator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def session_socket(websocket: WebSocket):
+    """One connection per session; each received {"input"} runs a streamed turn"""
+    await websocket.accept()
+    session_id = websocket.path_params["session_id"]
+    try:
+        while True:
+            message = await websocket.receive_json()
+            if not isinstance(message, dict) or not isinstance(message.get("input"), str):
+                await websocket.send_json({"event": "error", "data": {"status": 400, "error": 'Send {"input": "<text>"}'}})
+                continue
+            async for event, data in stream_turn(websocket.app, session_id, message["input"]):
+                await websocket.send_json({"event": event, "data": data})
+    except WebSocketDisconnect:
+        pass
+
+
+async def search_devices(request: Request) -> Response:
+    query = request.query_params.get("q", "").strip()
+    if not query:
+        return _error(400, "Query parameter q is required")
+    device_manager = request.app.state.engine.device_manager
+    try:
+        limit = _int_param(request.query_params, "limit", device_manager.SUGGESTION_LIMIT)
+    except ValueError as e:
+        return _error(400, str(e))
+    return JSONResponse({
+        "match": device_manager.find_device(query),
+        "suggestions": device_manager.suggest_devices(query, limit=limit)
+    })
+
+
+async def browse_devices(request: Request) -> Response:
+    params = request.query_params
+    try:
+        page = _int_param(params, "page", 1)
+        page_size = min(_int_param(params, "page_size", 20), 200)
+    except ValueError as e:
+        return _error(400, str(e))
+    return JSONResponse(request.app.state.engine.device_manager.browse_devices(
+        page=page,
+        page_size=page_size,
+        search=params.get("search", "")
+    ))
+
+
+async def search_manuals(request: Request) -> Response:
+    body = await _json_body(request)
+    if body is None or not body.get("device_model"):
+        return _error(400, 'Body must be JSON with "device_model" and "symptoms_summary"')
+    try:
+        top_k = min(_int_param(body, "top_k", 3), 20)
+    except ValueError as e:
+        return _error(400, str(e))
+    results = await run_in_threadpool(
+        request.app.state.engine.rag.search_solutions,
+        device_model=body["device_model"],
+        symptoms_summary=body.get("symptoms_summary", ""),
+        top_k=top_k
+    )
+    return JSONResponse({"results": results})
+
+
+async def metrics(request: Request) -> Response:
+    return Response(Tracer.shared().prometheus_text(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+async def otlp_metrics(request: Request) -> Response:
+    return JSONResponse(Tracer.shared().otlp_metrics())
+
+
+async def traces(request: Request) -> Response:
+    return JSONResponse(Tracer.shared().otlp_traces())
+
+
+async def health(request: Request) -> Response:
+    return JSONResponse({"status": "ok"})
+
+
+routes = [
+    Route("/health", health, methods=["GET"]),
+    Route("/sessions", create_session, methods=["POST"]),
+    Route("/sessions/{session_id}", get_session, methods=["GET"]),
+    Route("/sessions/{session_id}/turns", post_turn, methods=["POST"]),
+    Route("/sessions/{session_id}/turns/stream", post_turn_stream, methods=["POST"]),
+    WebSocketRoute("/sessions/{session_id}/ws", session_socket),
+    Route("/devices/search", search_devices, methods=["GET"]),
+    Route("/devices", browse_devices, methods=["GET"]),
+    Route("/manuals/search", search_manuals, methods=["POST"]),
+    Route("/metrics", metrics, methods=["GET"]),
+    Route("/metrics/otlp", otlp_metrics, methods=["GET"]),
+    Route("/traces", traces, methods=["GET"]),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan)
+
+
+def _raise_open_file_limit():
+    """Each idle streaming connection holds a socket - allow the hard limit"""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def main():
+    import uvicorn
+    _raise_open_file_limit()
+    uvicorn.run(
+        "api_server:app",
+        host=os.getenv("API_HOST", "0.0.0.0"),
+        port=int(os.getenv("API_PORT", "8000")),
+        workers=int(os.getenv("API_WORKERS", "1")),
+        # zlib state is ~45 KB per connection; events are small JSON
+        ws_per_message_deflate=os.getenv("API_WS_DEFLATE", "false").lower() == "true"
+    )
+
+
+if __name__ == "__main__":
+    main()
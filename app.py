@@ -2,6 +2,7 @@
 import streamlit as st
 import json
 from flow_manager import RepairFlowManager
+from repair_engine import RepairEngine
 import os
 from dotenv import load_dotenv
 
@@ -77,10 +78,85 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize session state
-if "flow_manager" not in st.session_state:
-    st.session_state.flow_manager = RepairFlowManager()
-    st.session_state.messages = []
+# Optional crash-recovery journal (sessions survive container restarts)
+JOURNAL_PATH = os.getenv("SESSION_JOURNAL_PATH")
+
+# Chat messages rendered on each rerun; older ones sit behind a toggle
+CHAT_WINDOW = int(os.getenv("CHAT_WINDOW_MESSAGES", "20"))
+
+
+@st.cache_resource(show_spinner=False)
+def get_engine() -> RepairEngine:
+    """Device catalog, RAG client and agent factory, shared by all browser sessions"""
+    journal = None
+    if JOURNAL_PATH:
+        from session_journal import SessionJournal
+        journal = SessionJournal.shared(JOURNAL_PATH)
+    return RepairEngine(journal=journal)
+
+
+engine = get_engine()
+
+
+def new_session():
+    """Start an empty repair session (its id goes into the URL when journaling)"""
+    session = engine.new_session()
+    # Markdown of the previous session's messages is no longer shown
+    st.session_state.rendered_messages = {}
+    if JOURNAL_PATH:
+        st.query_params["session"] = session.session_id
+    return session
+
+
+def recover_session(session_id: str):
+    """Rebuild a journaled session and its chat messages after a restart"""
+    session = engine.journal.replay(engine, session_ids=[session_id]).get(session_id)
+    if session is None:
+        return None, []
+    return session, engine.render_transcript(session)
+
+
+def add_message(role: str, content: str):
+    """Append a chat message with a stable id (key of the rendered-markdown cache)"""
+    st.session_state.message_seq = st.session_state.get("message_seq", 0) + 1
+    st.session_state.messages.append({
+        "id": st.session_state.message_seq,
+        "role": role,
+        "content": content
+    })
+
+
+def message_markdown(message: dict) -> str:
+    """Markdown for a message, prepared once per message id"""
+    rendered = st.session_state.setdefault("rendered_messages", {})
+    if message["id"] not in rendered:
+        # Trailing spaces would otherwise become hard line breaks; indentation
+        # (nested lists, code in agent responses) is kept
+        rendered[message["id"]] = "\n".join(line.rstrip() for line in message["content"].splitlines())
+    return rendered[message["id"]]
+
+
+def render_message(message: dict):
+    avatar = "🤖" if message["role"] == "assistant" else "👤"
+    with st.chat_message(message["role"], avatar=avatar):
+        st.markdown(message_markdown(message))
+
+
+# Per-browser state holds only the lightweight RepairSession and chat messages
+if "repair_session" not in st.session_state:
+    recovered = None
+    if JOURNAL_PATH and st.query_params.get("session"):
+        recovered, messages = recover_session(st.query_params["session"])
+    if recovered is not None:
+        st.session_state.repair_session = recovered
+        st.session_state.messages = []
+        for message in messages:
+            add_message(message["role"], message["content"])
+    else:
+        st.session_state.repair_session = new_session()
+        st.session_state.messages = []
+
+flow = RepairFlowManager(engine=engine, session=st.session_state.repair_session)
 
 # Page title and header
 col1, col2 = st.columns([3, 1])
@@ -90,82 +166,42 @@ with col1:
 
 with col2:
     st.markdown("### Status")
-    if st.session_state.flow_manager.is_complete():
-        st.success("✅ Complete")
-    else:
-        st.info("🔄 In Progress")
+    # Filled in at the end of the run, after this turn's input is processed
+    status_area = st.empty()
 
 # Show warnings for missing API keys
-flow = st.session_state.flow_manager
 if not flow.llm_available:
     st.warning("⚠️ **OpenAI API key not configured** - AI features are limited. Add OPENAI_API_KEY to .env file to enable full functionality.")
 
-if not flow.rag.voyage_client:
+if not flow.rag.embeddings_configured:
     st.info("ℹ️ **VoyageAI embeddings disabled** - Using alternative search method. Optimal performance requires VOYAGE_API_KEY in .env.")
 
 # Display progress
 st.markdown("### Repair Progress")
 
-col1, col2, col3 = st.columns(3)
-
-with col1:
-    if flow.current_stage == "device_discovery":
-        st.markdown('<span class="stage-badge stage-active">1. Device Discovery</span>', unsafe_allow_html=True)
-    elif flow.current_stage_index > 0:
-        st.markdown('<span class="stage-badge stage-complete">1. Device Discovery ✓</span>', unsafe_allow_html=True)
-    else:
-        st.markdown('<span class="stage-badge stage-pending">1. Device Discovery</span>', unsafe_allow_html=True)
-
-with col2:
-    if flow.current_stage == "symptom_discovery":
-        question_num = len(flow.symptoms) + 1
-        st.markdown(f'<span class="stage-badge stage-active">2. Symptoms ({question_num}/7)</span>', unsafe_allow_html=True)
-    elif flow.current_stage_index > 1:
-        st.markdown('<span class="stage-badge stage-complete">2. Symptoms (7/7) ✓</span>', unsafe_allow_html=True)
-    else:
-        st.markdown('<span class="stage-badge stage-pending">2. Symptoms</span>', unsafe_allow_html=True)
-
-with col3:
-    if flow.current_stage == "problem_solver":
-        attempt_num = len(flow.repair_attempts) + 1
-        st.markdown(f'<span class="stage-badge stage-active">3. Repair ({attempt_num}/5)</span>', unsafe_allow_html=True)
-    elif flow.current_stage_index > 2:
-        st.markdown('<span class="stage-badge stage-complete">3. Repair ✓</span>', unsafe_allow_html=True)
-    else:
-        st.markdown('<span class="stage-badge stage-pending">3. Repair</span>', unsafe_allow_html=True)
+progress_area = st.container()
 
 st.divider()
 
 # Device info display
-if flow.device_info and flow.device_info.get("is_known"):
-    st.markdown(f"**📱 Device:** {flow.device_info['device_info']['full_name']}")
+device_area = st.empty()
 
-# Chat messages
+# Chat messages: the last CHAT_WINDOW are shown, earlier ones on request
 st.markdown("### Conversation")
 
-for i, message in enumerate(st.session_state.messages):
-    if message["role"] == "assistant":
-        with st.chat_message("assistant", avatar="🤖"):
-            st.write(message["content"])
-    else:
-        with st.chat_message("user", avatar="👤"):
-            st.write(message["content"])
+messages = st.session_state.messages
+hidden = max(0, len(messages) - CHAT_WINDOW)
+if hidden and st.toggle(f"Show {hidden} earlier messages", key="show_earlier_messages"):
+    for message in messages[:hidden]:
+        render_message(message)
+for message in messages[hidden:]:
+    render_message(message)
 
 # Input section
 st.divider()
 
 # Debug sidebar
-with st.sidebar:
-    st.markdown("### 🔍 Debug Info")
-    st.write(f"**Current Stage:** {flow.current_stage}")
-    st.write(f"**Stage Index:** {flow.current_stage_index}")
-    if flow.current_stage == "symptom_discovery":
-        st.write(f"**Symptom Questions:** {len(flow.symptoms)}/7")
-    elif flow.current_stage == "problem_solver":
-        st.write(f"**Repair Attempts:** {len(flow.repair_attempts)}/5")
-    st.divider()
-    st.write(f"**Device Known:** {flow.device_info.get('is_known') if flow.device_info else 'N/A'}")
-    st.write(f"**Session Complete:** {flow.session_complete}")
+debug_area = st.sidebar.container()
 
 if not flow.is_complete():
     user_input = st.chat_input(
@@ -175,14 +211,16 @@ if not flow.is_complete():
     
     if user_input:
         # Add user message to chat
-        st.session_state.messages.append({
-            "role": "user",
-            "content": user_input
-        })
+        add_message("user", user_input)
         
-        # Process with flow manager
+        with st.chat_message("user", avatar="👤"):
+            st.write(user_input)
+        
+        # Process with flow manager, streaming the agent text as it arrives
         try:
-            response = flow.run_next_stage(user_input)
+            with st.chat_message("assistant", avatar="🤖"):
+                st.write_stream(flow.stream_next_stage(user_input))
+            response = flow.last_response
             
             # Extract agent response
             if "error" in response:
@@ -191,10 +229,7 @@ if not flow.is_complete():
                 agent_msg = response.get("agent_response", "")
             
             # Add agent message to chat
-            st.session_state.messages.append({
-                "role": "assistant",
-                "content": agent_msg
-            })
+            add_message("assistant", agent_msg)
             
             # Handle completion
             if response.get("is_complete"):
@@ -213,13 +248,14 @@ if not flow.is_complete():
                     </div>
                     """, unsafe_allow_html=True)
             
-            st.rerun()
+            # No st.rerun(): the status, progress and debug areas above are
+            # filled in below with the updated state
         
         except Exception as e:
             st.error(f"Error processing request: {str(e)}")
             st.session_state.messages.pop()
 
-else:
+if flow.is_complete():
     # Session complete - show final output
     st.success("✅ SERIC - Repair Session Complete!")
     
@@ -285,10 +321,74 @@ else:
     
     # Reset button
     if st.button("🔄 Start New Session", key="reset_button"):
-        st.session_state.flow_manager = RepairFlowManager()
+        engine.profiler.force(flow.session.session_id, False)
+        st.session_state.repair_session = new_session()
         st.session_state.messages = []
         st.rerun()
 
+# Fill the areas reserved above with the state after this turn
+with status_area:
+    if flow.is_complete():
+        st.success("✅ Complete")
+    else:
+        st.info("🔄 In Progress")
+
+with progress_area:
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        if flow.current_stage == "device_discovery":
+            st.markdown('<span class="stage-badge stage-active">1. Device Discovery</span>', unsafe_allow_html=True)
+        elif flow.current_stage_index > 0:
+            st.markdown('<span class="stage-badge stage-complete">1. Device Discovery ✓</span>', unsafe_allow_html=True)
+        else:
+            st.markdown('<span class="stage-badge stage-pending">1. Device Discovery</span>', unsafe_allow_html=True)
+
+    with col2:
+        if flow.current_stage == "symptom_discovery":
+            question_num = len(flow.symptoms) + 1
+            st.markdown(f'<span class="stage-badge stage-active">2. Symptoms ({question_num}/7)</span>', unsafe_allow_html=True)
+        elif flow.current_stage_index > 1:
+            st.markdown('<span class="stage-badge stage-complete">2. Symptoms (7/7) ✓</span>', unsafe_allow_html=True)
+        else:
+            st.markdown('<span class="stage-badge stage-pending">2. Symptoms</span>', unsafe_allow_html=True)
+
+    with col3:
+        if flow.current_stage == "problem_solver":
+            attempt_num = len(flow.repair_attempts) + 1
+            st.markdown(f'<span class="stage-badge stage-active">3. Repair ({attempt_num}/5)</span>', unsafe_allow_html=True)
+        elif flow.current_stage_index > 2:
+            st.markdown('<span class="stage-badge stage-complete">3. Repair ✓</span>', unsafe_allow_html=True)
+        else:
+            st.markdown('<span class="stage-badge stage-pending">3. Repair</span>', unsafe_allow_html=True)
+
+if flow.device_info and flow.device_info.get("is_known"):
+    device_area.markdown(f"**📱 Device:** {flow.device_info['device_info']['full_name']}")
+
+with debug_area:
+    st.markdown("### 🔍 Debug Info")
+    st.write(f"**Current Stage:** {flow.current_stage}")
+    st.write(f"**Stage Index:** {flow.current_stage_index}")
+    if flow.current_stage == "symptom_discovery":
+        st.write(f"**Symptom Questions:** {len(flow.symptoms)}/7")
+    elif flow.current_stage == "problem_solver":
+        st.write(f"**Repair Attempts:** {len(flow.repair_attempts)}/5")
+    st.divider()
+    st.write(f"**Device Known:** {flow.device_info.get('is_known') if flow.device_info else 'N/A'}")
+    st.write(f"**Session Complete:** {flow.session_complete}")
+    # cProfile + tracemalloc reports for every turn of this session
+    profiler = flow.engine.profiler
+    profiling = st.checkbox("🔬 Profile this session", key="profile_session")
+    profiler.force(flow.session.session_id, profiling and not flow.is_complete())
+    if profiler.is_sampled(flow.session.session_id):
+        st.caption(f"Profiling reports: `{profiler.session_dir(flow.session.session_id)}`")
+    # Span tree of the last turn (TRACING_ENABLED=true)
+    last_trace = (flow.last_response or {}).get("debug", {}).get("trace")
+    if last_trace:
+        from tracing import format_trace
+        with st.expander(f"Last turn: {last_trace['duration_ms']:.0f} ms"):
+            st.code(format_trace(last_trace), language=None)
+
 # Sidebar
 with st.sidebar:
     st.markdown("### 📖 Help & Information")
@@ -303,11 +403,29 @@ with st.sidebar:
         """)
     
     with st.expander("Supported Devices"):
-        from device_manager import DeviceManager
-        dm = DeviceManager()
-        devices = dm.get_device_list()
-        for device in devices:
+        # Paged catalog - only one page is rendered per rerun
+        # A new search starts at its first page
+        catalog_search = st.text_input(
+            "Search devices",
+            key="catalog_search",
+            on_change=lambda: st.session_state.pop("catalog_page", None)
+        )
+        catalog = flow.device_manager.browse_devices(
+            page=st.session_state.get("catalog_page", 1),
+            page_size=20,
+            search=catalog_search
+        )
+        for device in catalog["items"]:
             st.write(f"• {device}")
+        if catalog["pages"] > 1:
+            # browse_devices clamps to the last page; keep the widget value within max_value
+            st.session_state["catalog_page"] = catalog["page"]
+            st.number_input(
+                f"Page (of {catalog['pages']}, {catalog['total']} devices)",
+                min_value=1,
+                max_value=catalog["pages"],
+                key="catalog_page"
+            )
     
     with st.expander("Troubleshooting Tips"):
         st.markdown("""
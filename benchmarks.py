@@ -0,0 +1,1164 @@
+"""Performance benchmarks for Service Repair Bot"""
+import contextlib
+import io
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+
+def _count_open_sockets() -> int:
+    """Count socket file descriptors of this process (Linux only)"""
+    fd_dir = "/proc/self/fd"
+    if not os.path.isdir(fd_dir):
+        return -1
+    count = 0
+    for fd in os.listdir(fd_dir):
+        try:
+            if os.readlink(os.path.join(fd_dir, fd)).startswith("socket:"):
+                count += 1
+        except OSError:
+            continue
+    return count
+
+
+def bench_session_overhead(sessions: int = 50):
+    """Benchmark: per-session LLM client + agent construction, shared vs private"""
+    print("\n" + "="*60)
+    print(f"BENCHMARK: Per-Session Agent Overhead ({sessions} sessions)")
+    print("="*60)
+
+    from repair_agents import RepairAgents, SharedLLMRegistry
+
+    def build_agents(factory):
+        try:
+            factory.device_discovery_agent()
+            factory.symptom_discovery_agent()
+            factory.repair_guide_agent()
+            factory.escalation_agent()
+            return True
+        except Exception:
+            # Installed crewai may reject the LLM type - measure clients only
+            return False
+
+    # Pay the one-off library imports before timing
+    build_agents(RepairAgents(shared=False))
+
+    results = {}
+    for mode, shared in [("private", False), ("shared", True)]:
+        SharedLLMRegistry.reset()
+        factories = []
+        agents_built = True
+        sockets_before = _count_open_sockets()
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        for _ in range(sessions):
+            factory = RepairAgents(shared=shared)
+            factory.llm  # Clients are created on first use
+            agents_built = build_agents(factory) and agents_built
+            factories.append(factory)
+        elapsed = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        pools = set()
+        for factory in factories:
+            pools.add(id(factory.llm.root_client._client))
+            pools.add(id(factory.llm.root_async_client._client))
+
+        results[mode] = {
+            "ms_per_session": elapsed / sessions * 1000,
+            "kb_per_session": current / sessions / 1024,
+            "peak_kb": peak / 1024,
+            "llm_clients": len({id(factory.llm) for factory in factories}),
+            "http_pools": len(pools),
+            "open_sockets": _count_open_sockets() - sockets_before,
+            "agents_built": agents_built
+        }
+
+    keepalive = SharedLLMRegistry.MAX_KEEPALIVE_CONNECTIONS
+    for mode, r in results.items():
+        print(f"\n[{mode}]")
+        print(f"  Construction time:   {r['ms_per_session']:.3f} ms/session")
+        print(f"  Retained memory:     {r['kb_per_session']:.1f} KB/session (peak {r['peak_kb']:.0f} KB)")
+        print(f"  LLM clients:         {r['llm_clients']}")
+        print(f"  HTTP pools:          {r['http_pools']} (up to {r['http_pools'] * keepalive} idle keep-alive sockets)")
+        print(f"  Open sockets:        {r['open_sockets']} (connections open lazily on first request)")
+        if not r["agents_built"]:
+            print("  ⚠ Agent construction skipped - installed crewai rejected the LLM")
+
+    private, shared = results["private"], results["shared"]
+    if shared["ms_per_session"] > 0:
+        print(f"\nSpeedup: {private['ms_per_session'] / shared['ms_per_session']:.1f}x construction time")
+    print(f"Memory saved: {private['kb_per_session'] - shared['kb_per_session']:.1f} KB/session")
+
+    return results
+
+
+def bench_task_routing(local_iterations: int = 10000, llm_iterations: int = 5):
+    """Benchmark: stage 2 question via local fast path vs LLM round trip"""
+    print("\n" + "="*60)
+    print("BENCHMARK: Task Routing (local template vs LLM)")
+    print("="*60)
+
+    from repair_agents import TaskRouter
+
+    params = {
+        "question_number": 3,
+        "device_model": "SMS6EDI06E",
+        "previous_answers": {1: "Yesterday", 2: "No water entering"}
+    }
+
+    # LLM side: BENCH_LIVE_LLM=1 measures the real CrewAI path, BENCH_CASSETTE
+    # uses the LLM call latencies recorded in a cassette (cassette.py);
+    # otherwise it is only the configured BENCH_LLM_LATENCY_MS, not a measurement
+    live = os.getenv("BENCH_LIVE_LLM") == "1"
+    cassette_path = os.getenv("BENCH_CASSETTE")
+
+    router = TaskRouter(llm_executor=None)
+
+    start = time.perf_counter()
+    for _ in range(local_iterations):
+        router.run("symptom_question", **params)
+    local_us = (time.perf_counter() - start) / local_iterations * 1e6
+
+    if live:
+        source = f"measured live, {llm_iterations} calls"
+        start = time.perf_counter()
+        for _ in range(llm_iterations):
+            router.llm_executor("symptom_question", params)
+        llm_us = (time.perf_counter() - start) / llm_iterations * 1e6
+    elif cassette_path:
+        from cassette import Cassette
+        recorded = Cassette(cassette_path).recorded_latencies_ms(["llm.run", "llm.stream"])
+        if not recorded:
+            print(f"⚠ {cassette_path} has no recorded LLM calls - skipped")
+            return {"local_us": local_us}
+        source = f"median of {len(recorded)} recorded calls in {cassette_path}"
+        llm_us = statistics.median(recorded) * 1000
+    else:
+        source = "configured BENCH_LLM_LATENCY_MS, not measured"
+        llm_us = float(os.getenv("BENCH_LLM_LATENCY_MS", "400")) * 1000
+
+    print(f"\nLocal fast path:  {local_us:.2f} µs/turn ({local_iterations} turns)")
+    print(f"LLM path:         {llm_us / 1000:.1f} ms/turn ({source})")
+    print(f"Ratio: {llm_us / local_us:,.0f}x")
+
+    return {"local_us": local_us, "llm_us": llm_us, "llm_source": source}
+
+
+def bench_response_cache(sessions: int = 200):
+    """Benchmark: repeated repair-guide tasks through the response cache"""
+    print("\n" + "="*60)
+    print(f"BENCHMARK: Response Cache ({sessions} sessions)")
+    print("="*60)
+
+    import random
+    from repair_agents import TaskRouter
+    from response_cache import ResponseCache
+
+    latency = float(os.getenv("BENCH_LLM_LATENCY_MS", "400")) / 1000
+    llm_calls = []
+    embedding_calls = []
+
+    def simulated_llm(task_name, task_params):
+        llm_calls.append(task_name)
+        return f"Step {task_params['attempt_number']}: generated"
+
+    def bag_of_words_embedding(text):
+        embedding_calls.append(text)
+        vector = [0.0] * 256
+        for word in text.split():
+            vector[hash(word) % 256] += 1.0
+        return vector
+
+    # Bag-of-words vectors score paraphrases lower than real embeddings
+    cache = ResponseCache(embed_fn=bag_of_words_embedding, similarity_threshold=0.8)
+    router = TaskRouter(llm_executor=simulated_llm, cache=cache)
+
+    rng = random.Random(7)
+    devices = ["Prodigy Cuber", "Prodigy Flaker", "Modular Cuber"]
+    symptoms = ["• Symptoms: no ice production", "• Symptoms: water leaking", "• Symptoms: loud noise"]
+
+    start = time.perf_counter()
+    for _ in range(sessions):
+        device, summary = rng.choice(devices), rng.choice(symptoms)
+        # Some users phrase the same problem slightly differently
+        roll = rng.random()
+        if roll < 0.2:
+            summary = "  " + summary.upper()
+        elif roll < 0.4:
+            summary = summary + " today"
+        for attempt in range(1, 4):
+            router.run(
+                "repair_guide",
+                device_model=device,
+                symptoms_summary=summary,
+                attempt_number=attempt,
+                previous_steps=[]
+            )
+    elapsed = time.perf_counter() - start
+
+    turns = sessions * 3
+    metrics = cache.get_metrics()
+    stats = metrics["repair_guide"]
+    print(f"\nTurns: {turns}, LLM calls: {len(llm_calls)}, embedding calls: {len(embedding_calls)}")
+    print(f"Exact hits: {stats['exact_hits']}, semantic hits: {stats['semantic_hits']}, misses: {stats['misses']}")
+    print(f"Hit rate: {stats['hit_rate']:.1%}")
+    print(f"Cache overhead: {elapsed / turns * 1e6:.1f} µs/turn")
+    print(f"Estimated LLM time saved: {(turns - len(llm_calls)) * latency:.1f} s "
+          f"(at {latency * 1000:.0f} ms per call)")
+
+    return metrics
+
+
+class OfflineRAG:
+    """Stand-in for QdrantRAG that never touches the network"""
+
+    embeddings_configured = False
+
+    def warm_up(self):
+        pass
+
+    def search_solutions(self, device_model, symptoms_summary, top_k=3):
+        return []
+
+    def lookup_error_codes(self, device_model, error_codes, top_k=3):
+        return []
+
+    def get_embedding(self, text):
+        return None
+
+
+class SlowRAG(OfflineRAG):
+    """OfflineRAG with a fixed search latency (embedding + vector search round trip)"""
+
+    def __init__(self, latency_ms: float = 40):
+        self.latency = latency_ms / 1000
+        self.searches = 0
+
+    def search_solutions(self, device_model, symptoms_summary, top_k=3):
+        self.searches += 1
+        time.sleep(self.latency)
+        return [{
+            "manual_id": f"manual-{rank}",
+            "resolution": f"Resolution {rank}",
+            "steps": [f"Step {i}: candidate {rank} action {i}" for i in range(1, 3)],
+            "score": 1.0 - rank / 10
+        } for rank in range(top_k)]
+
+
+SESSION_SCRIPT = [
+    "Scotsman Prodigy Cuber",
+    "Yesterday morning", "No ice production", "Moved last week", "E:15",
+    "Right after a harvest cycle", "Restarted it", "Kitchen, normal water pressure",
+    "", "no", "no", "no", "no", "no"
+]
+
+
+def bench_engine_sessions(sessions: int = 1000, legacy_sessions: int = 20):
+    """Benchmark: sessions/sec and memory per session, shared engine vs per-session services"""
+    print("\n" + "="*60)
+    print(f"BENCHMARK: Shared Engine Sessions ({sessions} sessions)")
+    print("="*60)
+
+    from device_manager import DeviceManager
+    from flow_manager import RepairFlowManager
+    from repair_engine import RepairEngine
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = RepairEngine(device_manager=DeviceManager(), rag=OfflineRAG())
+
+    # Throughput: full 14-turn sessions on one engine
+    start = time.perf_counter()
+    for _ in range(sessions):
+        session = engine.new_session()
+        for user_input in SESSION_SCRIPT:
+            engine.step(session, user_input)
+    elapsed = time.perf_counter() - start
+
+    # Retained memory of completed sessions
+    tracemalloc.start()
+    kept = []
+    for _ in range(sessions):
+        session = engine.new_session()
+        for user_input in SESSION_SCRIPT:
+            engine.step(session, user_input)
+        kept.append(session)
+    session_bytes = tracemalloc.get_traced_memory()[0] / sessions
+    tracemalloc.stop()
+    del kept
+
+    # Legacy layout: every flow builds its own catalog, RAG and agents
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        legacy_start = time.perf_counter()
+        flows = [RepairFlowManager() for _ in range(legacy_sessions)]
+        legacy_construct = (time.perf_counter() - legacy_start) / legacy_sessions
+    legacy_bytes = tracemalloc.get_traced_memory()[0] / legacy_sessions
+    tracemalloc.stop()
+    del flows
+
+    print(f"\nShared engine:   {sessions / elapsed:,.0f} sessions/sec "
+          f"({elapsed / sessions / len(SESSION_SCRIPT) * 1e6:.0f} µs/turn)")
+    print(f"Memory/session:  {session_bytes / 1024:.1f} KB (completed session, shared engine)")
+    print(f"Legacy flow:     {legacy_bytes / 1024:.1f} KB and {legacy_construct * 1000:.2f} ms "
+          f"to construct (own catalog + lazy clients per session)")
+
+    return {
+        "sessions_per_sec": sessions / elapsed,
+        "session_kb": session_bytes / 1024,
+        "legacy_flow_kb": legacy_bytes / 1024
+    }
+
+
+def bench_rag_memoization(sessions: int = 10, latency_ms: float = 40):
+    """Benchmark: per-attempt latency with RAG candidates kept on the session"""
+    print("\n" + "="*60)
+    print(f"BENCHMARK: Problem Solver RAG Memoization ({sessions} sessions, {latency_ms:.0f} ms search)")
+    print("="*60)
+
+    from device_manager import DeviceManager
+    from repair_engine import RepairEngine
+
+    rag = SlowRAG(latency_ms)
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = RepairEngine(device_manager=DeviceManager(), rag=rag)
+    engine.rag_prefetch = False  # measured separately in bench_rag_prefetch
+
+    attempt_times = {}
+    for _ in range(sessions):
+        session = engine.new_session()
+        for user_input in SESSION_SCRIPT[:8]:
+            engine.step(session, user_input)
+        for attempt, user_input in enumerate(SESSION_SCRIPT[8:13], 1):
+            start = time.perf_counter()
+            engine.step(session, user_input)
+            attempt_times.setdefault(attempt, []).append(time.perf_counter() - start)
+
+    print()
+    for attempt, samples in attempt_times.items():
+        print(f"Attempt {attempt}: {statistics.mean(samples) * 1000:.2f} ms")
+    per_session = rag.searches / sessions
+    print(f"\nRAG searches per session: {per_session:.0f} (was {len(attempt_times)}, one per attempt)")
+
+    return {
+        "first_attempt_ms": statistics.mean(attempt_times[1]) * 1000,
+        "later_attempt_ms": statistics.mean(
+            [t for a, samples in attempt_times.items() if a > 1 for t in samples]
+        ) * 1000,
+        "searches_per_session": per_session
+    }
+
+
+def bench_rag_prefetch(sessions: int = 10, latency_ms: float = 40, think_ms: float = 60):
+    """Benchmark: first repair attempt latency with and without background RAG prefetch"""
+    print("\n" + "="*60)
+    print(f"BENCHMARK: RAG Prefetch ({latency_ms:.0f} ms search, {think_ms:.0f} ms user think time)")
+    print("="*60)
+
+    from device_manager import DeviceManager
+    from repair_engine import RepairEngine
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        device_manager = DeviceManager()
+
+    results = {}
+    for label, prefetch in (("search at stage 3", False), ("prefetch", True)):
+        rag = SlowRAG(latency_ms)
+        engine = RepairEngine(device_manager=device_manager, rag=rag)
+        engine.rag_prefetch = prefetch
+
+        samples = []
+        for _ in range(sessions):
+            session = engine.new_session()
+            for user_input in SESSION_SCRIPT[:8]:
+                engine.step(session, user_input)
+                time.sleep(think_ms / 1000)
+            start = time.perf_counter()
+            engine.step(session, SESSION_SCRIPT[8])
+            samples.append(time.perf_counter() - start)
+
+        results[label] = statistics.mean(samples) * 1000
+        print(f"\n[{label}] first attempt {results[label]:.2f} ms, "
+              f"{rag.searches / sessions:.0f} searches per session")
+
+    return results
+
+
+def bench_error_code_lookup(iterations: int = 10000):
+    """Benchmark: error-code extraction + direct index lookup (no embedding, no Qdrant call)"""
+    print("\n" + "="*60)
+    print(f"BENCHMARK: Error Code Lookup ({iterations:,} lookups)")
+    print("="*60)
+
+    from error_codes import extract_error_codes
+    from qdrant_rag import SAMPLE_MANUALS, QdrantRAG
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        rag = QdrantRAG()
+        rag.lookup_error_codes("", [])  # connect once (index load fails without a server)
+    for manual in SAMPLE_MANUALS:
+        rag.index_error_codes(manual, str(manual["id"]))
+
+    answers = ["Display flashes E:15 after filling", "No water comes in", "e-25", "error code E15"]
+    hits = 0
+    start = time.perf_counter()
+    for i in range(iterations):
+        codes = extract_error_codes([answers[i % len(answers)]])
+        if codes and rag.lookup_error_codes("SMS6EDI06E", codes):
+            hits += 1
+    elapsed = time.perf_counter() - start
+
+    print(f"\nIndex keys: {len(rag.error_code_index)}")
+    print(f"Extraction + lookup: {elapsed / iterations * 1e6:.1f} µs "
+          f"(hit rate {hits / iterations:.0%} on sample answers)")
+    print("Vector search path: 1 embedding call + 1 Qdrant query (tens to hundreds of ms)")
+
+    return {"lookup_us": elapsed / iterations * 1e6, "hit_rate": hits / iterations}
+
+
+def bench_step_learning(sessions: int = 50):
+    """Benchmark: attempts per session with outcome-learned step ordering"""
+    print("\n" + "="*60)
+    print(f"BENCHMARK: Outcome-Learned Step Ordering ({sessions} sessions)")
+    print("="*60)
+
+    from device_manager import DeviceManager
+    from repair_engine import RepairEngine
+    from step_outcomes import StepOutcomeTable
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        device_manager = DeviceManager()
+
+    # The fix for this problem is the 5th ranked candidate step
+    fixing_step = "Step 1: candidate 2 action 1"
+
+    results = {}
+    # max_keys=0 keeps no statistics, i.e. plain RAG rank order
+    for label, outcomes in (("RAG rank order", StepOutcomeTable(max_keys=0)), ("learned order", StepOutcomeTable())):
+        engine = RepairEngine(device_manager=device_manager, rag=SlowRAG(0), outcomes=outcomes)
+        engine.rag_prefetch = False
+
+        attempts = []
+        for _ in range(sessions):
+            session = engine.new_session()
+            for user_input in SESSION_SCRIPT[:8]:
+                engine.step(session, user_input)
+            response = engine.step(session, "")
+            while not session.session_complete:
+                response = engine.step(session, "yes" if response.get("repair_step") == fixing_step else "no")
+            attempts.append(len(session.repair_attempts))
+
+        results[label] = statistics.mean(attempts)
+        print(f"\n[{label}] {statistics.mean(attempts):.2f} attempts per session "
+              f"(first session {attempts[0]}, last {attempts[-1]})")
+
+    return results
+
+
+_CATALOG_BRANDS = ["Scotsman", "Hoshizaki", "Manitowoc", "Bosch", "Samsung", "LG", "Whirlpool", "Miele"]
+_CATALOG_TYPES = ["Cuber", "Flaker", "Dishwasher", "Washing Machine", "Refrigerator", "Microwave"]
+
+
+def _synthetic_catalog(size: int) -> dict:
+    """Device catalog of `size` rows shaped like devices.csv"""
+    devices = {}
+    for i in range(size):
+        brand, device_type = _CATALOG_BRANDS[i % len(_CATALOG_BRANDS)], _CATALOG_TYPES[i % len(_CATALOG_TYPES)]
+        model = f"{brand[:2].upper()}{i:06d}"
+        devices[model.lower()] = {
+            "brand": brand, "model": model, "type": device_type, "device_type": device_type,
+            "description": "", "manufacturer_code": "",
+            "full_name": f"{brand} {device_type} {model}"
+        }
+    return devices
+
+
+def bench_device_suggestions(catalog_size: int = 50000, lookups: int = 200):
+    """Benchmark: unknown-device response with top-N suggestions vs full catalog dump"""
+    print("\n" + "="*60)
+    print(f"BENCHMARK: Unknown Device Suggestions ({catalog_size:,} device catalog)")
+    print("="*60)
+
+    from device_manager import DeviceManager
+
+    devices = _synthetic_catalog(catalog_size)
+    brands, types = _CATALOG_BRANDS, _CATALOG_TYPES
+
+    start = time.perf_counter()
+    device_manager = DeviceManager(devices=devices)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    queries = [f"{brands[i % len(brands)]} {types[i % len(types)]} {i * 7919 % catalog_size:06d}x"
+               for i in range(lookups)]
+    start = time.perf_counter()
+    for query in queries:
+        suggestions = device_manager.suggest_devices(query)
+    suggest_ms = (time.perf_counter() - start) / lookups * 1000
+
+    dump_bytes = len("\n".join(f"• {d}" for d in device_manager.get_device_list()).encode("utf-8"))
+    suggest_bytes = len("\n".join(f"• {s['full_name']}" for s in suggestions).encode("utf-8"))
+
+    print(f"\nIndex build: {build_ms:.0f} ms")
+    print(f"Suggestions: {suggest_ms:.2f} ms per lookup, top result '{suggestions[0]['full_name']}'")
+    print(f"Response device list: {suggest_bytes:,} bytes (full catalog dump: {dump_bytes:,} bytes)")
+
+    return {"suggest_ms": suggest_ms, "suggest_bytes": suggest_bytes, "dump_bytes": dump_bytes}
+
+
+def _rss_mb(pid="self") -> float:
+    """Resident set size of a process (default: this one) in MB"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _pss_mb(pid) -> float:
+    """Proportional set size in MB: shared pages are split between the processes mapping them"""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return _rss_mb(pid)
+
+
+def _catalog_worker(mode: str, catalog_size: int, catalog_path: str):
+    """Worker process for bench_shared_catalog: load the catalog, serve lookups, wait"""
+    from device_manager import DeviceManager
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == "private":
+            device_manager = DeviceManager(devices=_synthetic_catalog(catalog_size))
+        else:
+            device_manager = DeviceManager(catalog_path=catalog_path)
+    load_ms = (time.perf_counter() - start) * 1000
+    # Exact, suggestion and full-index scans touch every page of the catalog
+    assert device_manager.find_device(f"sc{catalog_size - 8:06d}")["is_known"]
+    device_manager.suggest_devices("Scotsman Cuber 000123x")
+    sum(1 for _ in device_manager.device_index.items())
+    sum(1 for _ in device_manager.devices.values())
+    print(f"ready {load_ms:.1f}", flush=True)
+    sys.stdin.readline()
+
+
+def bench_shared_catalog(catalog_size: int = 50000, workers=(1, 4, 16)):
+    """
+    Memory of N worker processes each holding the device catalog: private
+    dicts per process vs one memory-mapped catalog file (DEVICE_CATALOG_PATH)
+    """
+    print("\n" + "="*60)
+    print(f"BENCHMARK: Shared Device Catalog ({catalog_size:,} devices)")
+    print("="*60)
+
+    import tempfile
+    from device_manager import DeviceManager
+
+    tmp_root = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    results = {}
+    with tempfile.TemporaryDirectory(dir=tmp_root) as tmp:
+        catalog_path = os.path.join(tmp, "devices.catalog")
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            DeviceManager(devices=_synthetic_catalog(catalog_size), catalog_path=catalog_path).catalog.close()
+        print(f"\nCatalog file: {os.path.getsize(catalog_path) / 1024 / 1024:.1f} MB, "
+              f"built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        print(f"\n{'workers':>7}  {'mode':<8} {'RSS total':>10} {'PSS total':>10} {'PSS/worker':>11} {'load':>9}")
+        for worker_count in workers:
+            for mode in ("private", "mmap"):
+                code = (f"import benchmarks; benchmarks._catalog_worker({mode!r}, {catalog_size}, {catalog_path!r})")
+                procs = [
+                    subprocess.Popen(
+                        [sys.executable, "-c", code],
+                        cwd=os.path.dirname(os.path.abspath(__file__)),
+                        stdin=subprocess.PIPE,
+                        stdout=subprocess.PIPE,
+                        text=True
+                    )
+                    for _ in range(worker_count)
+                ]
+                try:
+                    load_ms = []
+                    for proc in procs:
+                        status, _, value = proc.stdout.readline().partition(" ")
+                        if status != "ready":
+                            raise RuntimeError(f"catalog worker ({mode}) failed")
+                        load_ms.append(float(value))
+                    rss = sum(_rss_mb(proc.pid) for proc in procs)
+                    pss = sum(_pss_mb(proc.pid) for proc in procs)
+                finally:
+                    for proc in procs:
+                        proc.stdin.close()
+                        proc.wait()
+
+                load = statistics.median(load_ms)
+                results[(worker_count, mode)] = {"rss_mb": rss, "pss_mb": pss, "load_ms": load}
+                print(f"{worker_count:>7}  {mode:<8} {rss:>8.0f} MB {pss:>8.0f} MB {pss / worker_count:>8.1f} MB "
+                      f"{load:>6.0f} ms")
+
+    largest = max(workers)
+    print(f"\n✓ {largest} workers: {results[(largest, 'private')]['pss_mb']:.0f} MB -> "
+          f"{results[(largest, 'mmap')]['pss_mb']:.0f} MB (PSS; RSS counts shared pages in every process)")
+    return results
+
+
+def bench_app_sessions(sessions: int = 200):
+    """
+    Benchmark: Streamlit app rerun latency and process RSS with many browser
+    sessions open at once. AppTest swaps a process-global script context, so
+    the sessions are run one after another: latencies are sequential
+    (uncontended) numbers, RSS is with all sessions alive.
+    """
+    print("\n" + "="*60)
+    print(f"BENCHMARK: Streamlit App Sessions ({sessions} open browser sessions, sequential runs)")
+    print("="*60)
+
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        print("⚠ streamlit not installed - skipped")
+        return {}
+    import gc
+    from repair_engine import RepairEngine
+
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+    def timed_run(app):
+        start = time.perf_counter()
+        app.run()
+        return time.perf_counter() - start
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        AppTest.from_file(app_path, default_timeout=120).run()  # warm imports + shared services
+        rss_before = _rss_mb()
+
+        apps = [AppTest.from_file(app_path, default_timeout=120) for _ in range(sessions)]
+        first_runs = [timed_run(app) for app in apps]
+        rss_after = _rss_mb()
+        reruns = [timed_run(app) for app in apps]
+
+    # Every browser session is still open (apps); engines held by any of them are alive
+    gc.collect()
+    engines = sum(isinstance(obj, RepairEngine) for obj in gc.get_objects())
+
+    print(f"\nNew session:  p50 {_percentile(first_runs, 50) * 1000:.1f} ms")
+    print(f"Rerun:        p50 {_percentile(reruns, 50) * 1000:.1f} ms, p99 {_percentile(reruns, 99) * 1000:.1f} ms")
+    print(f"RSS:          {rss_before:.0f} MB -> {rss_after:.0f} MB "
+          f"({(rss_after - rss_before) * 1024 / sessions:.0f} KB per browser session)")
+    print(f"Live engines: {engines} (shared through st.cache_resource)")
+
+    return {
+        "rerun_p50_ms": _percentile(reruns, 50) * 1000,
+        "rss_mb": rss_after,
+        "kb_per_session": (rss_after - rss_before) * 1024 / sessions
+    }
+
+
+def bench_long_sessions(retries=(0, 50, 200), sessions: int = 50):
+    """Benchmark: retained memory and state size of long sessions (repeated device retries)"""
+    print("\n" + "="*60)
+    print(f"BENCHMARK: Long Session Memory ({sessions} sessions per length)")
+    print("="*60)
+
+    from device_manager import DeviceManager
+    from repair_engine import RepairEngine
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = RepairEngine(device_manager=DeviceManager(), rag=OfflineRAG())
+
+    results = {}
+    for retry_count in retries:
+        script = ["Unknown Gizmo 3000"] * retry_count + SESSION_SCRIPT
+
+        tracemalloc.start()
+        kept = []
+        for _ in range(sessions):
+            session = engine.new_session()
+            for user_input in script:
+                engine.step(session, user_input)
+            kept.append(session)
+        session_bytes = tracemalloc.get_traced_memory()[0] / sessions
+        tracemalloc.stop()
+
+        state_bytes = len(engine.get_state_json(kept[0]))
+        final_output = engine.get_final_output(kept[0])
+        results[len(script)] = {"session_kb": session_bytes / 1024, "state_kb": state_bytes / 1024}
+        print(f"\n[{len(script)} turns] {session_bytes / 1024:,.1f} KB retained, "
+              f"{state_bytes / 1024:,.1f} KB state JSON, "
+              f"{len(kept[0].conversation_history)} history entries, "
+              f"conversation_turns={final_output['conversation_turns']}")
+        del kept
+
+    return results
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def bench_session_store(sessions: int = 100000):
+    """Benchmark: save/load latency of session stores"""
+    print("\n" + "="*60)
+    print(f"BENCHMARK: Session Store Save/Load ({sessions:,} sessions)")
+    print("="*60)
+
+    import tempfile
+    from device_manager import DeviceManager
+    from repair_engine import RepairEngine
+    from session_store import InMemorySessionStore, SQLiteSessionStore, serialize_session
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = RepairEngine(device_manager=DeviceManager(), rag=OfflineRAG())
+    session = engine.new_session()
+    for user_input in SESSION_SCRIPT:
+        engine.step(session, user_input)
+    blob_size = len(serialize_session(session))
+    json_size = len(engine.get_state_json(session))
+    print(f"\nCompleted session: {blob_size:,} bytes binary vs {json_size:,} bytes state JSON")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = {
+            "in-memory LRU": InMemorySessionStore(max_sessions=sessions),
+            "SQLite": SQLiteSessionStore(os.path.join(tmp, "sessions.db"))
+        }
+        for name, store in stores.items():
+            save_times, load_times = [], []
+            for i in range(sessions):
+                session.session_id = f"session-{i}"
+                session.version = 0
+                start = time.perf_counter()
+                store.save(session)
+                save_times.append(time.perf_counter() - start)
+            for i in range(sessions):
+                start = time.perf_counter()
+                store.load(f"session-{i}")
+                load_times.append(time.perf_counter() - start)
+
+            results[name] = {
+                "save_p50_us": _percentile(save_times, 50) * 1e6,
+                "save_p99_us": _percentile(save_times, 99) * 1e6,
+                "load_p50_us": _percentile(load_times, 50) * 1e6,
+                "load_p99_us": _percentile(load_times, 99) * 1e6,
+                "saves_per_sec": sessions / sum(save_times),
+                "loads_per_sec": sessions / sum(load_times)
+            }
+            r = results[name]
+            print(f"\n[{name}]")
+            print(f"  save: p50 {r['save_p50_us']:.0f} µs, p99 {r['save_p99_us']:.0f} µs ({r['saves_per_sec']:,.0f}/s)")
+            print(f"  load: p50 {r['load_p50_us']:.0f} µs, p99 {r['load_p99_us']:.0f} µs ({r['loads_per_sec']:,.0f}/s)")
+            if isinstance(store, SQLiteSessionStore):
+                store.close()
+
+    return results
+
+
+def bench_session_journal(sessions: int = 400, threads: int = 16):
+    """Benchmark: journaled turns/sec with group commit vs fsync per turn, and replay time"""
+    print("\n" + "="*60)
+    print(f"BENCHMARK: Session Journal ({sessions} sessions, {threads} threads)")
+    print("="*60)
+
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    from device_manager import DeviceManager
+    from repair_engine import RepairEngine
+    from session_journal import SessionJournal
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        device_manager = DeviceManager()
+    rag = OfflineRAG()
+
+    def run_session(engine):
+        session = engine.new_session()
+        for user_input in SESSION_SCRIPT:
+            engine.step(session, user_input)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, group_commit in (("fsync per turn", False), ("group commit", True)):
+            path = os.path.join(tmp, f"{label.replace(' ', '_')}.journal")
+            journal = SessionJournal(path, group_commit=group_commit)
+            engine = RepairEngine(device_manager=device_manager, rag=rag, journal=journal)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                list(pool.map(lambda _: run_session(engine), range(sessions)))
+            elapsed = time.perf_counter() - start
+            journal.close()
+
+            turns = sessions * len(SESSION_SCRIPT)
+            results[label] = turns / elapsed
+            print(f"\n[{label}] {turns / elapsed:,.0f} turns/sec "
+                  f"({os.path.getsize(path) / sessions / 1024:.1f} KB journal per session)")
+
+        # Replay cost with and without snapshots
+        for label, snapshot_every in (("no snapshots", 10**9), ("snapshot every 8 turns", 8)):
+            path = os.path.join(tmp, f"replay_{snapshot_every}.journal")
+            journal = SessionJournal(path, snapshot_every=snapshot_every)
+            engine = RepairEngine(device_manager=device_manager, rag=rag, journal=journal)
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                list(pool.map(lambda _: run_session(engine), range(sessions)))
+            journal.close()
+
+            replay_engine = RepairEngine(device_manager=device_manager, rag=rag)
+            start = time.perf_counter()
+            recovered = SessionJournal(path).replay(replay_engine)
+            elapsed = time.perf_counter() - start
+            print(f"[replay, {label}] {len(recovered)} sessions in {elapsed * 1000:.0f} ms")
+
+    if results["fsync per turn"]:
+        print(f"\n✓ Group commit speedup: {results['group commit'] / results['fsync per turn']:.1f}x")
+    return results
+
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def _api_server(workers: int, store_path: str):
+    """Run `python api_server.py` on a free port until the block exits; yields (port, process)"""
+    import http.client
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "api_server.py"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=dict(
+            os.environ,
+            API_HOST="127.0.0.1",
+            API_PORT=str(port),
+            API_WORKERS=str(workers),
+            SESSION_STORE_PATH=store_path
+        ),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.time() + 60
+        while True:
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                conn.request("GET", "/health")
+                if conn.getresponse().status == 200:
+                    break
+            except OSError:
+                pass
+            if time.time() > deadline or server.poll() is not None:
+                raise RuntimeError(f"API server with {workers} worker(s) did not start")
+            time.sleep(0.2)
+        yield port, server
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def bench_api_service(workers=(1, 2), users: int = 32, sessions_per_user: int = 4):
+    """
+    Load test: start api_server under uvicorn (shared SQLite session store)
+    and drive concurrent virtual users through full sessions over HTTP.
+    Each virtual user is a thread with one keep-alive connection, so the
+    load generator stays cheap next to the server.
+    """
+    print("\n" + "="*60)
+    print(f"BENCHMARK: HTTP API Load Test ({users} concurrent users)")
+    print("="*60)
+
+    import http.client
+    import json
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+
+    def request(conn, method, path, body=None):
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload else {}
+        conn.request(method, path, body=payload, headers=headers)
+        response = conn.getresponse()
+        data = response.read()
+        if response.status >= 400:
+            raise RuntimeError(f"{method} {path} -> {response.status}")
+        return json.loads(data)
+
+    def virtual_user(port):
+        latencies = []
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        for _ in range(sessions_per_user):
+            start = time.perf_counter()
+            session_id = request(conn, "POST", "/sessions")["session_id"]
+            latencies.append(time.perf_counter() - start)
+            for user_input in SESSION_SCRIPT:
+                start = time.perf_counter()
+                request(conn, "POST", f"/sessions/{session_id}/turns", {"input": user_input})
+                latencies.append(time.perf_counter() - start)
+        conn.close()
+        return latencies
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for worker_count in workers:
+            with _api_server(worker_count, os.path.join(tmp, f"api_{worker_count}.db")) as (port, _):
+                # Warm-up: let every worker build its engine and connect RAG
+                with ThreadPoolExecutor(max_workers=users) as pool:
+                    list(pool.map(virtual_user, [port] * worker_count * 2))
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=users) as pool:
+                    per_user = list(pool.map(virtual_user, [port] * users))
+                elapsed = time.perf_counter() - start
+
+            latencies = [latency for user_latencies in per_user for latency in user_latencies]
+            results[worker_count] = {
+                "requests_per_sec": len(latencies) / elapsed,
+                "p50_ms": _percentile(latencies, 50) * 1000,
+                "p99_ms": _percentile(latencies, 99) * 1000
+            }
+            r = results[worker_count]
+            print(f"\n[{worker_count} worker(s)] {len(latencies):,} requests: "
+                  f"{r['requests_per_sec']:,.0f} req/s, p50 {r['p50_ms']:.1f} ms, p99 {r['p99_ms']:.1f} ms")
+
+    print(f"\n(os.cpu_count() = {os.cpu_count()}; extra workers only help with more cores)")
+    return results
+
+
+def bench_api_streaming(idle_connections: int = 2000, sessions: int = 20):
+    """
+    Streaming endpoint: server memory per idle WebSocket connection, and
+    streamed turn latency (first event / done) while those connections idle
+    """
+    print("\n" + "="*60)
+    print(f"BENCHMARK: Streaming Turns ({idle_connections:,} idle WebSocket connections)")
+    print("="*60)
+
+    import asyncio
+    import json
+    import tempfile
+    import websockets
+
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        idle_connections = min(idle_connections, hard // 2 - 100)
+    except (ImportError, ValueError):
+        pass
+
+    async def streamed_session(url, first_event, turn_done):
+        async with websockets.connect(url) as ws:
+            for user_input in SESSION_SCRIPT:
+                start = time.perf_counter()
+                await ws.send(json.dumps({"input": user_input}))
+                first = True
+                while True:
+                    message = json.loads(await ws.recv())
+                    if first:
+                        first_event.append(time.perf_counter() - start)
+                        first = False
+                    if message["event"] in ("done", "error"):
+                        turn_done.append(time.perf_counter() - start)
+                        break
+
+    async def run(port, server_pid):
+        import http.client
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        session_ids = []
+        for _ in range(sessions):
+            conn.request("POST", "/sessions")
+            session_ids.append(json.loads(conn.getresponse().read())["session_id"])
+        base = f"ws://127.0.0.1:{port}/sessions"
+
+        # Warm-up (engine, RAG connection)
+        await streamed_session(f"{base}/{session_ids[0]}/ws", [], [])
+
+        rss_before = _rss_mb(server_pid)
+        idle = []
+        for offset in range(0, idle_connections, 200):
+            batch = min(200, idle_connections - offset)
+            idle += await asyncio.gather(*(
+                websockets.connect(f"{base}/idle-{offset + i}/ws") for i in range(batch)
+            ))
+        await asyncio.sleep(0.5)
+        rss_idle = _rss_mb(server_pid)
+
+        first_event, turn_done = [], []
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            streamed_session(f"{base}/{sid}/ws", first_event, turn_done) for sid in session_ids[1:]
+        ))
+        elapsed = time.perf_counter() - start
+
+        await asyncio.gather(*(ws.close() for ws in idle))
+        return rss_before, rss_idle, first_event, turn_done, elapsed
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with _api_server(1, os.path.join(tmp, "stream.db")) as (port, server):
+            rss_before, rss_idle, first_event, turn_done, elapsed = asyncio.run(run(port, server.pid))
+
+    per_connection_kb = (rss_idle - rss_before) * 1024 / max(1, idle_connections)
+    print(f"\nServer RSS: {rss_before:.1f} MB -> {rss_idle:.1f} MB with {idle_connections:,} idle connections "
+          f"(~{per_connection_kb:.1f} KB each)")
+    print(f"{len(turn_done):,} streamed turns ({sessions - 1} concurrent sessions): "
+          f"{len(turn_done) / elapsed:,.0f} turns/s")
+    print(f"  first event: p50 {_percentile(first_event, 50) * 1000:.1f} ms, p99 {_percentile(first_event, 99) * 1000:.1f} ms")
+    print(f"  turn done:   p50 {_percentile(turn_done, 50) * 1000:.1f} ms, p99 {_percentile(turn_done, 99) * 1000:.1f} ms")
+    return {
+        "idle_connections": idle_connections,
+        "kb_per_idle_connection": per_connection_kb,
+        "first_event_p50_ms": _percentile(first_event, 50) * 1000,
+        "turn_done_p99_ms": _percentile(turn_done, 99) * 1000
+    }
+
+
+def bench_tracing_overhead(sessions: int = 300, spans: int = 200000):
+    """Benchmark: per-turn cost of tracing spans, disabled vs enabled"""
+    print("\n" + "="*60)
+    print(f"BENCHMARK: Tracing Overhead ({sessions} sessions)")
+    print("="*60)
+
+    from device_manager import DeviceManager
+    from repair_engine import RepairEngine
+    from tracing import Tracer
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = RepairEngine(device_manager=DeviceManager(), rag=OfflineRAG())
+
+    def span_ns(tracer: Tracer) -> float:
+        start = time.perf_counter()
+        for _ in range(spans):
+            with tracer.span("bench", attempt=1):
+                pass
+        return (time.perf_counter() - start) / spans * 1e9
+
+    results = {}
+    for label, enabled in [("disabled", False), ("enabled", True)]:
+        engine.tracer.enabled = enabled
+        engine.tracer.reset()
+        start = time.perf_counter()
+        for _ in range(sessions):
+            session = engine.new_session()
+            for user_input in SESSION_SCRIPT:
+                engine.step(session, user_input)
+        turn_us = (time.perf_counter() - start) / sessions / len(SESSION_SCRIPT) * 1e6
+        span_count = sum(h["count"] for h in engine.tracer.histograms().values())
+        results[label] = {"turn_us": turn_us, "span_ns": span_ns(Tracer(enabled=enabled))}
+        print(f"\n[{label}] {turn_us:.1f} µs/turn, {results[label]['span_ns']:.0f} ns per span"
+              + (f" ({span_count / sessions / len(SESSION_SCRIPT):.1f} spans/turn)" if enabled else ""))
+    engine.tracer.enabled = False
+    engine.tracer.reset()
+
+    return results
+
+
+def check_import_budget(module: str = "flow_manager", budget_ms: float = None) -> bool:
+    """
+    Import-time budget: run `python -X importtime -c "import <module>"` in a
+    fresh interpreter and fail if the module's cumulative import time exceeds
+    the budget (IMPORT_BUDGET_MS, default 250 ms).
+    """
+    print("\n" + "="*60)
+    print(f"CHECK: Import Time Budget ({module})")
+    print("="*60)
+
+    if budget_ms is None:
+        budget_ms = float(os.getenv("IMPORT_BUDGET_MS", "250"))
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        print(f"✗ import {module} failed:\n{result.stderr[-2000:]}")
+        return False
+
+    # Lines look like: "import time:   self [us] | cumulative | imported package",
+    # the package indented two spaces per nesting level, listed after its imports
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.rstrip()
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        timings.append((name.strip(), level, int(cumulative)))
+
+    index = max(i for i, (name, _, _) in enumerate(timings) if name == module)
+    _, module_level, total_us = timings[index]
+    total_ms = total_us / 1000
+    # The module's own imports: the lines just above it, one level deeper
+    direct = []
+    for name, level, us in reversed(timings[:index]):
+        if level <= module_level:
+            break
+        if level == module_level + 1:
+            direct.append((name, us))
+    direct.sort(key=lambda t: t[1], reverse=True)
+
+    print(f"\nimport {module}: {total_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+    print("Heaviest direct imports:")
+    for name, us in direct[:5]:
+        print(f"  {name:<30} {us / 1000:8.1f} ms")
+
+    ok = total_ms <= budget_ms
+    print(f"\n{'✓' if ok else '✗'} Import budget {'met' if ok else 'exceeded'}")
+    return ok
+
+
+def main():
+    """Run all benchmarks"""
+    if sys.argv[1:] == ["import-budget"]:
+        sys.exit(0 if check_import_budget() else 1)
+
+    # Benchmarks never call the API - a placeholder key lets clients construct
+    # (set here, not at import, so importing this module changes nothing)
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark-placeholder")
+
+    print("\n")
+    print("╔" + "="*58 + "╗")
+    print("║" + "  SERVICE REPAIR BOT - PERFORMANCE BENCHMARKS  ".center(58) + "║")
+    print("╚" + "="*58 + "╝")
+
+    import_budget_met = check_import_budget()
+    bench_session_overhead()
+    bench_task_routing()
+    bench_response_cache()
+    bench_engine_sessions()
+    bench_long_sessions()
+    bench_rag_memoization()
+    bench_rag_prefetch()
+    bench_error_code_lookup()
+    bench_step_learning()
+    bench_device_suggestions()
+    bench_shared_catalog()
+    bench_app_sessions()
+    bench_session_store()
+    bench_session_journal()
+    bench_api_service()
+    bench_api_streaming()
+    bench_tracing_overhead()
+
+    if not import_budget_met:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""
+Record/replay cassettes for network-free end-to-end runs
+
+Wraps the engine's external dependencies - VoyageAI embeddings (which
+QdrantRAG.get_embedding / get_embeddings call), every Qdrant client call
+(search, upsert, scroll, count, ...) and the LLM (TaskRouter.llm_executor
+and the streaming chat model):
+
+    cassette = Cassette("sessions.cassette", mode="record")   # live services
+    cassette.install(engine)
+    ... run sessions ...
+    cassette.save()
+
+    cassette = Cassette("sessions.cassette", mode="replay", latency_ms=None)
+    cassette.install(engine)                                  # no network
+
+Calls are keyed by kind + request content (vectors by their float32 bytes),
+so replay does not depend on call order. Replay sleeps the recorded latency,
+or latency_ms when set (0 = as fast as possible). A call without a recording
+raises CassetteMissError.
+
+The file is gzip-compressed JSON lines; vectors are stored as base64 float32.
+
+Usage:
+    python cassette.py record sessions.cassette --sessions 20             # live services
+    python cassette.py record sessions.cassette --sessions 20 --stand-ins # loadgen stand-ins
+    python cassette.py replay sessions.cassette --sessions 20 --latency-ms 0
+"""
+import argparse
+import base64
+import contextlib
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from array import array
+from enum import Enum
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+FORMAT_VERSION = 1
+# Float lists at least this long are treated as vectors (hashed / packed)
+VECTOR_MIN_LENGTH = 8
+
+
+class CassetteMissError(LookupError):
+    """Replay found no recorded call matching the request"""
+
+
+class RecordedCallError(RuntimeError):
+    """Replay of a call that raised while recording"""
+
+
+def _is_vector(value: Any) -> bool:
+    return (
+        isinstance(value, (list, tuple))
+        and len(value) >= VECTOR_MIN_LENGTH
+        and all(isinstance(x, float) for x in value)
+    )
+
+
+def _canonical(value: Any) -> Any:
+    """Request -> JSON-able key material (vectors as a hash of their float32 bytes)"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, Enum):
+        return value.value
+    if hasattr(value, "model_dump"):
+        return {"__type__": type(value).__name__, **_canonical(value.model_dump())}
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if _is_vector(value):
+            return {"__f32__": hashlib.sha1(array("f", value).tobytes()).hexdigest()}
+        return [_canonical(v) for v in value]
+    return repr(value)
+
+
+def _encode(value: Any) -> Any:
+    """Response -> JSON-able value; objects keep their public attributes"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, dict):
+        return {str(k): _encode(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return {"__tuple__": [_encode(v) for v in value]}
+    if isinstance(value, list):
+        if _is_vector(value):
+            return {"__f32__": base64.b64encode(array("f", value).tobytes()).decode("ascii")}
+        return [_encode(v) for v in value]
+
+    fields = getattr(type(value), "model_fields", None)
+    if fields is not None:
+        attributes = {name: getattr(value, name) for name in fields}
+    elif hasattr(value, "__dict__"):
+        attributes = {k: v for k, v in vars(value).items() if not k.startswith("_")}
+    else:
+        return repr(value)
+    return {"__obj__": {k: _encode(v) for k, v in attributes.items()}}
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if isinstance(value, dict):
+        if len(value) == 1:
+            if "__f32__" in value:
+                return array("f", base64.b64decode(value["__f32__"])).tolist()
+            if "__tuple__" in value:
+                return tuple(_decode(v) for v in value["__tuple__"])
+            if "__obj__" in value:
+                return SimpleNamespace(**{k: _decode(v) for k, v in value["__obj__"].items()})
+        return {k: _decode(v) for k, v in value.items()}
+    return value
+
+
+class Cassette:
+    """
+    Recorded dependency calls in one file.
+    mode "record": calls pass through and responses are captured with their latency.
+    mode "replay": responses are served from the file (recorded latency, or latency_ms).
+    """
+
+    def __init__(self, path: str, mode: str = "replay", latency_ms: Optional[float] = None):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"mode must be 'record' or 'replay', not {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.latency_ms = latency_ms
+        self.settings: Dict[str, Any] = {}
+        self.calls = 0
+        self.misses = 0
+        self._entries: Dict[str, List[Dict]] = {}
+        self._cursors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if mode == "replay":
+            self.load()
+
+    @staticmethod
+    def key(kind: str, request: Any) -> str:
+        material = json.dumps([kind, _canonical(request)], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(material.encode("utf-8")).hexdigest()
+
+    def _record(self, kind: str, request: Any, entry: Dict):
+        key = self.key(kind, request)
+        with self._lock:
+            self.calls += 1
+            self._entries.setdefault(key, []).append({"kind": kind, **entry})
+
+    def _lookup(self, kind: str, request: Any) -> Dict:
+        """Recorded entry for the request; repeated requests get the recordings in order, then the last"""
+        key = self.key(kind, request)
+        with self._lock:
+            self.calls += 1
+            entries = self._entries.get(key)
+            if not entries:
+                self.misses += 1
+                raise CassetteMissError(f"No recorded {kind} call matches the request (key {key[:12]})")
+            index = self._cursors.get(key, 0)
+            self._cursors[key] = min(index + 1, len(entries) - 1)
+            return entries[index]
+
+    def _sleep(self, recorded_ms: float):
+        delay_ms = recorded_ms if self.latency_ms is None else self.latency_ms
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    def call(self, kind: str, request: Any, fn: Optional[Callable[[], Any]]) -> Any:
+        """Run (record) or serve (replay) one request/response call"""
+        if self.mode == "replay":
+            entry = self._lookup(kind, request)
+            self._sleep(entry["ms"])
+            if "error" in entry:
+                raise RecordedCallError(entry["error"])
+            return _decode(entry["response"])
+
+        start = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:
+            self._record(kind, request, {"ms": _elapsed_ms(start), "error": f"{type(e).__name__}: {e}"})
+            raise
+        self._record(kind, request, {"ms": _elapsed_ms(start), "response": _encode(result)})
+        return result
+
+    def stream(self, kind: str, request: Any, fn: Optional[Callable[[], Iterable[str]]]) -> Iterator[str]:
+        """Run (record) or serve (replay) a streamed text response, chunk by chunk"""
+        if self.mode == "replay":
+            entry = self._lookup(kind, request)
+            for i, (gap_ms, text) in enumerate(entry["chunks"]):
+                if self.latency_ms is None:
+                    self._sleep(gap_ms)
+                elif i == 0:
+                    self._sleep(self.latency_ms)
+                yield text
+            return
+
+        chunks, last = [], time.perf_counter()
+        try:
+            for text in fn():
+                chunks.append([_elapsed_ms(last), text])
+                last = time.perf_counter()
+                yield text
+        finally:
+            self._record(kind, request, {"chunks": chunks})
+
+    def install(self, engine):
+        """
+        Route the engine's RAG clients and LLM calls through the cassette.
+        Recording connects the real clients first; replay needs no credentials.
+        """
+        rag, router = engine.rag, engine.task_router
+        if self.mode == "record":
+            with self._lock:
+                self.settings = {"use_llm_steps": engine.use_llm_steps}
+            client, voyage_client = rag.client, rag.voyage_client
+            executor, chat_model = router.llm_executor, router.stream_llm
+        else:
+            client = voyage_client = executor = chat_model = None
+            engine.use_llm_steps = self.settings.get("use_llm_steps", engine.use_llm_steps)
+            engine.llm_available = True
+
+        rag.attach_clients(
+            CassetteClient(self, "qdrant", client) if client is not None or self.mode == "replay" else None,
+            CassetteClient(self, "voyage", voyage_client) if voyage_client is not None or self.mode == "replay" else None
+        )
+        router.llm_executor = lambda task_name, params: self.call(
+            "llm.run", [task_name, params], lambda: executor(task_name, params)
+        )
+        router.stream_llm = CassetteChatModel(self, chat_model)
+
+    def save(self, path: Optional[str] = None):
+        """Write the recordings (atomic replace)"""
+        path = path or self.path
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with self._lock:
+            header = {"format": FORMAT_VERSION, "settings": self.settings,
+                      "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                f.write(json.dumps(header) + "\n")
+                for key, entries in self._entries.items():
+                    for entry in entries:
+                        f.write(json.dumps({"key": key, **entry}, ensure_ascii=False, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, path)
+
+    def load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("format") != FORMAT_VERSION:
+                raise ValueError(f"{self.path}: unsupported cassette format {header.get('format')}")
+            self.settings = header.get("settings", {})
+            entries: Dict[str, List[Dict]] = {}
+            for line in f:
+                entry = json.loads(line)
+                entries.setdefault(entry.pop("key"), []).append(entry)
+        with self._lock:
+            self._entries, self._cursors = entries, {}
+
+    def recorded_latencies_ms(self, kinds: Iterable[str]) -> List[float]:
+        """Recorded duration of every call of the given kinds (streams: first to last chunk)"""
+        kinds = set(kinds)
+        with self._lock:
+            return [
+                entry["ms"] if "ms" in entry else sum(gap_ms for gap_ms, _ in entry.get("chunks", []))
+                for entries in self._entries.values()
+                for entry in entries
+                if entry["kind"] in kinds
+            ]
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+class CassetteClient:
+    """Client stand-in: every method call goes through the cassette as "<kind>.<method>" """
+
+    def __init__(self, cassette: Cassette, kind: str, client: Any = None):
+        self._cassette = cassette
+        self._kind = kind
+        self._client = client
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        method = getattr(self._client, name) if self._cassette.mode == "record" else None
+        if method is not None and not callable(method):
+            return method
+
+        def call(*args, **kwargs):
+            return self._cassette.call(
+                f"{self._kind}.{name}", [list(args), kwargs], method and (lambda: method(*args, **kwargs))
+            )
+        return call
+
+
+class CassetteChatModel:
+    """Streaming chat model stand-in for TaskRouter.stream_llm"""
+
+    def __init__(self, cassette: Cassette, llm: Any = None):
+        self._cassette = cassette
+        self._llm = llm
+
+    def stream(self, messages: List[tuple]) -> Iterator[SimpleNamespace]:
+        def live():
+            for chunk in self._llm.stream(messages):
+                if chunk.content:
+                    yield chunk.content
+
+        for text in self._cassette.stream("llm.stream", [list(m) for m in messages], live):
+            yield SimpleNamespace(content=text)
+
+
+# ============================================================================
+# Full-session runs
+# ============================================================================
+
+def _build_engine(mode: str, stand_ins: bool):
+    from qdrant_rag import QdrantRAG
+    from repair_engine import RepairEngine
+    from step_outcomes import StepOutcomeTable
+
+    if mode == "record" and stand_ins:
+        import loadgen
+        return loadgen.build_engine()
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Fresh step-learning table: the same choices as when recording
+        return RepairEngine(rag=QdrantRAG(), outcomes=StepOutcomeTable())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or replay full repair sessions")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("path", help="cassette file")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--corpus", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "requests.jsonl"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stand-ins", action="store_true", help="record against the loadgen stand-ins instead of live services")
+    parser.add_argument("--latency-ms", type=float, help="replay every call with this latency (default: recorded)")
+    parser.add_argument("--json", help="write the session report to this file")
+    args = parser.parse_args()
+
+    import loadgen
+
+    cassette = Cassette(args.path, mode=args.mode, latency_ms=args.latency_ms)
+    engine = _build_engine(args.mode, args.stand_ins)
+    with contextlib.redirect_stdout(io.StringIO()):
+        cassette.install(engine)
+
+    # One worker: the same scripted sessions in the same order on every run
+    report = loadgen.run_load(engine, loadgen.load_corpus(args.corpus), sessions=args.sessions,
+                              concurrency=1, seed=args.seed, quiet=True)
+    loadgen.print_report(report)
+
+    if args.mode == "record":
+        cassette.save()
+        print(f"\nRecorded {len(cassette)} calls to {args.path} ({os.path.getsize(args.path) / 1024:.0f} KB)")
+    else:
+        print(f"\nReplayed {cassette.calls} calls, {cassette.misses} without a recording")
+
+    if args.json:
+        report["cassette"] = {"mode": args.mode, "calls": cassette.calls, "misses": cassette.misses}
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
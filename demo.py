@@ -183,6 +183,44 @@ def demo_state_persistence():
     return flow
 
 
+def demo_streaming():
+    """Demo: Streaming an LLM-generated repair step with a local fake model"""
+    print("\n" + "="*60)
+    print("DEMO 5: Streaming Responses (fake streaming model)")
+    print("="*60)
+    
+    import time
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    
+    flow = RepairFlowManager()
+    flow.use_llm_steps = True
+    flow.task_router.cache = None
+    flow.task_router.stream_llm = FakeListChatModel(
+        responses=["Step 1: Unplug the unit and inspect the water inlet screen for debris.\n"
+                   "⚠ Safety: disconnect power before removing panels."],
+        sleep=0.01  # Per-character delay, like a model emitting tokens
+    )
+    
+    flow.run_next_stage("Scotsman Prodigy Cuber")
+    for answer in ["Yesterday", "No water", "None", "E:15", "At start", "Restarted", "Kitchen"]:
+        flow.run_next_stage(answer)
+    
+    print("\nBot (streaming): ", end="", flush=True)
+    start = time.perf_counter()
+    first_chunk_at = None
+    for chunk in flow.stream_next_stage(""):
+        if first_chunk_at is None:
+            first_chunk_at = time.perf_counter() - start
+        print(chunk, end="", flush=True)
+    total = time.perf_counter() - start
+    
+    print(f"\n\nTime to first chunk: {first_chunk_at * 1000:.0f} ms")
+    print(f"Full response:      {total * 1000:.0f} ms")
+    print(f"Response stage:     {flow.last_response['stage']} (attempt {flow.last_response['attempt']})")
+    
+    return flow
+
+
 def test_device_manager():
     """Test device manager functionality"""
     print("\n" + "="*60)
@@ -275,6 +313,7 @@ def main():
         demo_unknown_device()
         demo_escalation()
         demo_state_persistence()
+        demo_streaming()
         
         print("\n\n" + "="*60)
         print("✓ ALL DEMOS AND TESTS COMPLETE")
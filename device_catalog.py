@@ -0,0 +1,270 @@
+"""Read-only device catalog in a memory-mapped file, shared by worker processes"""
+import json
+import mmap
+import os
+import sys
+import zlib
+from array import array
+from collections.abc import ItemsView, Mapping, ValuesView
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+MAGIC = b"DEVCAT2" + (b"L" if sys.byteorder == "little" else b"B")
+
+# Table order in the file and how each value is stored
+TABLES = ("devices", "device_index", "trigram_index", "trigram_counts")
+_ENCODERS = {
+    "devices": lambda device: json.dumps(device, separators=(",", ":"), ensure_ascii=False).encode("utf-8"),
+    "device_index": lambda key: key.encode("utf-8"),
+    "trigram_index": lambda keys: "\0".join(keys).encode("utf-8"),
+    "trigram_counts": lambda count: str(count).encode("ascii"),
+}
+_DECODERS = {
+    "devices": lambda raw: json.loads(raw),
+    "device_index": lambda raw: raw.decode("utf-8"),
+    "trigram_index": lambda raw: raw.decode("utf-8").split("\0") if raw else [],
+    "trigram_counts": lambda raw: int(raw),
+}
+
+
+def _pad(data: bytes) -> bytes:
+    return data + b"\0" * (-len(data) % 8)
+
+
+def _encode_table(table: Dict[str, object], encode: Callable[[object], bytes]) -> bytes:
+    """
+    Layout (8-byte aligned, native byte order):
+        n | slots | key offsets[n+1] | value offsets[n+1] | slot table[slots] | keys | values
+    Entries keep the dict's insertion order. The slot table is an open
+    addressing hash table (crc32 of the key, linear probing) holding
+    entry number + 1, or 0 for an empty slot.
+    """
+    keys = [key.encode("utf-8") for key in table]
+    values = [encode(value) for value in table.values()]
+
+    key_offsets, value_offsets = array("Q", [0]), array("Q", [0])
+    for key in keys:
+        key_offsets.append(key_offsets[-1] + len(key))
+    for value in values:
+        value_offsets.append(value_offsets[-1] + len(value))
+
+    slot_count = 8
+    while slot_count < 2 * len(keys):
+        slot_count *= 2
+    slots = array("Q", bytes(8 * slot_count))
+    for i, key in enumerate(keys):
+        slot = zlib.crc32(key) & (slot_count - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (slot_count - 1)
+        slots[slot] = i + 1
+
+    return b"".join([
+        array("Q", [len(keys), slot_count]).tobytes(),
+        key_offsets.tobytes(),
+        value_offsets.tobytes(),
+        slots.tobytes(),
+        _pad(b"".join(keys)),
+        _pad(b"".join(values))
+    ])
+
+
+def write_catalog(path: str, tables: Dict[str, Dict]):
+    """Write the catalog tables to `path` (atomic replace)"""
+    blobs = [_encode_table(tables[name], _ENCODERS[name]) for name in TABLES]
+    header_size = len(MAGIC) + 8 * len(TABLES)
+    offsets, position = array("Q"), header_size
+    for blob in blobs:
+        offsets.append(position)
+        position += len(blob)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(offsets.tobytes())
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+
+
+class MappedTable(Mapping):
+    """Read-only str-keyed mapping over one catalog table; values are decoded on access"""
+
+    def __init__(self, view: memoryview, decode: Callable[[bytes], object]):
+        n, slot_count = view[:16].cast("Q")
+        position = 16
+        self._key_offsets = view[position:position + 8 * (n + 1)].cast("Q")
+        position += 8 * (n + 1)
+        self._value_offsets = view[position:position + 8 * (n + 1)].cast("Q")
+        position += 8 * (n + 1)
+        self._slots = view[position:position + 8 * slot_count].cast("Q")
+        self._mask = slot_count - 1
+        position += 8 * slot_count
+        keys_size = self._key_offsets[n]
+        self._keys = view[position:position + keys_size]
+        position += keys_size + (-keys_size % 8)
+        self._values = view[position:position + self._value_offsets[n]]
+        self._n = n
+        self._decode = decode
+
+    def _key_bytes(self, i: int) -> bytes:
+        return bytes(self._keys[self._key_offsets[i]:self._key_offsets[i + 1]])
+
+    def _key(self, i: int) -> str:
+        return self._key_bytes(i).decode("utf-8")
+
+    def _value(self, i: int):
+        return self._decode(bytes(self._values[self._value_offsets[i]:self._value_offsets[i + 1]]))
+
+    def _find(self, key: str) -> int:
+        """Entry number of `key` (hash table probe), or -1"""
+        if not isinstance(key, str):
+            return -1
+        target = key.encode("utf-8")
+        keys, key_offsets, slots, mask = self._keys, self._key_offsets, self._slots, self._mask
+        slot = zlib.crc32(target) & mask
+        while True:
+            entry = slots[slot]
+            if not entry:
+                return -1
+            i = entry - 1
+            if keys[key_offsets[i]:key_offsets[i + 1]] == target:
+                return i
+            slot = (slot + 1) & mask
+
+    def __getitem__(self, key: str):
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return self._value(i)
+
+    def __contains__(self, key) -> bool:
+        return self._find(key) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self._n):
+            yield self._key(i)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def items(self):
+        return _MappedItems(self)
+
+    def values(self):
+        return _MappedValues(self)
+
+    def release(self):
+        for view in (self._key_offsets, self._value_offsets, self._slots, self._keys, self._values):
+            view.release()
+
+
+class _MappedItems(ItemsView):
+    # Sequential scan in insertion order, without a key lookup per entry
+    def __iter__(self):
+        table = self._mapping
+        for i in range(len(table)):
+            yield table._key(i), table._value(i)
+
+
+class _MappedValues(ValuesView):
+    def __iter__(self):
+        table = self._mapping
+        for i in range(len(table)):
+            yield table._value(i)
+
+
+class MappedCatalog:
+    """
+    The device catalog and its lookup indexes mapped read-only from one file.
+
+    Pages are shared through the OS page cache, so every worker process that
+    maps the same file adds almost nothing to memory. Put the file on tmpfs
+    (/dev/shm) to keep it out of disk I/O entirely.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a device catalog for this platform")
+
+        self._view = memoryview(self._mmap)
+        offsets = self._view[len(MAGIC):len(MAGIC) + 8 * len(TABLES)].cast("Q")
+        bounds = list(offsets) + [len(self._mmap)]
+        offsets.release()
+        self.tables = {
+            name: MappedTable(self._view[bounds[i]:bounds[i + 1]], _DECODERS[name])
+            for i, name in enumerate(TABLES)
+        }
+
+    @property
+    def devices(self) -> MappedTable:
+        return self.tables["devices"]
+
+    @property
+    def device_index(self) -> MappedTable:
+        return self.tables["device_index"]
+
+    @property
+    def trigram_index(self) -> MappedTable:
+        return self.tables["trigram_index"]
+
+    @property
+    def trigram_counts(self) -> MappedTable:
+        return self.tables["trigram_counts"]
+
+    @staticmethod
+    def is_current(path: str, source_path: Optional[str] = None) -> bool:
+        """The file exists, has our format and is newer than the source CSV"""
+        try:
+            with open(path, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    return False
+            if source_path and os.path.exists(source_path):
+                return os.path.getmtime(path) >= os.path.getmtime(source_path)
+            return True
+        except OSError:
+            return False
+
+    @classmethod
+    def open_or_build(
+        cls,
+        path: str,
+        build: Callable[[], Dict[str, Dict]],
+        source_path: Optional[str] = None,
+        rebuild: bool = False
+    ) -> "MappedCatalog":
+        """
+        Map the catalog at `path`. If it is missing or stale, the first process
+        to take the build lock calls `build()` (returning the TABLES dicts) and
+        writes the file; the others wait and then map it.
+        """
+        if rebuild or not cls.is_current(path, source_path):
+            with _build_lock(path + ".lock"):
+                if rebuild or not cls.is_current(path, source_path):
+                    write_catalog(path, build())
+        return cls(path)
+
+    def close(self):
+        for table in self.tables.values():
+            table.release()
+        self._view.release()
+        self._mmap.close()
+
+
+@contextmanager
+def _build_lock(lock_path: str):
+    """Exclusive inter-process lock (no-op where fcntl is unavailable)"""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(lock_path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
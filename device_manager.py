@@ -1,22 +1,71 @@
 """Device management and validation"""
 import csv
 import os
-from typing import Optional, Dict, List
+from collections import Counter
+from typing import Optional, Dict, List, Set
 from pathlib import Path
 from difflib import SequenceMatcher
 
 class DeviceManager:
     """Manages device validation against device database from CSV"""
     
-    def __init__(self):
-        """Initialize device manager and load devices from CSV."""
-        self.devices = self._load_devices_from_csv()
+    SUGGESTION_LIMIT = 5
+    SUGGESTION_MIN_SCORE = 0.2
+    CSV_PATH = Path(__file__).parent / "devices.csv"
+    
+    def __init__(self, devices: Optional[Dict[str, Dict]] = None, catalog_path: Optional[str] = None):
+        """
+        Initialize device manager and load devices from CSV (or a given catalog).
+        
+        catalog_path (default: DEVICE_CATALOG_PATH env var): share the catalog
+        and indexes between processes through a read-only memory-mapped file.
+        The first process builds it (from `devices` or the CSV), the others map it.
+        """
+        if catalog_path is None and devices is None:
+            catalog_path = os.getenv("DEVICE_CATALOG_PATH")
+        self.catalog = None
+        # (lowercase full name, full name) sorted by name, built on first browse
+        self._sorted_names: Optional[List[tuple]] = None
+        
+        if catalog_path:
+            self._map_catalog(catalog_path, devices)
+            return
+        
+        self.devices = devices if devices is not None else self._load_devices_from_csv()
         self.device_index = self._build_index()
+        self.trigram_index, self._trigram_counts = self._build_trigram_index()
+    
+    def _map_catalog(self, catalog_path: str, devices: Optional[Dict[str, Dict]]):
+        """Use the shared catalog file, building it first if missing or stale"""
+        from device_catalog import MappedCatalog
+        
+        def build():
+            self.devices = devices if devices is not None else self._load_devices_from_csv()
+            self.device_index = self._build_index()
+            self.trigram_index, self._trigram_counts = self._build_trigram_index()
+            return {
+                "devices": self.devices,
+                "device_index": self.device_index,
+                "trigram_index": self.trigram_index,
+                "trigram_counts": self._trigram_counts
+            }
+        
+        self.catalog = MappedCatalog.open_or_build(
+            catalog_path,
+            build,
+            source_path=str(self.CSV_PATH),
+            rebuild=devices is not None
+        )
+        # Same attributes as the in-process catalog - lookups work unchanged
+        self.devices = self.catalog.devices
+        self.device_index = self.catalog.device_index
+        self.trigram_index = self.catalog.trigram_index
+        self._trigram_counts = self.catalog.trigram_counts
     
     def _load_devices_from_csv(self) -> Dict[str, Dict]:
         """Load device list from devices.csv file."""
         devices = {}
-        csv_path = Path(__file__).parent / "devices.csv"
+        csv_path = self.CSV_PATH
         
         if not csv_path.exists():
             print(f"⚠️ Warning: {csv_path} not found. Using empty device list.")
@@ -109,6 +158,79 @@ class DeviceManager:
             index[brand_type] = key
         return index
     
+    @staticmethod
+    def _trigrams(text: str) -> Set[str]:
+        padded = f"  {' '.join(text.lower().split())} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+    
+    def _build_trigram_index(self):
+        """Nearest-match index: character trigram -> device keys"""
+        index: Dict[str, List[str]] = {}
+        counts: Dict[str, int] = {}
+        for key, device in self.devices.items():
+            grams = self._trigrams(f"{device['full_name']} {device['model']}")
+            counts[key] = len(grams)
+            for gram in grams:
+                index.setdefault(gram, []).append(key)
+        return index, counts
+    
+    def suggest_devices(self, user_input: str, limit: int = SUGGESTION_LIMIT) -> List[Dict]:
+        """
+        Closest catalog devices to the input, best first (trigram Dice score
+        of at least SUGGESTION_MIN_SCORE). Only devices sharing a trigram
+        with the input are scored.
+        """
+        grams = self._trigrams(user_input)
+        overlap = Counter()
+        for gram in grams:
+            overlap.update(self.trigram_index.get(gram, ()))
+        
+        scored = [
+            (2 * shared / (len(grams) + self._trigram_counts[key]), key)
+            for key, shared in overlap.items()
+        ]
+        scored = [item for item in scored if item[0] >= self.SUGGESTION_MIN_SCORE]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [
+            {
+                "device_key": key,
+                "device_model": self.devices[key]["model"],
+                "full_name": self.devices[key]["full_name"],
+                "score": round(score, 3)
+            }
+            for score, key in scored[:limit]
+        ]
+    
+    def _name_order(self) -> List[tuple]:
+        """Catalog names sorted once per catalog; browsing then only filters and slices"""
+        if self._sorted_names is None:
+            self._sorted_names = sorted(
+                (device["full_name"].lower(), device["full_name"]) for device in self.devices.values()
+            )
+        return self._sorted_names
+    
+    def browse_devices(self, page: int = 1, page_size: int = 20, search: str = "") -> Dict:
+        """
+        One page of the catalog (sorted by name), optionally filtered by a substring.
+        page and page_size must be >= 1; a page past the end returns the last page.
+        """
+        if page < 1 or page_size < 1:
+            raise ValueError("page and page_size must be at least 1")
+        search = search.lower().strip()
+        entries = self._name_order()
+        if search:
+            entries = [entry for entry in entries if search in entry[0]]
+        pages = max(1, -(-len(entries) // page_size))
+        page = min(page, pages)
+        start = (page - 1) * page_size
+        return {
+            "items": [name for _, name in entries[start:start + page_size]],
+            "page": page,
+            "page_size": page_size,
+            "pages": pages,
+            "total": len(entries)
+        }
+    
     def find_device(self, user_input: str) -> Dict:
         """
         Find device in database with fuzzy matching
@@ -0,0 +1,51 @@
+"""Error/fault code extraction for direct manual lookup"""
+import re
+from typing import Dict, Iterable, List
+
+# Symptom question that asks for the displayed error code
+ERROR_CODE_QUESTION = 4
+
+# "E:15", "E15", "F 21", "e-15": an uppercase prefix, or any case with a ":"/"-"
+# separator, so "at 5 pm" or "pH 7" are not read as codes
+_PREFIXED_CODE = re.compile(
+    r"(?<![A-Za-z0-9])(?:([A-Z]{1,2})\s?[:\-]?|([A-Za-z]{1,2})[:\-])\s?(\d{1,3})(?![A-Za-z0-9])"
+)
+# Short words that precede numbers in plain sentences ("A 20 minute cycle", "AT 5")
+_NOT_A_PREFIX = {
+    "A", "AM", "AN", "AT", "BY", "I", "IN", "IS", "IT", "MY", "NO", "OF", "OK", "ON", "OR", "PH", "PM",
+    "TO", "UP", "US", "WE"
+}
+# "error 15", "fault code 4C", "code: E15"
+_LABELLED_CODE = re.compile(
+    r"\b(?:error|fault|code)(?:\s+code)?\s*[:#]?\s*([A-Za-z]{0,2}\d{1,3}[A-Za-z]?)\b",
+    re.IGNORECASE
+)
+
+
+def normalize_error_code(code: str) -> str:
+    """Canonical form used as index key: uppercase, no separators ("e:15" -> "E15")"""
+    return re.sub(r"[\s:\-]", "", code).upper()
+
+
+def extract_error_codes(texts: Iterable[str]) -> List[str]:
+    """Normalized error codes mentioned in the texts, in order of appearance"""
+    codes = []
+    for text in texts:
+        if not text:
+            continue
+        for match in _LABELLED_CODE.finditer(text):
+            codes.append(normalize_error_code(match.group(1)))
+        for match in _PREFIXED_CODE.finditer(text):
+            prefix = (match.group(1) or match.group(2)).upper()
+            if prefix not in _NOT_A_PREFIX:
+                codes.append(prefix + match.group(3))
+    return list(dict.fromkeys(codes))
+
+
+def symptom_error_codes(symptoms: Dict[int, str]) -> List[str]:
+    """Error codes in the symptom answers: the error-code question's answer first, then the rest in order"""
+    symptoms = {int(q): a for q, a in symptoms.items()}
+    answers = [symptoms.get(ERROR_CODE_QUESTION)] + [
+        answer for q_num, answer in sorted(symptoms.items()) if q_num != ERROR_CODE_QUESTION
+    ]
+    return extract_error_codes(answers)
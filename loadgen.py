@@ -0,0 +1,490 @@
+"""
+Concurrent multi-session load generator and soak test
+
+Drives N concurrent synthetic sessions through RepairFlowManager on one
+shared RepairEngine, against local stand-ins for Qdrant (qdrant-client local
+mode), VoyageAI (hashed bag-of-words embeddings) and OpenAI (streaming chat
+model) with configurable latency. Reports throughput, per-stage turn latency
+percentiles and memory growth.
+
+Usage:
+    python loadgen.py --sessions 2000 --concurrency 32
+    python loadgen.py --duration 1800 --concurrency 32 --report-every 60   # soak
+    python loadgen.py --corpus requests.jsonl --llm-latency-ms 400 --json load_report.json
+
+Corpus (JSONL), one session per line, any of:
+    {"inputs": ["<device>", "<answer 1>", ..., "", "no", "yes"]}
+    {"device": "...", "symptoms": ["7 answers"], "responses": ["no", "yes"]}
+    {"title": "...", "body": "..."}    # free text -> randomized session
+Free-text lines (e.g. requests.jsonl) are turned into sessions with a random
+catalog device, symptom answers taken from the text and a random outcome.
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+SYMPTOM_QUESTIONS = 7
+UNKNOWN_DEVICES = ["Acme Frobnicator 9000", "Generic Ice Thing", "Scotsmn Prodgy"]
+ERROR_CODES = ["E:15", "E24", "F 21", "error 4C", "e-05"]
+
+
+# ============================================================================
+# Service stand-ins
+# ============================================================================
+
+def _sleep_ms(latency_ms: float, jitter: float = 0.2):
+    if latency_ms > 0:
+        time.sleep(latency_ms * random.uniform(1 - jitter, 1 + jitter) / 1000)
+
+
+class StandInEmbedder:
+    """VoyageAI stand-in: deterministic hashed bag-of-words vectors after a simulated round trip"""
+
+    def __init__(self, latency_ms: float = 0, dimensions: int = 1024):
+        self.latency_ms = latency_ms
+        self.dimensions = dimensions
+        self.calls = 0
+
+    def _embed_one(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for word in re.findall(r"[a-z0-9]+", text.lower()):
+            vector[int(hashlib.md5(word.encode()).hexdigest()[:8], 16) % self.dimensions] += 1.0
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def embed(self, texts, model=None, **_):
+        self.calls += 1
+        _sleep_ms(self.latency_ms)
+        if isinstance(texts, str):
+            texts = [texts]
+        return SimpleNamespace(embeddings=[self._embed_one(text) for text in texts])
+
+
+class StandInVectorStore:
+    """
+    Qdrant stand-in: qdrant-client local mode (in process, in memory) with a
+    simulated network round trip on every call QdrantRAG makes.
+    """
+
+    def __init__(self, latency_ms: float = 0):
+        from qdrant_client import QdrantClient
+        self.latency_ms = latency_ms
+        self._client = QdrantClient(":memory:")
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # query_points, upsert, scroll, count, ... with the same latency;
+        # only methods the installed client really has
+        method = getattr(self._client, name)
+        if not callable(method):
+            return method
+
+        def call(*args, **kwargs):
+            _sleep_ms(self.latency_ms)
+            with self._lock:
+                return method(*args, **kwargs)
+        return call
+
+
+class StandInChatModel:
+    """OpenAI stand-in for TaskRouter: streams a canned repair step token by token"""
+
+    def __init__(self, first_token_ms: float = 0, token_ms: float = 0, tokens: int = 40):
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        self.tokens = tokens
+        self.calls = 0
+
+    def stream(self, messages):
+        self.calls += 1
+        _sleep_ms(self.first_token_ms)
+        words = ["Check", "the", "component", "named", "in", "the", "symptom", "and", "reseat", "its",
+                 "connector;", "then", "power", "cycle", "the", "unit."]
+        for i in range(self.tokens):
+            if i:
+                _sleep_ms(self.token_ms, jitter=0)
+            yield SimpleNamespace(content=words[i % len(words)] + " ")
+
+    def run_task(self, task_name: str, params: Dict) -> str:
+        """TaskRouter.llm_executor signature"""
+        return "".join(chunk.content for chunk in self.stream([]))
+
+
+def build_engine(
+    search_latency_ms: float = 30,
+    embed_latency_ms: float = 60,
+    llm_first_token_ms: float = 400,
+    llm_token_ms: float = 15,
+    llm_steps: bool = True
+):
+    """Shared RepairEngine wired to the stand-ins (sample manuals seeded through them)"""
+    from qdrant_rag import QdrantRAG
+    from repair_engine import RepairEngine
+    from step_outcomes import StepOutcomeTable
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        rag = QdrantRAG()
+        # Seed without latency, then switch it on
+        store, embedder = StandInVectorStore(0), StandInEmbedder(0)
+        rag.attach_clients(store, embedder)
+        store.latency_ms, embedder.latency_ms = search_latency_ms, embed_latency_ms
+        engine = RepairEngine(rag=rag, outcomes=StepOutcomeTable())
+
+    llm = StandInChatModel(first_token_ms=llm_first_token_ms, token_ms=llm_token_ms)
+    engine.task_router.stream_llm = llm
+    engine.task_router.llm_executor = llm.run_task
+    engine.llm_available = True
+    engine.use_llm_steps = llm_steps
+    return engine
+
+
+# ============================================================================
+# Corpus
+# ============================================================================
+
+def _text_fragments(record: Dict) -> List[str]:
+    text = " ".join(str(value) for key, value in record.items() if isinstance(value, str) and key != "request_id")
+    text = re.sub(r"`|\[DOC \d+\]", "", text)
+    return [s.strip()[:200] for s in re.split(r"(?<=[.!?])\s+", text) if len(s.strip()) > 3]
+
+
+def load_corpus(path: Optional[str]) -> List[Dict]:
+    """Corpus records from a JSONL file (unreadable lines are skipped)"""
+    records = []
+    if not path or not os.path.exists(path):
+        return records
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                print(f"⚠ Skipping unreadable corpus line {line_number}")
+    return records
+
+
+def session_script(record: Optional[Dict], device_names: List[str], rng: random.Random) -> List[str]:
+    """Turn one corpus record (or None: fully random) into the inputs of one session"""
+    if record and isinstance(record.get("inputs"), list):
+        return [str(user_input) for user_input in record["inputs"]]
+
+    if record and record.get("device") and isinstance(record.get("symptoms"), list):
+        responses = record.get("responses") or ["yes"]
+        return [record["device"]] + [str(s) for s in record["symptoms"]] + [""] + [str(r) for r in responses]
+
+    inputs = []
+    if rng.random() < 0.1:
+        inputs.append(rng.choice(UNKNOWN_DEVICES))
+    inputs.append(rng.choice(device_names))
+
+    fragments = _text_fragments(record) if record else []
+    answers = [rng.choice(fragments) if fragments else f"symptom {rng.randint(1, 999)}"
+               for _ in range(SYMPTOM_QUESTIONS)]
+    if rng.random() < 0.3:
+        answers[3] = rng.choice(ERROR_CODES)
+    inputs += answers + [""]
+
+    resolved_at = rng.randint(1, 6)  # 6: never resolved -> escalation
+    inputs += ["no"] * (resolved_at - 1) + (["yes"] if resolved_at <= 5 else [])
+    return inputs
+
+
+# ============================================================================
+# Measurement
+# ============================================================================
+
+class LatencyHistogram:
+    """Log-bucket histogram (5% resolution, 1 µs - 1000 s): bounded memory for long soaks"""
+
+    GROWTH = 1.05
+    MIN_SECONDS = 1e-6
+    BUCKETS = int(math.log(1e9) / math.log(GROWTH)) + 1
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        bucket = int(math.log(max(seconds, self.MIN_SECONDS) / self.MIN_SECONDS) / math.log(self.GROWTH))
+        self.counts[min(bucket, self.BUCKETS - 1)] += 1
+        self.total += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket holding the pct-th percentile (seconds)"""
+        if not self.total:
+            return 0.0
+        rank = self.total * pct / 100
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.MIN_SECONDS * self.GROWTH ** (bucket + 1), self.max)
+        return self.max
+
+    def summary(self) -> Dict:
+        return {
+            "count": self.total,
+            "mean_ms": self.sum / self.total * 1000 if self.total else 0.0,
+            "p50_ms": self.percentile(50) * 1000,
+            "p90_ms": self.percentile(90) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max * 1000
+        }
+
+
+def rss_mb() -> float:
+    """Resident set size of this process in MB"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _growth_mb_per_hour(samples: List[tuple]) -> float:
+    """Least-squares slope of (seconds, MB) samples, in MB per hour"""
+    if len(samples) < 2:
+        return 0.0
+    n = len(samples)
+    mean_t = sum(t for t, _ in samples) / n
+    mean_m = sum(m for _, m in samples) / n
+    var_t = sum((t - mean_t) ** 2 for t, _ in samples)
+    if not var_t:
+        return 0.0
+    return sum((t - mean_t) * (m - mean_m) for t, m in samples) / var_t * 3600
+
+
+# ============================================================================
+# Runner
+# ============================================================================
+
+def run_load(
+    engine,
+    corpus: List[Dict],
+    sessions: Optional[int] = 1000,
+    duration: Optional[float] = None,
+    concurrency: int = 16,
+    think_ms: float = 0,
+    report_every: float = 10,
+    seed: int = 0,
+    quiet: bool = False
+) -> Dict:
+    """
+    Run sessions on `concurrency` threads until `sessions` have completed or
+    `duration` seconds have passed (whichever is set / first).
+    Returns the report dict.
+    """
+    from flow_manager import RepairFlowManager
+
+    device_names = [device["full_name"] for device in engine.device_manager.devices.values()]
+    stage_latency = {stage: LatencyHistogram() for stage in RepairFlowManager.STAGES}
+    session_latency = LatencyHistogram()
+    lock = threading.Lock()
+    counters = {"started": 0, "sessions": 0, "turns": 0, "resolved": 0, "escalated": 0, "errors": 0}
+    start = time.perf_counter()
+    deadline = start + duration if duration else None
+    memory_samples = [(0.0, rss_mb())]
+
+    def next_session() -> Optional[int]:
+        with lock:
+            if sessions is not None and counters["started"] >= sessions:
+                return None
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            counters["started"] += 1
+            return counters["started"]
+
+    def worker(worker_id: int):
+        rng = random.Random(seed * 1000003 + worker_id)
+        while True:
+            number = next_session()
+            if number is None:
+                return
+            record = corpus[number % len(corpus)] if corpus else None
+            inputs = session_script(record, device_names, rng)
+            flow = RepairFlowManager(engine=engine)
+            session_start = time.perf_counter()
+            try:
+                turns = []
+                for user_input in inputs:
+                    if flow.is_complete():
+                        break
+                    stage = flow.current_stage
+                    turn_start = time.perf_counter()
+                    flow.run_next_stage(user_input)
+                    turns.append((stage, time.perf_counter() - turn_start))
+                    if think_ms:
+                        _sleep_ms(think_ms)
+                final = flow.get_final_output() if flow.is_complete() else None
+            except Exception as e:
+                with lock:
+                    counters["errors"] += 1
+                if not quiet:
+                    print(f"⚠ Session {number} failed: {e}")
+                continue
+
+            with lock:
+                for stage, seconds in turns:
+                    stage_latency[stage].add(seconds)
+                session_latency.add(time.perf_counter() - session_start)
+                counters["sessions"] += 1
+                counters["turns"] += len(turns)
+                if final is not None:
+                    counters["resolved" if final["final_status"]["resolved"] else "escalated"] += 1
+
+    def reporter(stop: threading.Event):
+        while not stop.wait(report_every):
+            elapsed = time.perf_counter() - start
+            memory_samples.append((elapsed, rss_mb()))
+            if not quiet:
+                with lock:
+                    done, turns = counters["sessions"], counters["turns"]
+                print(f"[{elapsed:6.0f}s] {done:,} sessions ({done / elapsed:,.1f}/s), "
+                      f"{turns:,} turns ({turns / elapsed:,.0f}/s), RSS {memory_samples[-1][1]:.1f} MB, "
+                      f"cache {_engine_state(engine)['response_cache_entries']:,} entries")
+
+    stop = threading.Event()
+    reporting = threading.Thread(target=reporter, args=(stop,), daemon=True)
+    reporting.start()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    stop.set()
+    reporting.join()
+
+    elapsed = time.perf_counter() - start
+    memory_samples.append((elapsed, rss_mb()))
+    # Growth after warm-up: ignore the first fifth of the run
+    steady = [sample for sample in memory_samples if sample[0] >= elapsed / 5]
+
+    return {
+        "config": {"concurrency": concurrency, "sessions": sessions, "duration": duration,
+                   "think_ms": think_ms, "corpus_records": len(corpus)},
+        "elapsed_s": elapsed,
+        "sessions": counters["sessions"],
+        "turns": counters["turns"],
+        "resolved": counters["resolved"],
+        "escalated": counters["escalated"],
+        "errors": counters["errors"],
+        "sessions_per_sec": counters["sessions"] / elapsed,
+        "turns_per_sec": counters["turns"] / elapsed,
+        "session_latency": session_latency.summary(),
+        "stage_latency": {stage: histogram.summary() for stage, histogram in stage_latency.items()},
+        "memory": {
+            "start_mb": memory_samples[0][1],
+            "end_mb": memory_samples[-1][1],
+            "peak_mb": max(mb for _, mb in memory_samples),
+            "growth_mb_per_hour": _growth_mb_per_hour(steady),
+            "samples": [(round(t, 1), round(mb, 1)) for t, mb in memory_samples]
+        },
+        # Bounded engine-wide state - the usual suspects when memory keeps growing
+        "engine_state": _engine_state(engine)
+    }
+
+
+def _engine_state(engine) -> Dict:
+    cache = engine.task_router.cache
+    return {
+        "response_cache_entries": cache.get_metrics()["_cache"]["entries"] if cache is not None else 0,
+        "response_cache_max_entries": cache.max_entries if cache is not None else 0,
+        "step_outcome_keys": len(engine.outcomes),
+        "error_code_index_keys": len(engine.rag.error_code_index)
+    }
+
+
+def print_report(report: Dict):
+    print("\n" + "="*60)
+    print("LOAD TEST REPORT")
+    print("="*60)
+    print(f"\n{report['sessions']:,} sessions, {report['turns']:,} turns in {report['elapsed_s']:.1f}s "
+          f"({report['config']['concurrency']} concurrent)")
+    print(f"Throughput: {report['sessions_per_sec']:,.1f} sessions/s, {report['turns_per_sec']:,.0f} turns/s")
+    print(f"Outcomes: {report['resolved']:,} resolved, {report['escalated']:,} escalated, {report['errors']} errors")
+
+    print(f"\n{'stage':<20} {'turns':>8} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}")
+    rows = list(report["stage_latency"].items()) + [("(whole session)", report["session_latency"])]
+    for stage, stats in rows:
+        print(f"{stage:<20} {stats['count']:>8,} {stats['p50_ms']:>7.1f}ms {stats['p90_ms']:>7.1f}ms "
+              f"{stats['p99_ms']:>7.1f}ms {stats['max_ms']:>7.1f}ms")
+
+    memory = report["memory"]
+    print(f"\nMemory: {memory['start_mb']:.1f} MB -> {memory['end_mb']:.1f} MB (peak {memory['peak_mb']:.1f} MB), "
+          f"steady-state growth {memory['growth_mb_per_hour']:+.1f} MB/hour")
+    state = report["engine_state"]
+    print(f"Engine state: response cache {state['response_cache_entries']:,}/{state['response_cache_max_entries']:,} "
+          f"entries, {state['step_outcome_keys']:,} step outcome keys")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent session load generator / soak test")
+    parser.add_argument("--corpus", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "requests.jsonl"),
+                        help="JSONL corpus of sessions (default: requests.jsonl)")
+    parser.add_argument("--sessions", type=int, default=None, help="stop after this many sessions")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds (soak)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--think-ms", type=float, default=0, help="pause between turns of a session")
+    parser.add_argument("--search-latency-ms", type=float, default=30, help="Qdrant stand-in round trip")
+    parser.add_argument("--embed-latency-ms", type=float, default=60, help="VoyageAI stand-in round trip")
+    parser.add_argument("--llm-latency-ms", type=float, default=400, help="OpenAI stand-in time to first token")
+    parser.add_argument("--llm-token-ms", type=float, default=15, help="OpenAI stand-in time per token")
+    parser.add_argument("--no-llm-steps", action="store_true", help="never generate repair steps with the LLM")
+    parser.add_argument("--report-every", type=float, default=10, help="seconds between progress lines")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    # The stand-in chat model serves every LLM call; a placeholder key lets clients construct
+    os.environ.setdefault("OPENAI_API_KEY", "sk-loadgen-placeholder")
+
+    if args.sessions is None and args.duration is None:
+        args.sessions = 1000
+
+    engine = build_engine(
+        search_latency_ms=args.search_latency_ms,
+        embed_latency_ms=args.embed_latency_ms,
+        llm_first_token_ms=args.llm_latency_ms,
+        llm_token_ms=args.llm_token_ms,
+        llm_steps=not args.no_llm_steps
+    )
+    corpus = load_corpus(args.corpus)
+    print(f"Corpus: {len(corpus):,} records from {args.corpus}" if corpus else "Corpus: none (random sessions)")
+
+    report = run_load(
+        engine,
+        corpus,
+        sessions=args.sessions,
+        duration=args.duration,
+        concurrency=args.concurrency,
+        think_ms=args.think_ms,
+        report_every=args.report_every,
+        seed=args.seed
+    )
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Microbenchmarks for the hot paths, with JSON results and baseline comparison
+
+Cases:
+    device_manager.load_csv                 DeviceManager() from devices.csv
+    device_manager.load[rows=N]             index build for a synthetic catalog
+    find_device.exact|substring|fuzzy|miss[rows=N]
+    flow.build_symptom_summary / flow.get_final_output / flow.get_state_json
+    session.full                            whole scripted session, stubbed services
+
+Usage:
+    python microbench.py                                  # all cases, table to stdout
+    python microbench.py --json baseline.json             # store results
+    python microbench.py --compare baseline.json          # exit 1 on regressions
+    python microbench.py --sizes 40,10000 --filter find_device --threshold 0.2
+
+Each case is timed in calibrated batches (at least --min-time seconds) and
+repeated; the median per-operation time is reported and compared. A case is
+a regression when it is slower than the baseline by more than --threshold
+(default 10%).
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from benchmarks import SESSION_SCRIPT, OfflineRAG, _synthetic_catalog
+
+DEFAULT_SIZES = (40, 1000, 10000, 100000, 1000000)
+FORMAT_VERSION = 1
+
+
+# ============================================================================
+# Timing
+# ============================================================================
+
+def _time_loops(fn: Callable[[], object], loops: int) -> float:
+    start = time.perf_counter()
+    for _ in range(loops):
+        fn()
+    return time.perf_counter() - start
+
+
+def measure(fn: Callable[[], object], min_time: float = 0.2, repeat: int = 5) -> Dict:
+    """
+    Time `fn` in batches of `loops` calls, doubling the batch until it runs
+    for at least `min_time`, then take `repeat` batches. Calls slower than a
+    second are repeated 3 times only.
+    """
+    loops = 1
+    while True:
+        elapsed = _time_loops(fn, loops)
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed * 10 >= min_time else 10
+
+    if elapsed / loops > 1.0:
+        repeat = min(repeat, 3)
+    samples = [elapsed] + [_time_loops(fn, loops) for _ in range(repeat - 1)]
+    per_op = [sample / loops * 1e6 for sample in samples]
+    return {
+        "us_per_op": statistics.median(per_op),
+        "min_us": min(per_op),
+        "stdev_us": statistics.stdev(per_op) if len(per_op) > 1 else 0.0,
+        "loops": loops,
+        "repeat": len(per_op)
+    }
+
+
+# ============================================================================
+# Cases
+# ============================================================================
+
+class Case:
+    """A named benchmark: `setup()` returns the callable to time"""
+
+    def __init__(self, name: str, setup: Callable[[], Callable[[], object]], params: Optional[Dict] = None):
+        self.name = name
+        self.setup = setup
+        self.params = params or {}
+
+
+def _quiet():
+    # DeviceManager / engine construction print status lines
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def _device_manager_cases(sizes) -> List[Case]:
+    from device_manager import DeviceManager
+
+    def load_csv():
+        with _quiet():
+            DeviceManager()
+        return lambda: DeviceManager()
+
+    cases = [Case("device_manager.load_csv", load_csv)]
+    state = {}
+
+    def catalog(rows: int):
+        # One catalog and manager per size, shared by its cases
+        if state.get("rows") != rows:
+            state.clear()
+            devices = _synthetic_catalog(rows)
+            state.update(rows=rows, devices=devices, manager=DeviceManager(devices=devices))
+        return state
+
+    def load(rows: int):
+        devices = catalog(rows)["devices"]
+        return lambda: DeviceManager(devices=devices)
+
+    def lookup(rows: int, kind: str):
+        manager = catalog(rows)["manager"]
+        # A device from the middle of the catalog, so scans are representative
+        device = list(manager.devices.values())[rows // 2]
+        model = device["model"]
+        query = {
+            "exact": device["full_name"],
+            "substring": f"my {model} unit",
+            "fuzzy": model[:-3] + "x" + model[-2:],
+            "miss": "Acme Frobnicator 9000"
+        }[kind]
+
+        result = manager.find_device(query)
+        path = ("miss" if not result["is_known"] else
+                "fuzzy" if "match_confidence" in result else
+                "exact" if query.lower().strip() in manager.device_index else "substring")
+        if path != kind:
+            raise AssertionError(f"find_device({query!r}) took the {path} path, expected {kind}")
+        return lambda: manager.find_device(query)
+
+    for rows in sizes:
+        cases.append(Case(f"device_manager.load[rows={rows}]", lambda rows=rows: load(rows), {"rows": rows}))
+        for kind in ("exact", "substring", "fuzzy", "miss"):
+            cases.append(Case(
+                f"find_device.{kind}[rows={rows}]",
+                lambda rows=rows, kind=kind: lookup(rows, kind),
+                {"rows": rows}
+            ))
+    return cases
+
+
+def _flow_cases() -> List[Case]:
+    from device_manager import DeviceManager
+    from flow_manager import RepairFlowManager
+    from repair_engine import RepairEngine
+
+    state = {}
+
+    def engine():
+        if "engine" not in state:
+            with _quiet():
+                state["engine"] = RepairEngine(device_manager=DeviceManager(), rag=OfflineRAG())
+        return state["engine"]
+
+    def run_session() -> RepairFlowManager:
+        flow = RepairFlowManager(engine=engine())
+        for user_input in SESSION_SCRIPT:
+            flow.run_next_stage(user_input)
+        return flow
+
+    def session():
+        engine()
+        return run_session
+
+    def flow_method(name: str):
+        # Timed on a completed (escalated) session
+        return getattr(run_session(), name)
+
+    return [
+        Case("flow.build_symptom_summary", lambda: flow_method("_build_symptom_summary")),
+        Case("flow.get_final_output", lambda: flow_method("get_final_output")),
+        Case("flow.get_state_json", lambda: flow_method("get_state_json")),
+        Case("session.full", session, {"turns": len(SESSION_SCRIPT)}),
+    ]
+
+
+def all_cases(sizes=DEFAULT_SIZES) -> List[Case]:
+    return _device_manager_cases(sizes) + _flow_cases()
+
+
+# ============================================================================
+# Running and comparing
+# ============================================================================
+
+def _git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, timeout=10
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def run(cases: List[Case], min_time: float = 0.2, repeat: int = 5, quiet: bool = False) -> Dict:
+    """Run the cases; returns the JSON-serializable results document"""
+    results = {}
+    for case in cases:
+        with _quiet():
+            fn = case.setup()
+            fn()  # warm up
+            timing = measure(fn, min_time=min_time, repeat=repeat)
+        results[case.name] = {**timing, "params": case.params}
+        if not quiet:
+            print(f"{case.name:<42} {_format_us(timing['us_per_op']):>12}  "
+                  f"±{timing['stdev_us'] / timing['us_per_op']:5.1%}  ({timing['loops']} x {timing['repeat']})",
+                  flush=True)
+
+    return {
+        "format": FORMAT_VERSION,
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "results": results
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = 0.10) -> List[Dict]:
+    """
+    Per-case change against a baseline results document. status is
+    "regression" (slower by more than threshold), "improvement" (faster by
+    more than threshold), "ok", "new" or "missing".
+    """
+    rows = []
+    old_results, new_results = baseline.get("results", {}), current.get("results", {})
+    for name in list(new_results) + [name for name in old_results if name not in new_results]:
+        old, new = old_results.get(name), new_results.get(name)
+        if old is None or new is None:
+            rows.append({"name": name, "status": "new" if old is None else "missing",
+                         "baseline_us": old and old["us_per_op"], "current_us": new and new["us_per_op"]})
+            continue
+        change = new["us_per_op"] / old["us_per_op"] - 1
+        status = "regression" if change > threshold else "improvement" if change < -threshold else "ok"
+        rows.append({"name": name, "status": status, "baseline_us": old["us_per_op"],
+                     "current_us": new["us_per_op"], "change": change})
+    return rows
+
+
+def _format_us(us: Optional[float]) -> str:
+    if us is None:
+        return "-"
+    if us >= 1e6:
+        return f"{us / 1e6:.2f} s"
+    if us >= 1e3:
+        return f"{us / 1e3:.2f} ms"
+    return f"{us:.2f} µs"
+
+
+def print_comparison(rows: List[Dict], threshold: float):
+    print("\n" + "="*60)
+    print(f"COMPARISON (threshold {threshold:.0%})")
+    print("="*60)
+    marks = {"regression": "✗ REGRESSION", "improvement": "✓ faster", "ok": "", "new": "new", "missing": "missing"}
+    for row in rows:
+        change = f"{row['change']:+.1%}" if "change" in row else ""
+        print(f"{row['name']:<42} {_format_us(row['baseline_us']):>12} -> {_format_us(row['current_us']):>12}"
+              f"  {change:>8}  {marks[row['status']]}")
+
+    regressions = sum(row["status"] == "regression" for row in rows)
+    print(f"\n{'✗' if regressions else '✓'} {regressions} regression(s) in {len(rows)} case(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot-path microbenchmarks")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="comma-separated synthetic catalog sizes")
+    parser.add_argument("--filter", help="regex selecting case names")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per timed batch")
+    parser.add_argument("--repeat", type=int, default=5, help="timed batches per case")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="baseline results file; exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="regression threshold (0.10 = 10%% slower)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    cases = all_cases(sizes)
+    if args.filter:
+        cases = [case for case in cases if re.search(args.filter, case.name)]
+
+    print("\n" + "="*60)
+    print(f"MICROBENCHMARKS ({len(cases)} cases)")
+    print("="*60)
+    current = run(cases, min_time=args.min_time, repeat=args.repeat)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(current, baseline, args.threshold)
+        print_comparison(rows, args.threshold)
+        if any(row["status"] == "regression" for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
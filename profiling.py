@@ -0,0 +1,243 @@
+"""On-demand profiling of sampled sessions: cProfile call stacks and tracemalloc allocations"""
+import contextlib
+import hashlib
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Set, Tuple
+
+_NOT_PROFILED = contextlib.nullcontext()
+
+
+class SessionProfiler:
+    """
+    Profiles every turn (RepairEngine.step) of a sampled subset of sessions.
+
+    PROFILE_SAMPLE_RATE (default 0 = off) selects sessions by a hash of the
+    session id, so all turns of a session - on any worker - are in or out.
+    force(session_id) profiles one session regardless (debug sidebar toggle)
+    until it is unforced or completes.
+
+    Per profiled turn, PROFILE_DIR/<session_id>/ gets:
+        turn-NN-<stage>.collapsed    cProfile time as collapsed stacks (µs),
+                                     for flamegraph.pl / speedscope
+        turn-NN-<stage>.pstats       raw cProfile stats (pstats / snakeviz)
+        turn-NN-<stage>.alloc.txt    top allocations still held after the turn
+                                     (PROFILE_MEMORY=true, off by default)
+    and PROFILE_DIR/index.jsonl one summary line.
+
+    cProfile and tracemalloc are process-wide on recent Pythons, so one turn
+    is profiled at a time; a sampled turn overlapping another is skipped
+    (counted in skipped_turns). Unsampled turns cost at most one hash.
+    tracemalloc slows every thread while it runs and its report includes
+    allocations made by other threads during the turn, hence opt-in.
+    """
+
+    _shared: Optional["SessionProfiler"] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        sample_rate: Optional[float] = None,
+        output_dir: Optional[str] = None,
+        memory: Optional[bool] = None,
+        top_allocations: int = 25,
+        traceback_frames: int = 8
+    ):
+        if sample_rate is None:
+            sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+        if memory is None:
+            memory = os.getenv("PROFILE_MEMORY", "false").lower() == "true"
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.output_dir = output_dir or os.getenv("PROFILE_DIR", "profiles")
+        self.memory = memory
+        self.top_allocations = top_allocations
+        self.traceback_frames = traceback_frames
+        self.forced: Set[str] = set()
+        self.profiled_turns = 0
+        self.skipped_turns = 0
+        self._busy = threading.Lock()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "SessionProfiler":
+        """Process-wide profiler used by the engine"""
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
+
+    def force(self, session_id: str, enabled: bool = True):
+        """Profile (or stop force-profiling) one session regardless of the sample rate"""
+        with self._lock:
+            if enabled:
+                self.forced.add(session_id)
+            else:
+                self.forced.discard(session_id)
+
+    def is_sampled(self, session_id: str) -> bool:
+        if session_id in self.forced:
+            return True
+        if self.sample_rate <= 0:
+            return False
+        digest = hashlib.sha1(session_id.encode("utf-8")).digest()
+        return int.from_bytes(digest[:4], "big") < self.sample_rate * 2 ** 32
+
+    def session_dir(self, session_id: str) -> str:
+        return os.path.join(self.output_dir, session_id)
+
+    def profile(self, session_id: str, stage: str, turn: int):
+        """
+        Context manager around one turn: profiles it if the session is sampled.
+        turn numbers the report files (the session's persisted turn count + 1,
+        so numbering survives restarts and other workers).
+        """
+        if not self.forced and self.sample_rate <= 0:
+            return _NOT_PROFILED
+        if not self.is_sampled(session_id):
+            return _NOT_PROFILED
+        return self._profile_turn(session_id, stage, turn)
+
+    @contextlib.contextmanager
+    def _profile_turn(self, session_id: str, stage: str, turn: int):
+        if not self._busy.acquire(blocking=False):
+            with self._lock:
+                self.skipped_turns += 1
+            yield
+            return
+
+        import cProfile
+        profiler = cProfile.Profile()
+        trace_memory = self.memory and not tracemalloc.is_tracing()
+        try:
+            if trace_memory:
+                tracemalloc.start(self.traceback_frames)
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                wall_ms = (time.perf_counter() - start) * 1000
+                snapshot = peak = None
+                if trace_memory:
+                    snapshot = tracemalloc.take_snapshot()
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                try:
+                    self._write_reports(session_id, turn, stage, profiler, wall_ms, snapshot, peak)
+                except Exception as e:
+                    # Never fail a user turn because of profiling
+                    print(f"⚠ Profiling report error: {e}")
+        finally:
+            self._busy.release()
+
+    def _write_reports(self, session_id: str, turn: int, stage: str, profiler, wall_ms: float,
+                       snapshot: Optional[tracemalloc.Snapshot], peak: Optional[int]):
+        with self._lock:
+            self.profiled_turns += 1
+
+        directory = self.session_dir(session_id)
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"turn-{turn:02d}-{stage}")
+
+        stats = pstats.Stats(profiler)
+        profiler.dump_stats(base + ".pstats")
+        with open(base + ".collapsed", "w", encoding="utf-8") as f:
+            for stack, microseconds in collapsed_stacks(stats):
+                f.write(f"{stack} {microseconds}\n")
+
+        files = [base + ".collapsed", base + ".pstats"]
+        if snapshot is not None:
+            with open(base + ".alloc.txt", "w", encoding="utf-8") as f:
+                f.write(allocation_report(snapshot, peak, self.top_allocations))
+            files.append(base + ".alloc.txt")
+
+        summary = {
+            "ts": round(time.time(), 3),
+            "session_id": session_id,
+            "turn": turn,
+            "stage": stage,
+            "wall_ms": round(wall_ms, 3),
+            "cpu_calls": stats.total_calls,
+            "peak_traced_kb": round(peak / 1024, 1) if peak is not None else None,
+            "files": [os.path.relpath(path, self.output_dir) for path in files]
+        }
+        with self._lock:
+            with open(os.path.join(self.output_dir, "index.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(summary) + "\n")
+
+
+def _frame_name(func: Tuple[str, int, str]) -> str:
+    filename, line, name = func
+    if filename == "~":
+        # Built-ins: ('~', 0, "<built-in method time.sleep>")
+        return name.strip("<>")
+    return f"{os.path.basename(filename)}:{name}:{line}"
+
+
+def collapsed_stacks(stats: pstats.Stats, min_microseconds: int = 1, max_depth: int = 64) -> List[Tuple[str, int]]:
+    """
+    Collapsed-stack lines ("root;caller;callee self_µs") rebuilt from cProfile's
+    caller/callee edges. cProfile records edges, not full stacks, so a
+    function's time is split across its callers in proportion to each
+    caller's share of its cumulative time.
+    """
+    entries = stats.stats  # func -> (cc, nc, tt, ct, callers{caller: (cc, nc, tt, ct)})
+    callees: Dict[tuple, List[Tuple[tuple, float, float]]] = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            # Edge stats from the caller's point of view: (.., .., tt, ct)
+            callees.setdefault(caller, []).append((func, edge[2], edge[3]))
+
+    roots = [func for func, entry in entries.items() if not any(caller in entries for caller in entry[4])]
+    lines: Dict[str, float] = {}
+
+    def walk(func: tuple, path: List[str], on_path: Set[tuple], own_time: float, cumulative: float):
+        name = ";".join(path)
+        lines[name] = lines.get(name, 0.0) + own_time
+        if len(path) >= max_depth:
+            return
+        total = entries[func][3] or 1e-12
+        share = cumulative / total
+        for callee, edge_own, edge_cumulative in callees.get(func, ()):
+            if callee in on_path or edge_cumulative * share * 1e6 < min_microseconds:
+                continue
+            on_path.add(callee)
+            walk(callee, path + [_frame_name(callee)], on_path, edge_own * share, edge_cumulative * share)
+            on_path.discard(callee)
+
+    for root in roots:
+        walk(root, [_frame_name(root)], {root}, entries[root][2], entries[root][3])
+
+    return sorted(
+        ((stack, round(seconds * 1e6)) for stack, seconds in lines.items() if round(seconds * 1e6) >= min_microseconds),
+        key=lambda item: item[0]
+    )
+
+
+def allocation_report(snapshot: tracemalloc.Snapshot, peak: Optional[int], limit: int = 25) -> str:
+    """Top allocation sites (by size) still held at the end of the turn"""
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ])
+    statistics = snapshot.statistics("traceback")
+    total = sum(stat.size for stat in statistics)
+    lines = [
+        f"Held after turn: {total / 1024:.1f} KB in {sum(stat.count for stat in statistics)} blocks"
+        + (f", peak during turn: {peak / 1024:.1f} KB" if peak is not None else ""),
+        "Process-wide: includes allocations made by other threads while the turn ran.",
+        ""
+    ]
+    for rank, stat in enumerate(statistics[:limit], 1):
+        lines.append(f"#{rank}: {stat.size / 1024:.1f} KB in {stat.count} blocks")
+        for line in stat.traceback.format(most_recent_first=True)[:6]:
+            lines.append(f"    {line}")
+        lines.append("")
+    return "\n".join(lines)
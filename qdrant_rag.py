@@ -1,18 +1,102 @@
 """Qdrant RAG integration with VoyageAI embeddings"""
 import os
 import json
-from typing import List, Dict, Optional
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-import voyageai
+import threading
+import uuid
+from typing import Any, List, Dict, Optional, Tuple
 from dotenv import load_dotenv
+from error_codes import extract_error_codes, normalize_error_code
+from tracing import Tracer
+
+# qdrant_client and voyageai are imported on first use (see _connect):
+# together they add ~2s to cold start
 
 # Load environment variables
 load_dotenv()
 
+# Namespace for deterministic chunk point IDs (parent_id + chunk index)
+CHUNK_ID_NAMESPACE = uuid.UUID("5d1c7a52-8f3e-4b7e-9a36-2f0c4e1b9d11")
+
+# Seeded into an empty collection
+SAMPLE_MANUALS = [
+    {
+        "id": 1,
+        "device_model": "SMS6EDI06E",
+        "device_name": "Bosch Dishwasher Serie 6 SMS6EDI06E",
+        "symptoms": "no water entry, error code E:15",
+        "steps": [
+            "Step 1: Check water inlet valve - listen for buzzing sound",
+            "Step 2: Inspect inlet hose for kinks or blockages",
+            "Step 3: Test water pressure at inlet - should be 0.3-1 MPa",
+            "Step 4: Replace inlet valve if water doesn't flow",
+            "Step 5: Reset error code and run test cycle"
+        ],
+        "resolution": "Replace water inlet valve - common failure"
+    },
+    {
+        "id": 2,
+        "device_model": "SMS6EDI06E",
+        "device_name": "Bosch Dishwasher Serie 6 SMS6EDI06E",
+        "symptoms": "error code E:25, excessive noise during pump",
+        "steps": [
+            "Step 1: Inspect drain filter for foreign objects",
+            "Step 2: Check pump impeller rotation",
+            "Step 3: Verify pump seal condition",
+            "Step 4: Replace drain pump if damaged",
+            "Step 5: Run diagnostic cycle to verify"
+        ],
+        "resolution": "Replace drain pump assembly"
+    },
+    {
+        "id": 3,
+        "device_model": "WAX28E91",
+        "device_name": "Bosch Washing Machine WAX28E91",
+        "symptoms": "not spinning, clothes still wet",
+        "steps": [
+            "Step 1: Check door lock mechanism",
+            "Step 2: Inspect belt for wear or breaks",
+            "Step 3: Test motor operation with continuity tester",
+            "Step 4: Replace belt if worn",
+            "Step 5: Verify spin cycle functionality"
+        ],
+        "resolution": "Replace drive belt - normal wear item"
+    },
+    {
+        "id": 4,
+        "device_model": "RF32CG5100",
+        "device_name": "Samsung French Door Refrigerator RF32CG5100",
+        "symptoms": "not cooling, ice buildup in freezer",
+        "steps": [
+            "Step 1: Defrost evaporator coils",
+            "Step 2: Check refrigerant lines for blockage",
+            "Step 3: Test compressor start relay",
+            "Step 4: Verify thermostat sensor function",
+            "Step 5: Replace air damper if stuck"
+        ],
+        "resolution": "Defrost cycle + component testing required"
+    },
+    {
+        "id": 5,
+        "device_model": "LCRM1650",
+        "device_name": "LG Microwave Oven LCRM1650",
+        "symptoms": "no heating, fan works",
+        "steps": [
+            "Step 1: Test magnetron continuity",
+            "Step 2: Check high-voltage transformer",
+            "Step 3: Inspect power supply board",
+            "Step 4: Replace magnetron if failed",
+            "Step 5: Run heating test cycle"
+        ],
+        "resolution": "Replace magnetron tube - common failure"
+    }
+]
+
 class QdrantRAG:
     """RAG system using Qdrant Cloud and VoyageAI embeddings"""
     
+    SECTION_MAX_CHARS = 1200  # Max characters per section chunk
+    CHUNKS_PER_MANUAL = 5     # Max chunks returned per manual (one per repair attempt)
+    
     def __init__(self):
         self.qdrant_url = os.getenv("QDRANT_URL", "http://localhost:6333")
         self.qdrant_api_key = os.getenv("QDRANT_API_KEY", "")
@@ -20,9 +104,63 @@ class QdrantRAG:
         self.voyage_model = os.getenv("VOYAGE_MODEL_NAME", "voyage-3-large")
         self.collection_name = os.getenv("QDRANT_COLLECTION_NAME", "repair_manuals")
         
-        # Initialize clients
+        # Clients connect on first use
+        self._client = None
+        self._voyage_client = None
+        self._connected = False
+        self._connecting = False
+        self._connect_lock = threading.RLock()
+        
+        # (device_model, error_code) -> solutions, filled at ingestion and
+        # loaded from the collection on connect
+        self.error_code_index: Dict[Tuple[str, str], List[Dict]] = {}
+        self._index_lock = threading.Lock()
+        self.tracer = Tracer.shared()
+    
+    @property
+    def embeddings_configured(self) -> bool:
+        """True if a VoyageAI key is set (checked without connecting)"""
+        return self.voyage_api_key not in ["pa-placeholder-add-your-key", ""]
+    
+    @property
+    def client(self) -> Any:
+        """Qdrant client, connected on first access"""
+        if not self._connected:
+            self._connect()
+        return self._client
+    
+    @client.setter
+    def client(self, client: Any):
+        self._client = client
+    
+    @property
+    def voyage_client(self) -> Any:
+        """VoyageAI client, created on first access"""
+        if not self._connected:
+            self._connect()
+        return self._voyage_client
+    
+    @voyage_client.setter
+    def voyage_client(self, voyage_client: Any):
+        self._voyage_client = voyage_client
+    
+    def _connect(self):
+        """Import client libraries, connect and prepare the collection"""
+        # RLock: collection setup re-enters through the client properties
+        with self._connect_lock:
+            if self._connected or self._connecting:
+                return
+            self._connecting = True
+            try:
+                self._initialize_clients()
+            finally:
+                self._connected = True
+                self._connecting = False
+    
+    def _initialize_clients(self):
         try:
-            self.client = QdrantClient(
+            from qdrant_client import QdrantClient
+            self._client = QdrantClient(
                 url=self.qdrant_url,
                 api_key=self.qdrant_api_key if self.qdrant_api_key else None,
                 prefer_grpc=False
@@ -30,29 +168,52 @@ class QdrantRAG:
             print(f"[OK] Connected to Qdrant: {self.qdrant_url}")
         except Exception as e:
             print(f"[WARN] Qdrant connection error: {e}")
-            self.client = None
+            self._client = None
         
-        if self.voyage_api_key and self.voyage_api_key not in ["pa-placeholder-add-your-key", ""]:
+        if self.embeddings_configured:
             try:
-                self.voyage_client = voyageai.Client(api_key=self.voyage_api_key)
+                import voyageai
+                self._voyage_client = voyageai.Client(api_key=self.voyage_api_key)
                 print(f"[OK] Connected to VoyageAI with model: {self.voyage_model}")
             except Exception as e:
                 print(f"[WARN] VoyageAI initialization error: {e}")
-                self.voyage_client = None
+                self._voyage_client = None
         else:
-            self.voyage_client = None
+            self._voyage_client = None
             print("[WARN] VoyageAI API key not configured - embeddings disabled")
         
-        if self.client:
+        self._prepare_collection()
+    
+    def _prepare_collection(self):
+        if self._client:
             try:
                 self._ensure_collection_exists()
-                if self.voyage_client:
+                if self._voyage_client:
                     self._seed_sample_data()
+                self._load_error_code_index()
             except Exception as e:
                 print(f"⚠ Collection initialization error: {e}")
     
+    def warm_up(self):
+        """Connect and prepare the collection now, so the first search does not pay for it"""
+        if not self._connected:
+            self._connect()
+    
+    def attach_clients(self, client: Any, voyage_client: Any):
+        """
+        Use already constructed clients instead of connecting from the
+        environment (load tests, recorded sessions). Prepares the collection
+        the same way as a regular connect.
+        """
+        with self._connect_lock:
+            self._client = client
+            self._voyage_client = voyage_client
+            self._connected = True
+            self._prepare_collection()
+    
     def _ensure_collection_exists(self):
         """Create collection if doesn't exist"""
+        from qdrant_client.models import Distance, VectorParams, PayloadSchemaType
         try:
             self.client.get_collection(self.collection_name)
         except:
@@ -65,6 +226,12 @@ class QdrantRAG:
                 )
             )
             print(f"[OK] Created collection: {self.collection_name}")
+            # Chunks are grouped and fetched by parent manual
+            self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name="parent_id",
+                field_schema=PayloadSchemaType.KEYWORD
+            )
     
     def _seed_sample_data(self):
         """Seed sample repair manuals if collection is empty"""
@@ -77,103 +244,197 @@ class QdrantRAG:
     
     def _populate_sample_manuals(self):
         """Populate with sample repair data"""
-        sample_manuals = [
-            {
-                "id": 1,
-                "device_model": "SMS6EDI06E",
-                "device_name": "Bosch Dishwasher Serie 6 SMS6EDI06E",
-                "symptoms": "no water entry, error code E:15",
-                "steps": [
-                    "Step 1: Check water inlet valve - listen for buzzing sound",
-                    "Step 2: Inspect inlet hose for kinks or blockages",
-                    "Step 3: Test water pressure at inlet - should be 0.3-1 MPa",
-                    "Step 4: Replace inlet valve if water doesn't flow",
-                    "Step 5: Reset error code and run test cycle"
-                ],
-                "resolution": "Replace water inlet valve - common failure"
-            },
-            {
-                "id": 2,
-                "device_model": "SMS6EDI06E",
-                "device_name": "Bosch Dishwasher Serie 6 SMS6EDI06E",
-                "symptoms": "error code E:25, excessive noise during pump",
-                "steps": [
-                    "Step 1: Inspect drain filter for foreign objects",
-                    "Step 2: Check pump impeller rotation",
-                    "Step 3: Verify pump seal condition",
-                    "Step 4: Replace drain pump if damaged",
-                    "Step 5: Run diagnostic cycle to verify"
-                ],
-                "resolution": "Replace drain pump assembly"
-            },
-            {
-                "id": 3,
-                "device_model": "WAX28E91",
-                "device_name": "Bosch Washing Machine WAX28E91",
-                "symptoms": "not spinning, clothes still wet",
-                "steps": [
-                    "Step 1: Check door lock mechanism",
-                    "Step 2: Inspect belt for wear or breaks",
-                    "Step 3: Test motor operation with continuity tester",
-                    "Step 4: Replace belt if worn",
-                    "Step 5: Verify spin cycle functionality"
-                ],
-                "resolution": "Replace drive belt - normal wear item"
-            },
-            {
-                "id": 4,
-                "device_model": "RF32CG5100",
-                "device_name": "Samsung French Door Refrigerator RF32CG5100",
-                "symptoms": "not cooling, ice buildup in freezer",
-                "steps": [
-                    "Step 1: Defrost evaporator coils",
-                    "Step 2: Check refrigerant lines for blockage",
-                    "Step 3: Test compressor start relay",
-                    "Step 4: Verify thermostat sensor function",
-                    "Step 5: Replace air damper if stuck"
-                ],
-                "resolution": "Defrost cycle + component testing required"
-            },
-            {
-                "id": 5,
-                "device_model": "LCRM1650",
-                "device_name": "LG Microwave Oven LCRM1650",
-                "symptoms": "no heating, fan works",
-                "steps": [
-                    "Step 1: Test magnetron continuity",
-                    "Step 2: Check high-voltage transformer",
-                    "Step 3: Inspect power supply board",
-                    "Step 4: Replace magnetron if failed",
-                    "Step 5: Run heating test cycle"
-                ],
-                "resolution": "Replace magnetron tube - common failure"
+        # Chunk, embed and store
+        for manual in SAMPLE_MANUALS:
+            self.ingest_manual(manual, parent_id=str(manual["id"]))
+        print(f"Seeded {len(SAMPLE_MANUALS)} repair manuals")
+    
+    def _chunk_manual(self, manual: Dict, parent_id: str) -> List[Dict]:
+        """
+        Split a manual into chunks linked by parent_id:
+        one overview chunk, one chunk per step, and section chunks
+        (long section text is split on paragraph boundaries)
+        """
+        header = f"{manual['device_name']} {manual.get('symptoms', '')}".strip()
+        error_codes = self._manual_error_codes(manual)
+        base_payload = {
+            "parent_id": parent_id,
+            "device_model": manual["device_model"],
+            "device_name": manual["device_name"],
+            "symptoms": manual.get("symptoms", ""),
+            "resolution": manual.get("resolution", "")
+        }
+        
+        chunks = [{
+            "embed_text": f"{header} {manual.get('resolution', '')}".strip(),
+            "payload": {
+                **base_payload,
+                "chunk_type": "overview",
+                "text": header
             }
-        ]
+        }]
         
-        # Embed and store
-        for manual in sample_manuals:
-            text = f"{manual['device_name']} {manual['symptoms']} {' '.join(manual['steps'])}"
-            
-            # Get embedding from VoyageAI
-            embedding = self.get_embedding(text)
+        for step_index, step in enumerate(manual.get("steps", [])):
+            chunks.append({
+                "embed_text": f"{header} {step}",
+                "payload": {
+                    **base_payload,
+                    "chunk_type": "step",
+                    "step_index": step_index,
+                    "text": step,
+                    # Lets the error-code index be rebuilt from step points alone
+                    "error_codes": error_codes
+                }
+            })
+        
+        for section in manual.get("sections", []):
+            title = section.get("title", "")
+            piece = ""
+            pieces = []
+            for paragraph in section.get("text", "").split("\n\n"):
+                if piece and len(piece) + len(paragraph) > self.SECTION_MAX_CHARS:
+                    pieces.append(piece)
+                    piece = ""
+                piece = f"{piece}\n\n{paragraph}" if piece else paragraph
+            if piece:
+                pieces.append(piece)
             
-            if embedding:
-                point = PointStruct(
-                    id=manual["id"],
-                    vector=embedding,
-                    payload={
-                        "device_model": manual["device_model"],
-                        "device_name": manual["device_name"],
-                        "symptoms": manual["symptoms"],
-                        "steps": manual["steps"],
-                        "resolution": manual["resolution"]
+            for text in pieces:
+                chunks.append({
+                    "embed_text": f"{manual['device_name']} {title} {text}",
+                    "payload": {
+                        **base_payload,
+                        "chunk_type": "section",
+                        "section_title": title,
+                        "text": text
                     }
+                })
+        
+        for chunk_index, chunk in enumerate(chunks):
+            chunk["id"] = str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{parent_id}:{chunk_index}"))
+            chunk["payload"]["chunk_index"] = chunk_index
+        
+        return chunks
+    
+    def ingest_manual(self, manual: Dict, parent_id: Optional[str] = None) -> Optional[str]:
+        """
+        Chunk a manual into step/section points and store them, replacing
+        the chunks of an earlier ingest of the same manual.
+        Returns the parent ID linking the chunks, or None on failure.
+        """
+        from qdrant_client.models import FieldCondition, Filter, FilterSelector, MatchValue, PointStruct
+        parent_id = parent_id or str(manual.get("id") or uuid.uuid4())
+        chunks = self._chunk_manual(manual, parent_id)
+        
+        embeddings = self.get_embeddings([chunk["embed_text"] for chunk in chunks])
+        if not embeddings:
+            return None
+        
+        points = [
+            PointStruct(id=chunk["id"], vector=embedding, payload=chunk["payload"])
+            for chunk, embedding in zip(chunks, embeddings)
+        ]
+        # A shorter revision would otherwise leave its old trailing chunks searchable
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=FilterSelector(filter=Filter(must=[
+                FieldCondition(key="parent_id", match=MatchValue(value=parent_id))
+            ]))
+        )
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=points
+        )
+        self.index_error_codes(manual, parent_id)
+        return parent_id
+    
+    @staticmethod
+    def _manual_error_codes(manual: Dict) -> List[str]:
+        """Codes listed in the manual's error_codes field, else found in its symptoms"""
+        if manual.get("error_codes"):
+            return [normalize_error_code(code) for code in manual["error_codes"]]
+        return extract_error_codes([manual.get("symptoms", "")])
+    
+    def index_error_codes(self, manual: Dict, parent_id: str):
+        """Add a manual to the (device_model, error_code) lookup index"""
+        solution = {
+            "score": 1.0,
+            "manual_id": parent_id,
+            "device_model": manual["device_model"],
+            "device_name": manual["device_name"],
+            "symptoms": manual.get("symptoms", ""),
+            "steps": list(manual.get("steps", [])),
+            "resolution": manual.get("resolution", ""),
+            "chunks": [],
+            "match": "error_code"
+        }
+        with self._index_lock:
+            for code in self._manual_error_codes(manual):
+                key = (manual["device_model"].upper(), normalize_error_code(code))
+                entries = [s for s in self.error_code_index.get(key, []) if s["manual_id"] != parent_id]
+                self.error_code_index[key] = entries + [solution]
+    
+    def _load_error_code_index(self):
+        """Rebuild the error-code index from step points (no embeddings needed)"""
+        from qdrant_client.models import Filter, FieldCondition, MatchValue, IsEmptyCondition, PayloadField
+        scroll_filter = Filter(
+            must=[FieldCondition(key="chunk_type", match=MatchValue(value="step"))],
+            must_not=[IsEmptyCondition(is_empty=PayloadField(key="error_codes"))]
+        )
+        manuals: Dict[str, Dict] = {}
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=scroll_filter,
+                limit=256,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False
+            )
+            for point in points:
+                payload = point.payload
+                manual = manuals.setdefault(payload["parent_id"], {**payload, "steps": {}})
+                manual["steps"][payload["step_index"]] = payload["text"]
+            if offset is None:
+                break
+        
+        for parent_id, manual in manuals.items():
+            steps = manual["steps"]
+            manual["steps"] = [steps[index] for index in sorted(steps)]
+            self.index_error_codes(manual, parent_id)
+    
+    def lookup_error_codes(self, device_model: str, error_codes: List[str], top_k: int = 3) -> List[Dict]:
+        """
+        Manuals indexed under (device_model, code) for any of the codes,
+        in code order. Dictionary lookups only - no embedding, no Qdrant call.
+        """
+        if not self._connected:
+            self._connect()
+        
+        solutions, seen = [], set()
+        for code in error_codes:
+            for solution in self.error_code_index.get((device_model.upper(), normalize_error_code(code)), []):
+                if solution["manual_id"] not in seen:
+                    seen.add(solution["manual_id"])
+                    solutions.append(dict(solution, steps=list(solution["steps"])))
+        return solutions[:top_k]
+    
+    def get_embeddings(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """Get VoyageAI embeddings for a batch of texts (one API call)"""
+        if not self.voyage_client:
+            return None
+        
+        try:
+            with self.tracer.span("voyage.embed", texts=len(texts)):
+                result = self.voyage_client.embed(
+                    texts,
+                    model=self.voyage_model
                 )
-                self.client.upsert(
-                    collection_name=self.collection_name,
-                    points=[point]
-                )
-        print(f"Seeded {len(sample_manuals)} repair manuals")
+            return result.embeddings
+        except Exception as e:
+            print(f"Embedding error: {e}")
+            return None
     
     def get_embedding(self, text: str) -> Optional[List[float]]:
         """Get VoyageAI embedding for text"""
@@ -181,10 +442,11 @@ class QdrantRAG:
             return None
         
         try:
-            result = self.voyage_client.embed(
-                text,
-                model=self.voyage_model
-            )
+            with self.tracer.span("voyage.embed", texts=1):
+                result = self.voyage_client.embed(
+                    text,
+                    model=self.voyage_model
+                )
             return result.embeddings[0]
         except Exception as e:
             print(f"Embedding error: {e}")
@@ -198,6 +460,7 @@ class QdrantRAG:
     ) -> List[Dict]:
         """
         Search for repair solutions using device model + symptom embeddings
+        Retrieves matching chunks and groups them by parent manual
         Returns top-k similar repair manuals
         """
         if not self.client or not self.voyage_client:
@@ -211,55 +474,106 @@ class QdrantRAG:
         if not query_embedding:
             return []
         
-        # Search Qdrant
+        # Search Qdrant at chunk level
         try:
-            results = self.client.search(
-                collection_name=self.collection_name,
-                query_vector=query_embedding,
-                limit=top_k,
-                score_threshold=0.3
-            )
-            
-            solutions = []
-            for result in results:
-                solutions.append({
-                    "score": result.score,
-                    "device_model": result.payload.get("device_model"),
-                    "device_name": result.payload.get("device_name"),
-                    "symptoms": result.payload.get("symptoms"),
-                    "steps": result.payload.get("steps"),
-                    "resolution": result.payload.get("resolution")
-                })
+            with self.tracer.span("qdrant.search", limit=top_k * self.CHUNKS_PER_MANUAL) as span:
+                results = self.client.query_points(
+                    collection_name=self.collection_name,
+                    query=query_embedding,
+                    limit=top_k * self.CHUNKS_PER_MANUAL,
+                    score_threshold=0.3,
+                    with_payload=True
+                ).points
+                span.set(hits=len(results))
             
-            return solutions
+            return self._group_by_manual(results, top_k)
         except Exception as e:
             print(f"Search error: {e}")
             return []
     
-    def add_manual(self, manual: Dict) -> bool:
-        """Add new repair manual to database"""
-        try:
-            text = f"{manual['device_name']} {manual['symptoms']}"
-            embedding = self.get_embedding(text)
-            
-            if not embedding:
-                return False
-            
-            # Get next ID
-            count = self.client.count(self.collection_name).count
-            next_id = count + 1
+    def _group_by_manual(self, results: List, top_k: int) -> List[Dict]:
+        """
+        Group chunk hits by parent manual, keeping best-score order. The hits
+        only rank the manuals: each manual's steps are its full procedure,
+        in step order.
+        """
+        groups: Dict[str, Dict] = {}
+        
+        for result in results:
+            payload = result.payload
+            # Whole-manual points (pre-chunking) are their own parent
+            parent_id = payload.get("parent_id", str(result.id))
             
-            point = PointStruct(
-                id=next_id,
-                vector=embedding,
-                payload=manual
-            )
+            if parent_id not in groups:
+                if len(groups) >= top_k:
+                    continue
+                groups[parent_id] = {
+                    "score": result.score,
+                    "manual_id": parent_id,
+                    "device_model": payload.get("device_model"),
+                    "device_name": payload.get("device_name"),
+                    "symptoms": payload.get("symptoms"),
+                    "steps": payload.get("steps"),
+                    "resolution": payload.get("resolution"),
+                    "chunks": []
+                }
             
-            self.client.upsert(
-                collection_name=self.collection_name,
-                points=[point]
-            )
-            return True
+            group = groups[parent_id]
+            if "chunk_type" not in payload:
+                continue
+            if len(group["chunks"]) < self.CHUNKS_PER_MANUAL:
+                group["chunks"].append({
+                    "score": result.score,
+                    "chunk_type": payload["chunk_type"],
+                    "step_index": payload.get("step_index"),
+                    "section_title": payload.get("section_title"),
+                    "text": payload.get("text")
+                })
+        
+        # Chunked manuals (whole-manual points carry their steps)
+        chunked = [parent_id for parent_id, group in groups.items() if group["steps"] is None]
+        if chunked:
+            steps = self._fetch_steps(chunked)
+            for parent_id in chunked:
+                groups[parent_id]["steps"] = steps.get(parent_id, [])
+        
+        return list(groups.values())
+    
+    def _fetch_steps(self, parent_ids: List[str]) -> Dict[str, List[str]]:
+        """All step texts of the given manuals, in step order (one paged scroll, payload only)"""
+        from qdrant_client.models import Filter, FieldCondition, MatchAny, MatchValue
+        step_chunks: Dict[str, List[Dict]] = {parent_id: [] for parent_id in parent_ids}
+        try:
+            with self.tracer.span("qdrant.scroll", manuals=len(parent_ids)):
+                offset = None
+                while True:
+                    points, offset = self.client.scroll(
+                        collection_name=self.collection_name,
+                        scroll_filter=Filter(must=[
+                            FieldCondition(key="parent_id", match=MatchAny(any=parent_ids)),
+                            FieldCondition(key="chunk_type", match=MatchValue(value="step"))
+                        ]),
+                        limit=256,
+                        offset=offset,
+                        with_payload=True,
+                        with_vectors=False
+                    )
+                    for point in points:
+                        step_chunks[point.payload["parent_id"]].append(point.payload)
+                    if offset is None:
+                        break
+        except Exception as e:
+            print(f"Step fetch error: {e}")
+            return {}
+        return {
+            parent_id: [chunk["text"] for chunk in sorted(chunks, key=lambda chunk: chunk["step_index"])]
+            for parent_id, chunks in step_chunks.items()
+        }
+    
+    def add_manual(self, manual: Dict) -> bool:
+        """Add new repair manual to database (chunked by step/section)"""
+        try:
+            return self.ingest_manual(manual) is not None
         except Exception as e:
             print(f"Error adding manual: {e}")
             return False
@@ -1,84 +1,252 @@
 """CrewAI agents for repair bot stages"""
-from crewai import Agent, Task, Crew
-from langchain_openai import ChatOpenAI
+from __future__ import annotations
+
+import asyncio
 import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional
 from dotenv import load_dotenv
+from response_cache import ResponseCache
+from tracing import Tracer
+
+# crewai, langchain_openai and httpx take seconds to import and are only
+# needed once an agent or LLM is actually used - they load on first use
+if TYPE_CHECKING:
+    import httpx
+    from crewai import Agent, Task
+    from langchain_openai import ChatOpenAI
 
 # Load environment variables
 load_dotenv()
 
-class RepairAgents:
-    """Factory for creating repair bot agents"""
+class SharedLLMRegistry:
+    """
+    Process-wide LLM client and agent registry shared by all sessions.
+    One pooled keep-alive HTTP client backs a single ChatOpenAI instance,
+    and each agent role is built once and reused.
+    """
+    
+    MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+    MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+    
+    _lock = threading.Lock()
+    _http_client: Optional[httpx.Client] = None
+    _async_http_client: Optional[httpx.AsyncClient] = None
+    _llm: Optional[ChatOpenAI] = None
+    _agents: Dict[str, Agent] = {}
+    # aclose() tasks scheduled by reset() on a running loop (kept until done)
+    _closing: set = set()
+    
+    @classmethod
+    def _limits(cls) -> httpx.Limits:
+        import httpx
+        return httpx.Limits(
+            max_connections=cls.MAX_CONNECTIONS,
+            max_keepalive_connections=cls.MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=cls.KEEPALIVE_EXPIRY
+        )
     
-    def __init__(self):
-        self.llm = ChatOpenAI(
+    @classmethod
+    def create_llm(
+        cls,
+        http_client: Optional[httpx.Client] = None,
+        http_async_client: Optional[httpx.AsyncClient] = None
+    ) -> ChatOpenAI:
+        """Build a ChatOpenAI client (unshared unless HTTP clients are passed in)"""
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(
             model="gpt-4o-mini",
             api_key=os.getenv("OPENAI_API_KEY"),
-            temperature=0.3
+            temperature=0.3,
+            http_client=http_client,
+            http_async_client=http_async_client
         )
     
-    def device_discovery_agent(self) -> Agent:
-        """Agent for Stage 1: Device Discovery"""
-        return Agent(
-            role="Device Identification Specialist",
-            goal="Identify the exact device model that needs repair",
-            backstory="""You are an expert technician who identifies appliances accurately.
+    @classmethod
+    def get_llm(cls) -> ChatOpenAI:
+        """Return the shared LLM client, creating it on first use"""
+        if cls._llm is None:
+            with cls._lock:
+                if cls._llm is None:
+                    import httpx
+                    cls._http_client = httpx.Client(limits=cls._limits())
+                    cls._async_http_client = httpx.AsyncClient(limits=cls._limits())
+                    cls._llm = cls.create_llm(cls._http_client, cls._async_http_client)
+        return cls._llm
+    
+    @classmethod
+    def get_agent(cls, name: str, builder: Callable[[], Agent]) -> Agent:
+        """Return the shared agent for a role, building it on first use"""
+        agent = cls._agents.get(name)
+        if agent is None:
+            with cls._lock:
+                agent = cls._agents.get(name)
+                if agent is None:
+                    agent = builder()
+                    cls._agents[name] = agent
+        return agent
+    
+    @classmethod
+    def reset(cls):
+        """Drop shared clients and agents (e.g. after API key rotation), closing both HTTP pools"""
+        with cls._lock:
+            http_client, async_http_client = cls._http_client, cls._async_http_client
+            cls._http_client = None
+            cls._async_http_client = None
+            cls._llm = None
+            cls._agents = {}
+        
+        if http_client is not None:
+            http_client.close()
+        if async_http_client is not None:
+            cls._close_async_client(async_http_client)
+    
+    @classmethod
+    def _close_async_client(cls, client: httpx.AsyncClient):
+        """aclose() on the caller's running loop, or on a temporary loop from sync code"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        
+        if loop is not None:
+            task = loop.create_task(client.aclose())
+            cls._closing.add(task)
+            task.add_done_callback(cls._closing.discard)
+            return
+        try:
+            asyncio.run(client.aclose())
+        except Exception as e:
+            print(f"⚠ Could not close async LLM HTTP client: {e}")
+
+
+class RepairAgents:
+    """Factory for creating repair bot agents"""
+    
+    def __init__(self, shared: bool = True):
+        """
+        shared=True reuses the process-wide LLM client and agents;
+        shared=False builds a private client and fresh agents per call.
+        """
+        self.shared = shared
+        self._llm: Optional[ChatOpenAI] = None
+    
+    @property
+    def llm(self) -> ChatOpenAI:
+        """LLM client, created on first use"""
+        if self._llm is None:
+            self._llm = SharedLLMRegistry.get_llm() if self.shared else SharedLLMRegistry.create_llm()
+        return self._llm
+    
+    # Role definitions; also used to build system prompts for streaming
+    AGENT_PROFILES = {
+        "device_discovery": {
+            "role": "Device Identification Specialist",
+            "goal": "Identify the exact device model that needs repair",
+            "backstory": """You are an expert technician who identifies appliances accurately.
             You ask users for their device model/name and help them locate it in the database.
-            You must be conversational but focused on getting the exact device information.""",
+            You must be conversational but focused on getting the exact device information."""
+        },
+        "symptom_discovery": {
+            "role": "Symptom Assessment Specialist",
+            "goal": "Systematically gather all relevant information about the device failure",
+            "backstory": """You are a technical support specialist with 20 years of experience.
+            You ask clear, specific questions to understand the exact nature of the device failure.
+            You track the conversation to ensure you ask exactly 7 questions in sequence.
+            Each response should include only the answer to the current question, then ask the next one."""
+        },
+        "repair_guide": {
+            "role": "Repair Guide Specialist",
+            "goal": "Generate detailed step-by-step repair instructions based on device and symptoms",
+            "backstory": """You are a master technician with expertise in appliance repair.
+            You read repair manuals from the knowledge base and create clear, safe repair instructions.
+            Each step is numbered, specific, and includes safety warnings where needed.
+            You provide exactly one repair step per interaction and wait for confirmation before proceeding."""
+        },
+        "escalation": {
+            "role": "Service Escalation Specialist",
+            "goal": "Provide clear escalation path when repair cannot be completed",
+            "backstory": """You are a customer service specialist trained in professional escalation.
+            When repairs cannot be completed after 5 attempts, you provide clear next steps
+            and professional service contact information."""
+        }
+    }
+    
+    def _agent(self, name: str) -> Agent:
+        if self.shared:
+            return SharedLLMRegistry.get_agent(name, lambda: self._build_agent(name))
+        return self._build_agent(name)
+    
+    def _build_agent(self, name: str) -> Agent:
+        from crewai import Agent
+        return Agent(
+            **self.AGENT_PROFILES[name],
             llm=self.llm,
             verbose=False,
             allow_delegation=False
         )
     
+    def device_discovery_agent(self) -> Agent:
+        """Agent for Stage 1: Device Discovery"""
+        return self._agent("device_discovery")
+    
     def symptom_discovery_agent(self) -> Agent:
         """Agent for Stage 2: Symptom Discovery (7 sequential questions)"""
-        return Agent(
-            role="Symptom Assessment Specialist",
-            goal="Systematically gather all relevant information about the device failure",
-            backstory="""You are a technical support specialist with 20 years of experience.
-            You ask clear, specific questions to understand the exact nature of the device failure.
-            You track the conversation to ensure you ask exactly 7 questions in sequence.
-            Each response should include only the answer to the current question, then ask the next one.""",
-            llm=self.llm,
-            verbose=False,
-            allow_delegation=False
-        )
+        return self._agent("symptom_discovery")
     
     def repair_guide_agent(self) -> Agent:
         """Agent for Stage 3: Repair Guide Generation"""
-        return Agent(
-            role="Repair Guide Specialist",
-            goal="Generate detailed step-by-step repair instructions based on device and symptoms",
-            backstory="""You are a master technician with expertise in appliance repair.
-            You read repair manuals from the knowledge base and create clear, safe repair instructions.
-            Each step is numbered, specific, and includes safety warnings where needed.
-            You provide exactly one repair step per interaction and wait for confirmation before proceeding.""",
-            llm=self.llm,
-            verbose=False,
-            allow_delegation=False
-        )
+        return self._agent("repair_guide")
     
     def escalation_agent(self) -> Agent:
         """Agent for handling escalation to professional service"""
-        return Agent(
-            role="Service Escalation Specialist",
-            goal="Provide clear escalation path when repair cannot be completed",
-            backstory="""You are a customer service specialist trained in professional escalation.
-            When repairs cannot be completed after 5 attempts, you provide clear next steps
-            and professional service contact information.""",
-            llm=self.llm,
-            verbose=False,
-            allow_delegation=False
-        )
+        return self._agent("escalation")
 
 
 class RepairTasks:
     """Factory for creating repair bot tasks"""
     
+    SYMPTOM_QUESTIONS = {
+        1: "When did the issue start? (e.g., 'yesterday', 'last week', 'a month ago')",
+        2: "Describe the exact symptoms (e.g., no water, error codes, noises, not heating)",
+        3: "Any recent changes? (e.g., power surge, moved, new parts, recent service)",
+        4: "Are there any error codes displayed? (If yes, list all of them)",
+        5: "Under what conditions does it happen? (e.g., cold start, after cycle, continuously)",
+        6: "What troubleshooting have you already tried? (e.g., restarted, checked connections)",
+        7: "Environment details? (installation location, water pressure, electrical stability)"
+    }
+    
+    ESCALATION_TEMPLATE = """I've worked through {attempts} troubleshooting steps without resolving the issue.
+
+This suggests the device may need professional service for:
+- Internal component failure (motor, pump, compressor, etc.)
+- Electrical board damage
+- Gas/refrigerant system issues
+
+**Recommended Next Steps:**
+1. Contact the manufacturer's service center
+2. Schedule a professional technician visit
+3. Check warranty coverage
+4. Request service parts if available
+
+Thank you for working through this with me. Professional service will provide the best outcome."""
+    
     @staticmethod
-    def device_discovery_task(agent: Agent, user_input: str) -> Task:
-        """Task: Identify device"""
-        return Task(
+    def render_symptom_question(question_number: int, **_) -> str:
+        """Local render: the symptom question is fixed text"""
+        return RepairTasks.SYMPTOM_QUESTIONS[question_number]
+    
+    @staticmethod
+    def render_escalation(attempts: int, **_) -> str:
+        """Local render: templated escalation message"""
+        return RepairTasks.ESCALATION_TEMPLATE.format(attempts=attempts)
+    
+    @staticmethod
+    def device_discovery_prompt(user_input: str) -> Dict[str, str]:
+        """Prompt: Identify device"""
+        return dict(
             description=f"""User input: '{user_input}'
             
             Your job is to identify if this is a known device.
@@ -87,36 +255,26 @@ class RepairTasks:
             2. If not recognized, provide a helpful response with known device options
             
             Keep response brief and focused on device identification only.""",
-            agent=agent,
             expected_output="""A brief response confirming the device or asking for clarification.
             Do not proceed with other questions."""
         )
     
     @staticmethod
-    def symptom_question_task(
-        agent: Agent,
+    def symptom_question_prompt(
         question_number: int,
         device_model: str,
         previous_answers: dict
-    ) -> Task:
-        """Task: Ask symptom discovery question"""
+    ) -> Dict[str, str]:
+        """Prompt: Ask symptom discovery question"""
         
-        questions = {
-            1: "When did the issue start? (Please provide a date or timeframe, e.g., 'yesterday', 'last week')",
-            2: "Describe the exact symptoms you're experiencing (e.g., no water, error codes, noises, not heating, etc.)",
-            3: "Any recent changes? (e.g., power surge, moved device, installed new parts, recent service)",
-            4: "Are there any error codes displayed? (If yes, list all error codes you see)",
-            5: "Under what conditions does the issue happen? (e.g., cold start, after a cycle, continuously, intermittently)",
-            6: "What troubleshooting have you already tried? (e.g., restarted, checked connections, etc.)",
-            7: "Environment details? (e.g., installation location, water pressure if applicable, voltage stability)"
-        }
+        questions = RepairTasks.SYMPTOM_QUESTIONS
         
         prev_context = "\n".join([
             f"Q{i}: {questions[i]}\nA: {previous_answers.get(i, 'N/A')}"
             for i in range(1, question_number)
         ]) if question_number > 1 else "This is the first question."
         
-        return Task(
+        return dict(
             description=f"""Device: {device_model}
             This is question {question_number} of 7 in the symptom discovery phase.
             
@@ -129,24 +287,22 @@ class RepairTasks:
             - Ask ONLY this question
             - Do NOT ask additional questions
             - Keep response concise and friendly""",
-            agent=agent,
             expected_output=f"""The question {question_number} exactly as specified.
             Nothing more, nothing less."""
         )
     
     @staticmethod
-    def repair_guide_task(
-        agent: Agent,
+    def repair_guide_prompt(
         device_model: str,
         symptoms_summary: str,
         attempt_number: int,
         previous_steps: list
-    ) -> Task:
-        """Task: Generate repair guide step"""
+    ) -> Dict[str, str]:
+        """Prompt: Generate repair guide step"""
         
         prev_steps_text = "\n".join(previous_steps) if previous_steps else "No previous steps."
         
-        return Task(
+        return dict(
             description=f"""Device: {device_model}
             Attempt: {attempt_number}/5
             Collected Symptoms: {symptoms_summary}
@@ -161,16 +317,15 @@ class RepairTasks:
             4. Include a checkpoint question: "Did this resolve your issue? (yes/no)"
             
             Keep it brief and focused on ONE step only.""",
-            agent=agent,
             expected_output=f"""Step {attempt_number}: [Specific repair instruction]
             [Safety warning if needed]
             Did this resolve your issue? (yes/no)"""
         )
     
     @staticmethod
-    def escalation_task(agent: Agent, device_model: str, attempts: int) -> Task:
-        """Task: Handle escalation"""
-        return Task(
+    def escalation_prompt(device_model: str, attempts: int) -> Dict[str, str]:
+        """Prompt: Handle escalation"""
+        return dict(
             description=f"""Device: {device_model}
             Repair attempts: {attempts}/5 completed without resolution
             
@@ -179,6 +334,190 @@ class RepairTasks:
             2. Explain why professional service is needed
             3. Recommend next steps
             4. Provide general guidance on contacting manufacturer support""",
-            agent=agent,
             expected_output="""Professional escalation message with clear next steps"""
         )
+    
+    # Task factories wrap the prompts above (crewai is imported here, on first use)
+    
+    @staticmethod
+    def _task(agent: Agent, prompt: Dict[str, str]) -> Task:
+        from crewai import Task
+        return Task(agent=agent, **prompt)
+    
+    @staticmethod
+    def device_discovery_task(agent: Agent, user_input: str) -> Task:
+        """Task: Identify device"""
+        return RepairTasks._task(agent, RepairTasks.device_discovery_prompt(user_input))
+    
+    @staticmethod
+    def symptom_question_task(
+        agent: Agent,
+        question_number: int,
+        device_model: str,
+        previous_answers: dict
+    ) -> Task:
+        """Task: Ask symptom discovery question"""
+        return RepairTasks._task(agent, RepairTasks.symptom_question_prompt(
+            question_number, device_model, previous_answers
+        ))
+    
+    @staticmethod
+    def repair_guide_task(
+        agent: Agent,
+        device_model: str,
+        symptoms_summary: str,
+        attempt_number: int,
+        previous_steps: list
+    ) -> Task:
+        """Task: Generate repair guide step"""
+        return RepairTasks._task(agent, RepairTasks.repair_guide_prompt(
+            device_model, symptoms_summary, attempt_number, previous_steps
+        ))
+    
+    @staticmethod
+    def escalation_task(agent: Agent, device_model: str, attempts: int) -> Task:
+        """Task: Handle escalation"""
+        return RepairTasks._task(agent, RepairTasks.escalation_prompt(device_model, attempts))
+
+
+class TaskRouter:
+    """
+    Routes repair tasks to the cheapest path that can serve them:
+    fixed-text tasks (symptom questions, templated escalation) render locally,
+    tasks that need generation run through a CrewAI crew.
+    """
+    
+    LOCAL_RENDERERS: Dict[str, Callable[..., str]] = {
+        "symptom_question": RepairTasks.render_symptom_question,
+        "escalation": RepairTasks.render_escalation,
+    }
+    
+    # task name -> (agent profile, prompt builder)
+    TASK_PROMPTS = {
+        "device_discovery": ("device_discovery", RepairTasks.device_discovery_prompt),
+        "symptom_question": ("symptom_discovery", RepairTasks.symptom_question_prompt),
+        "repair_guide": ("repair_guide", RepairTasks.repair_guide_prompt),
+        "escalation": ("escalation", RepairTasks.escalation_prompt),
+    }
+    
+    def __init__(
+        self,
+        agents_factory: Optional[RepairAgents] = None,
+        llm_executor: Optional[Callable[[str, Dict[str, Any]], str]] = None,
+        cache: Optional[ResponseCache] = None,
+        stream_llm: Optional[Any] = None
+    ):
+        """
+        llm_executor(task_name, params) -> str overrides the CrewAI path
+        (used by benchmarks and tests to stand in for the model).
+        cache serves repeated generative tasks without an LLM call.
+        stream_llm is the LangChain chat model used by stream()
+        (defaults to the agents' LLM; tests can pass a fake streaming model).
+        """
+        self._agents_factory = agents_factory
+        self.llm_executor = llm_executor or self._kickoff
+        self.cache = cache
+        self._stream_llm = stream_llm
+        self.tracer = Tracer.shared()
+    
+    @property
+    def agents_factory(self) -> RepairAgents:
+        if self._agents_factory is None:
+            self._agents_factory = RepairAgents()
+        return self._agents_factory
+    
+    def is_deterministic(self, task_name: str) -> bool:
+        """True if the task renders locally without an LLM call"""
+        return task_name in self.LOCAL_RENDERERS
+    
+    def run(self, task_name: str, **params) -> str:
+        """Execute a task by name, locally when its output is fixed text"""
+        with self.tracer.span(f"task.{task_name}") as span:
+            renderer = self.LOCAL_RENDERERS.get(task_name)
+            if renderer is not None:
+                span.set(source="local")
+                return renderer(**params)
+            
+            if self.cache is not None:
+                with self.tracer.span("response_cache.get"):
+                    cached = self.cache.get(task_name, params)
+                if cached is not None:
+                    span.set(source="cache")
+                    return cached
+            
+            span.set(source="llm")
+            with self.tracer.span("llm.generate"):
+                result = self.llm_executor(task_name, params)
+            if self.cache is not None:
+                with self.tracer.span("response_cache.put"):
+                    self.cache.put(task_name, params, result)
+            return result
+    
+    @property
+    def stream_llm(self) -> Any:
+        if self._stream_llm is None:
+            self._stream_llm = self.agents_factory.llm
+        return self._stream_llm
+    
+    @stream_llm.setter
+    def stream_llm(self, llm: Any):
+        self._stream_llm = llm
+    
+    def stream(self, task_name: str, **params) -> Iterator[str]:
+        """
+        Execute a task by name, yielding partial text as it is generated.
+        Local renders and cache hits are yielded in one chunk.
+        """
+        with self.tracer.span(f"task.{task_name}") as span:
+            renderer = self.LOCAL_RENDERERS.get(task_name)
+            if renderer is not None:
+                span.set(source="local")
+                yield renderer(**params)
+                return
+            
+            if self.cache is not None:
+                with self.tracer.span("response_cache.get"):
+                    cached = self.cache.get(task_name, params)
+                if cached is not None:
+                    span.set(source="cache")
+                    yield cached
+                    return
+            
+            span.set(source="llm")
+            chunks = []
+            with self.tracer.span("llm.stream") as llm_span:
+                started = time.perf_counter()
+                for message_chunk in self.stream_llm.stream(self.build_messages(task_name, params)):
+                    text = message_chunk.content
+                    if text:
+                        if not chunks:
+                            llm_span.set(first_chunk_ms=round((time.perf_counter() - started) * 1000, 3))
+                        chunks.append(text)
+                        yield text
+                llm_span.set(chunks=len(chunks))
+            
+            if self.cache is not None and chunks:
+                with self.tracer.span("response_cache.put"):
+                    self.cache.put(task_name, params, "".join(chunks))
+    
+    def build_messages(self, task_name: str, params: Dict[str, Any]) -> List[tuple]:
+        """Chat messages equivalent to the agent + task prompt"""
+        profile_name, prompt_builder = self.TASK_PROMPTS[task_name]
+        profile = RepairAgents.AGENT_PROFILES[profile_name]
+        prompt = prompt_builder(**params)
+        return [
+            ("system", f"You are a {profile['role']}. {profile['backstory']}\nYour goal: {profile['goal']}"),
+            ("human", f"{prompt['description']}\n\nExpected output:\n{prompt['expected_output']}")
+        ]
+    
+    def build_task(self, task_name: str, params: Dict[str, Any]) -> Task:
+        """Build the CrewAI task (and its agent) for a task name"""
+        profile_name, prompt_builder = self.TASK_PROMPTS[task_name]
+        agent = self.agents_factory._agent(profile_name)
+        return RepairTasks._task(agent, prompt_builder(**params))
+    
+    def _kickoff(self, task_name: str, params: Dict[str, Any]) -> str:
+        task = self.build_task(task_name, params)
+        from crewai import Crew
+        crew = Crew(agents=[task.agent], tasks=[task], verbose=False)
+        return str(crew.kickoff())
@@ -0,0 +1,846 @@
+"""Shared repair engine and lightweight per-session state"""
+import json
+import os
+import queue
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, Optional, List
+from device_manager import DeviceManager
+from error_codes import ERROR_CODE_QUESTION, symptom_error_codes
+from profiling import SessionProfiler
+from qdrant_rag import QdrantRAG
+from repair_agents import RepairAgents, TaskRouter
+from response_cache import ResponseCache
+from step_outcomes import StepOutcomeTable
+from tracing import NOOP_SPAN, Tracer
+
+STAGES = ["device_discovery", "symptom_discovery", "problem_solver"]
+
+
+@dataclass(slots=True)
+class RepairSession:
+    """Per-user state of one repair conversation (no services, cheap to create)"""
+    
+    session_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    current_stage_index: int = 0
+    
+    # Collected data
+    device_info: Optional[Dict] = None
+    symptoms: Dict[int, str] = field(default_factory=dict)  # {question_num: answer}
+    repair_attempts: List[Dict] = field(default_factory=list)  # [{step: ..., result: ..., ...}]
+    
+    # Session metadata: one compact entry per turn referencing the state above
+    # (question number / attempt number), capped at RepairEngine.MAX_HISTORY_ENTRIES
+    conversation_history: List[Dict] = field(default_factory=list)
+    turn_count: int = 0  # all recorded turns, including ones dropped by the cap
+    session_complete: bool = False
+    final_resolution: Optional[str] = None
+    
+    # Optimistic concurrency: bumped by a SessionStore on every save
+    version: int = 0
+    
+    # Response of the last stream_step call (transient, not persisted)
+    last_response: Optional[Dict] = None
+    
+    # Ranked RAG candidates for stage 3, fetched once per symptom set
+    # (transient, not persisted; see RepairEngine.get_rag_candidates)
+    rag_candidates: Optional[List[Dict]] = None
+    rag_candidates_key: Optional[str] = None
+    # Background search started during symptom discovery (transient)
+    rag_prefetch: Optional[Future] = None
+    rag_prefetch_key: Optional[str] = None
+    
+    PERSISTED_FIELDS = (
+        "session_id", "current_stage_index", "device_info", "symptoms",
+        "repair_attempts", "conversation_history", "turn_count",
+        "session_complete", "final_resolution", "version"
+    )
+    
+    @property
+    def current_stage(self) -> str:
+        return STAGES[self.current_stage_index]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Persistable state as plain JSON-compatible data"""
+        return {name: getattr(self, name) for name in self.PERSISTED_FIELDS}
+    
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "RepairSession":
+        """Rebuild a session from to_dict() / get_state_json() output"""
+        values = {name: state[name] for name in cls.PERSISTED_FIELDS if name in state}
+        if "current_stage_index" not in values and "stage" in state:
+            # Older state exports only carried the stage name
+            values["current_stage_index"] = STAGES.index(state["stage"])
+        # JSON turns the question numbers into strings
+        values["symptoms"] = {int(q): a for q, a in (values.get("symptoms") or {}).items()}
+        if "turn_count" not in values:
+            values["turn_count"] = len(values.get("conversation_history") or [])
+        return cls(**values)
+
+
+class RepairEngine:
+    """
+    Holds the shared services (device catalog, RAG, agents) and runs the
+    3-stage repair flow for any number of RepairSession objects:
+    1. Device Discovery (1 interaction)
+    2. Symptom Discovery (7 questions)
+    3. Problem Solver (up to 5 attempts)
+    
+    The engine keeps no per-session state, so one instance can serve
+    many sessions concurrently.
+    """
+    
+    STAGES = STAGES
+    SYMPTOM_QUESTIONS = 7
+    MAX_REPAIR_ATTEMPTS = 5
+    MAX_HISTORY_ENTRIES = int(os.getenv("CONVERSATION_HISTORY_LIMIT", "50"))
+    ERROR_CODE_QUESTION = ERROR_CODE_QUESTION
+    # Symptom answer after which the lazily connected RAG clients are warmed
+    # up (once per engine); the RAG search itself starts in the background
+    # after the last answer, when the symptom summary is final
+    RAG_WARM_UP_AFTER_QUESTION = 2
+    
+    def __init__(
+        self,
+        device_manager: Optional[DeviceManager] = None,
+        rag: Optional[QdrantRAG] = None,
+        agents_factory: Optional[RepairAgents] = None,
+        journal=None,
+        outcomes: Optional[StepOutcomeTable] = None
+    ):
+        """
+        journal: optional SessionJournal that records every step for crash recovery
+        outcomes: step success table (defaults to the process-wide one)
+        """
+        self.device_manager = device_manager or DeviceManager()
+        self.rag = rag or QdrantRAG()
+        self.agents_factory = agents_factory or RepairAgents()
+        self.task_router = TaskRouter(
+            self.agents_factory,
+            cache=ResponseCache.shared(embed_fn=self.rag.get_embedding)
+        )
+        # The LLM client itself is created lazily on first agent use
+        self.llm_available = bool(os.getenv("OPENAI_API_KEY"))
+        # Generate a step with the LLM when the manuals have none for this attempt
+        self.use_llm_steps = os.getenv("LLM_REPAIR_STEPS", "false").lower() == "true"
+        # Search for solutions while the user is still answering symptom questions
+        self.rag_prefetch = os.getenv("RAG_PREFETCH", "true").lower() == "true"
+        self._prefetch_pool: Optional[ThreadPoolExecutor] = None
+        self._prefetch_lock = threading.Lock()
+        self._rag_warmed_up = False
+        
+        self.journal = journal
+        self.outcomes = outcomes if outcomes is not None else StepOutcomeTable.shared()
+        # Per-turn spans (TRACING_ENABLED); a no-op unless enabled
+        self.tracer = Tracer.shared()
+        # cProfile + tracemalloc reports for sampled sessions (PROFILE_SAMPLE_RATE)
+        self.profiler = SessionProfiler.shared()
+        
+        # Per-thread sink for partial agent text, set while stream_step runs
+        self._local = threading.local()
+    
+    def new_session(self) -> RepairSession:
+        """Create an empty session at stage 1"""
+        return RepairSession()
+    
+    def step(
+        self,
+        session: RepairSession,
+        user_input: str,
+        chunk_sink: Optional[Callable[[str], None]] = None,
+        persist: Optional[Callable[[RepairSession], object]] = None
+    ) -> Dict:
+        """
+        Process user input for current stage, advance if complete.
+        chunk_sink: optional callback receiving partial agent text as it is generated
+        persist: optional callback storing the stepped session (e.g. SessionStore.save);
+        the turn is journaled and a finished session's outcome recorded only after it
+        returns, so a rejected save (StaleSessionError) leaves neither behind
+        Returns: stage response with structured data and agent response
+        (with tracing enabled, response["debug"]["trace"] holds the turn's span tree)
+        """
+        
+        if session.session_complete:
+            return {
+                "error": "Session already complete",
+                "final_output": self.get_final_output(session)
+            }
+        
+        stage_index = session.current_stage_index
+        with (
+            self.profiler.profile(session.session_id, session.current_stage, session.turn_count + 1),
+            self.tracer.span("turn", stage=session.current_stage) as span
+        ):
+            self._local.chunk_sink = chunk_sink
+            self._local.completed_output = None
+            try:
+                response = self._dispatch(session, user_input)
+            finally:
+                self._local.chunk_sink = None
+                completed_output, self._local.completed_output = self._local.completed_output, None
+            if persist is not None:
+                with self.tracer.span("session.persist"):
+                    persist(session)
+            if self.journal is not None:
+                with self.tracer.span("journal.append"):
+                    self.journal.append_turn(session, stage_index, user_input, response)
+            if completed_output is not None:
+                self.outcomes.record(completed_output)
+        if session.session_complete:
+            self.profiler.force(session.session_id, False)
+        if span is not NOOP_SPAN:
+            response["debug"] = {"trace": span.to_dict()}
+        return response
+    
+    def apply_event(self, session: RepairSession, event: Dict) -> Dict:
+        """
+        Re-apply a journaled turn (see SessionJournal.replay). The recorded
+        repair step is reused, so RAG and the LLM are not called.
+        """
+        self._local.recorded_outcome = event["outcome"]
+        try:
+            return self._dispatch(session, event["input"])
+        finally:
+            self._local.recorded_outcome = None
+    
+    def _dispatch(self, session: RepairSession, user_input: str) -> Dict:
+        """Route to appropriate stage handler"""
+        if session.current_stage == "device_discovery":
+            return self._handle_device_discovery(session, user_input)
+        elif session.current_stage == "symptom_discovery":
+            return self._handle_symptom_discovery(session, user_input)
+        elif session.current_stage == "problem_solver":
+            return self._handle_problem_solver(session, user_input)
+    
+    def stream_step(self, session: RepairSession, user_input: str) -> Iterator[str]:
+        """
+        Same as step, but yields the agent response as partial text
+        chunks while it is produced (LLM tokens stream as they arrive).
+        The full response dict is available in session.last_response afterwards.
+        """
+        chunks: queue.Queue = queue.Queue()
+        done = object()
+        result = {}
+        
+        def worker():
+            try:
+                result["response"] = self.step(session, user_input, chunk_sink=chunks.put)
+            except Exception as e:
+                result["exception"] = e
+            finally:
+                chunks.put(done)
+        
+        threading.Thread(target=worker, daemon=True).start()
+        
+        streamed = ""
+        while True:
+            chunk = chunks.get()
+            if chunk is done:
+                break
+            streamed += chunk
+            yield chunk
+        
+        if "exception" in result:
+            raise result["exception"]
+        
+        response = result["response"]
+        session.last_response = response
+        
+        # Emit whatever was not streamed token by token (templates, footers)
+        text = response.get("agent_response") or response.get("error", "")
+        if streamed and text.startswith(streamed):
+            text = text[len(streamed):]
+        elif streamed:
+            text = "\n\n" + text
+        if text:
+            yield text
+    
+    def stage_events(self, session: RepairSession, stage_index_before: int, response: Dict) -> List[tuple]:
+        """
+        Structured (event, data) pairs describing what a turn changed, for
+        streaming clients: "stage" on a stage change, "question" for the next
+        symptom question, "attempt" for a new repair step, "complete" at the end.
+        """
+        events = []
+        if session.current_stage_index != stage_index_before:
+            events.append(("stage", {
+                "stage": session.current_stage,
+                "stage_index": session.current_stage_index,
+                "previous_stage": STAGES[stage_index_before]
+            }))
+        if session.current_stage == "symptom_discovery" and "current_question" in response:
+            events.append(("question", {
+                "question_number": response["question_number"],
+                "total_questions": self.SYMPTOM_QUESTIONS,
+                "text": response["current_question"]
+            }))
+        elif session.current_stage == "symptom_discovery":
+            # Device just confirmed - the first question is part of the device text
+            question_number = len(session.symptoms) + 1
+            events.append(("question", {
+                "question_number": question_number,
+                "total_questions": self.SYMPTOM_QUESTIONS,
+                "text": self.task_router.run(
+                    "symptom_question",
+                    question_number=question_number,
+                    device_model=session.device_info["device_model"],
+                    previous_answers=session.symptoms
+                )
+            }))
+        if "repair_step" in response:
+            events.append(("attempt", {
+                "attempt": response["attempt"],
+                "max_attempts": self.MAX_REPAIR_ATTEMPTS
+            }))
+        if session.session_complete:
+            events.append(("complete", {
+                "resolved": bool(response.get("resolved")),
+                "escalated": bool(response.get("escalated"))
+            }))
+        return events
+    
+    def _handle_device_discovery(self, session: RepairSession, user_input: str) -> Dict:
+        """Stage 1: Validate device against known list"""
+        
+        # Search for device
+        with self.tracer.span("device_manager.find_device") as span:
+            device_result = self.device_manager.find_device(user_input)
+            span.set(known=device_result["is_known"])
+        
+        # Store device info
+        session.device_info = device_result
+        
+        # Create response
+        response = {
+            "stage": "device_discovery",
+            "stage_index": 0,
+            "is_complete": device_result["is_known"]
+        }
+        
+        if device_result["is_known"]:
+            # Device found - move to stage 2
+            response.update({
+                "structured_data": {
+                    "device_model": device_result["device_model"],
+                    "device_name": device_result["device_info"]["full_name"],
+                    "is_known": True
+                },
+                "agent_response": self._device_found_text(device_result),
+                "next_action": "Proceed to symptom discovery"
+            })
+            
+            # Advance to stage 2
+            session.current_stage_index = 1
+        else:
+            # Device not found - suggest the closest catalog entries
+            with self.tracer.span("device_manager.suggest_devices"):
+                suggestions = self.device_manager.suggest_devices(user_input)
+            response.update({
+                "structured_data": {
+                    "device_model": None,
+                    "is_known": False,
+                    "user_input": user_input,
+                    "suggestions": [s["full_name"] for s in suggestions]
+                },
+                "agent_response": self._device_unknown_text(suggestions),
+                "next_action": "Try another device name"
+            })
+        
+        self._record_turn(session, {
+            "stage": "device_discovery",
+            "user_input": user_input,
+            "device_model": device_result["device_model"] if device_result["is_known"] else None
+        })
+        
+        return response
+    
+    def _handle_symptom_discovery(self, session: RepairSession, user_input: str) -> Dict:
+        """Stage 2: Ask 7 sequential symptom questions"""
+        
+        # Which question number should we store an answer for?
+        # If symptoms dict is empty, user is answering question 1
+        # If symptoms has 1 answer, user is answering question 2, etc.
+        if user_input:
+            answer_question_num = len(session.symptoms) + 1
+            session.symptoms[answer_question_num] = user_input
+            if answer_question_num == self.RAG_WARM_UP_AFTER_QUESTION:
+                self._warm_up_rag()
+            elif answer_question_num == self.SYMPTOM_QUESTIONS:
+                self._prefetch_rag_candidates(session)
+        
+        # Which question should we ask next?
+        next_question_num = len(session.symptoms) + 1
+        
+        response = {
+            "stage": "symptom_discovery",
+            "stage_index": 1,
+            "question_number": next_question_num,
+            "total_questions": self.SYMPTOM_QUESTIONS
+        }
+        
+        # All 7 questions have been answered - move to stage 3
+        if len(session.symptoms) >= self.SYMPTOM_QUESTIONS:
+            response.update({
+                "is_complete": True,
+                "structured_data": {
+                    "symptoms": session.symptoms,
+                    "symptom_summary": self.build_symptom_summary(session)
+                },
+                "agent_response": self._symptoms_complete_text(session),
+                "next_action": "Move to problem solver stage"
+            })
+            
+            # Advance to stage 3
+            session.current_stage_index = 2
+        
+        else:
+            # Ask next question (fixed text - rendered locally, no LLM call)
+            next_question = self.task_router.run(
+                "symptom_question",
+                question_number=next_question_num,
+                device_model=session.device_info["device_model"],
+                previous_answers=session.symptoms
+            )
+            
+            response.update({
+                "is_complete": False,
+                "current_question": next_question,
+                "agent_response": next_question,
+                "progress_text": f"Question {next_question_num} of {self.SYMPTOM_QUESTIONS}"
+            })
+        
+        self._record_turn(session, {
+            "stage": "symptom_discovery",
+            "question": next_question_num,
+            "user_input": user_input
+        })
+        
+        return response
+    
+    def _handle_problem_solver(self, session: RepairSession, user_input: str) -> Dict:
+        """Stage 3: Generate repair steps, max 5 attempts"""
+        
+        attempt_number = len(session.repair_attempts) + 1
+        
+        response = {
+            "stage": "problem_solver",
+            "stage_index": 2,
+            "attempt": attempt_number,
+            "max_attempts": self.MAX_REPAIR_ATTEMPTS
+        }
+        
+        # Process previous attempt result
+        if attempt_number > 1 and session.repair_attempts:
+            last_attempt = session.repair_attempts[-1]
+            
+            if user_input.lower() in ["yes", "y", "solved", "fixed", "resolved"]:
+                # Problem solved!
+                response.update({
+                    "is_complete": True,
+                    "resolved": True,
+                    "structured_data": {
+                        "device_model": session.device_info["device_model"],
+                        "symptoms": session.symptoms,
+                        "repair_attempts": session.repair_attempts,
+                        "resolved": True,
+                        "resolution_step": attempt_number - 1
+                    },
+                    "agent_response": """🎉 Excellent! I'm glad I could help you resolve the issue.
+
+Here's a summary of what we did:
+""" + "\n".join([f"• {step['step']}" for step in session.repair_attempts]),
+                    "next_action": "Session complete"
+                })
+                
+                session.session_complete = True
+                session.final_resolution = "success"
+                
+                return {**response, "final_output": self._complete(session)}
+        
+        # Check if max attempts reached
+        if attempt_number > self.MAX_REPAIR_ATTEMPTS:
+            response.update({
+                "is_complete": True,
+                "resolved": False,
+                "escalated": True,
+                "structured_data": {
+                    "device_model": session.device_info["device_model"],
+                    "symptoms": session.symptoms,
+                    "repair_attempts": session.repair_attempts,
+                    "resolved": False,
+                    "escalation_reason": "Max repair attempts reached"
+                },
+                "agent_response": self.task_router.run(
+                    "escalation",
+                    device_model=session.device_info["device_model"],
+                    attempts=len(session.repair_attempts)
+                ),
+                "next_action": "Escalation complete"
+            })
+            
+            session.session_complete = True
+            session.final_resolution = "escalated"
+            
+            return {**response, "final_output": self._complete(session)}
+        
+        recorded = getattr(self._local, "recorded_outcome", None)
+        if recorded and "step" in recorded:
+            # Journal replay: reuse the step generated originally
+            repair_step = recorded["step"]
+            rag_sources = recorded.get("sources", [])
+        else:
+            # Ranked solutions are retrieved once per session, not per attempt
+            rag_results = self.get_rag_candidates(session)
+            
+            # Build repair step from RAG results
+            repair_step = self._generate_repair_step(
+                session,
+                attempt_number,
+                rag_results,
+                session.repair_attempts
+            )
+            step_sources = dict(reversed(self._ranked_steps(rag_results)))
+            if repair_step in step_sources:
+                rag_sources = [step_sources[repair_step]]
+            else:
+                rag_sources = [r["resolution"] for r in rag_results[:1]]
+        
+        # Store attempt
+        session.repair_attempts.append({
+            "attempt": attempt_number,
+            "step": repair_step,
+            "rag_sources": rag_sources
+        })
+        
+        response.update({
+            "is_complete": False,
+            "resolved": None,
+            "repair_step": repair_step,
+            "agent_response": self._repair_step_text(repair_step),
+            "progress_text": f"Attempt {attempt_number} of {self.MAX_REPAIR_ATTEMPTS}"
+        })
+        
+        self._record_turn(session, {
+            "stage": "problem_solver",
+            "attempt": attempt_number,
+            "user_input": user_input
+        })
+        
+        return response
+    
+    def get_rag_candidates(self, session: RepairSession) -> List[Dict]:
+        """
+        Ranked RAG solutions for the session's device and symptoms.
+        Searched once and kept on the session; a changed symptom summary
+        (or invalidate_rag_candidates) triggers a new search.
+        """
+        symptom_summary = self.build_symptom_summary(session)
+        key = self._rag_key(session, symptom_summary)
+        if session.rag_candidates is not None and session.rag_candidates_key == key:
+            return session.rag_candidates
+        
+        with self.tracer.span("rag.candidates") as span:
+            candidates = None
+            if session.rag_prefetch is not None and session.rag_prefetch_key == key:
+                # Usually finished during user think time; otherwise wait for it
+                try:
+                    with self.tracer.span("rag.prefetch_wait"):
+                        candidates = session.rag_prefetch.result()
+                    span.set(source="prefetch")
+                except Exception as e:
+                    print(f"RAG prefetch error: {e}")
+            
+            if candidates is None:
+                span.set(source="search")
+                candidates = self._search_rag(
+                    session.device_info["device_model"], symptom_summary, dict(session.symptoms)
+                )
+            span.set(results=len(candidates))
+        
+        session.rag_candidates = candidates
+        session.rag_candidates_key = key
+        session.rag_prefetch = session.rag_prefetch_key = None
+        return candidates
+    
+    def _prefetch_pool_executor(self) -> ThreadPoolExecutor:
+        with self._prefetch_lock:
+            if self._prefetch_pool is None:
+                self._prefetch_pool = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("RAG_PREFETCH_WORKERS", "4")),
+                    thread_name_prefix="rag-prefetch"
+                )
+            return self._prefetch_pool
+    
+    def _warm_up_rag(self):
+        """Connect the lazily created Qdrant/VoyageAI clients in the background (no search)"""
+        if not self.rag_prefetch or getattr(self._local, "recorded_outcome", None) is not None:
+            return
+        with self._prefetch_lock:
+            if self._rag_warmed_up:
+                return
+            self._rag_warmed_up = True
+        self._prefetch_pool_executor().submit(self.rag.warm_up)
+    
+    def _prefetch_rag_candidates(self, session: RepairSession):
+        """
+        Start the RAG search in the background once the symptom answers are
+        complete; get_rag_candidates consumes it if the device and summary
+        still match when the first repair attempt is requested.
+        """
+        if not self.rag_prefetch or getattr(self._local, "recorded_outcome", None) is not None:
+            return
+        
+        symptom_summary = self.build_symptom_summary(session)
+        key = self._rag_key(session, symptom_summary)
+        if session.rag_prefetch_key == key:
+            return
+        if session.rag_prefetch is not None:
+            session.rag_prefetch.cancel()
+        
+        session.rag_prefetch = self._prefetch_pool_executor().submit(
+            self._search_rag, session.device_info["device_model"], symptom_summary, dict(session.symptoms)
+        )
+        session.rag_prefetch_key = key
+    
+    def _search_rag(self, device_model: str, symptom_summary: str, symptoms: Dict[int, str]) -> List[Dict]:
+        """Error-code index first (question 4, then other answers), vector search as fallback"""
+        error_codes = symptom_error_codes(symptoms)
+        if error_codes:
+            with self.tracer.span("rag.error_code_lookup", codes=len(error_codes)) as span:
+                solutions = self.rag.lookup_error_codes(device_model, error_codes, top_k=3)
+                span.set(results=len(solutions))
+            if solutions:
+                return solutions
+        
+        return self.rag.search_solutions(
+            device_model=device_model,
+            symptoms_summary=symptom_summary,
+            top_k=3
+        )
+    
+    @staticmethod
+    def _rag_key(session: RepairSession, symptom_summary: str) -> str:
+        return f"{session.device_info['device_model']}\n{symptom_summary}"
+    
+    def invalidate_rag_candidates(self, session: RepairSession):
+        """Drop the cached and prefetched RAG candidates so the next attempt searches again"""
+        if session.rag_prefetch is not None:
+            session.rag_prefetch.cancel()
+        session.rag_candidates = None
+        session.rag_candidates_key = None
+        session.rag_prefetch = None
+        session.rag_prefetch_key = None
+    
+    def update_symptom(self, session: RepairSession, question_number: int, answer: str):
+        """Edit a symptom answer and invalidate the cached RAG candidates"""
+        session.symptoms[question_number] = answer
+        self.invalidate_rag_candidates(session)
+    
+    @staticmethod
+    def _ranked_steps(rag_results: List[Dict]) -> List[tuple]:
+        """(step, resolution) pairs of all candidates in rank order"""
+        return [
+            (step, result.get("resolution"))
+            for result in rag_results
+            for step in (result.get("steps") or [])
+        ]
+    
+    def _ordered_steps(self, session: RepairSession, rag_results: List[Dict]) -> List[str]:
+        """Candidate steps in rank order, re-sorted by their historical success"""
+        steps = list(dict.fromkeys(step for step, _ in self._ranked_steps(rag_results)))
+        return self.outcomes.order_steps(session.device_info["device_model"], session.symptoms, steps)
+    
+    def _complete(self, session: RepairSession) -> Dict:
+        """Final output of a finished session, fed to the step outcome table by step()"""
+        final_output = self.get_final_output(session)
+        if getattr(self._local, "recorded_outcome", None) is None:
+            self._local.completed_output = final_output
+        return final_output
+    
+    def _record_turn(self, session: RepairSession, entry: Dict):
+        """
+        Append a compact history entry. The oldest entries are dropped past
+        MAX_HISTORY_ENTRIES (a SessionJournal keeps the complete record).
+        """
+        session.turn_count += 1
+        session.conversation_history.append(entry)
+        overflow = len(session.conversation_history) - self.MAX_HISTORY_ENTRIES
+        if overflow > 0:
+            del session.conversation_history[:overflow]
+    
+    def _device_found_text(self, device_result: Dict) -> str:
+        return f"""Great! I found your device: {device_result['device_info']['full_name']}
+                
+I'm ready to help you repair this {device_result['device_info']['device_type']}.
+Let me start by asking you some questions to understand the issue better."""
+    
+    def _device_unknown_text(self, suggestions: List[Dict]) -> str:
+        if suggestions:
+            devices_list = "\n".join([f"• {s['full_name']}" for s in suggestions])
+            closest = f"Did you mean one of these?\n{devices_list}"
+        else:
+            closest = "I couldn't find a similar device."
+        return f"""I don't recognize that device model in my database.
+
+{closest}
+
+You can browse all supported devices in the sidebar.
+
+Could you provide your device information in one of these formats?
+- Model number (e.g., SMS6EDI06E)
+- Full model name (e.g., Bosch Dishwasher Serie 6 SMS6EDI06E)
+- Manufacturer and type (e.g., Bosch Dishwasher)
+
+Or contact support for guidance on unlisted devices."""
+    
+    def _symptoms_complete_text(self, session: RepairSession) -> str:
+        return f"""Excellent! I've gathered all the information I need.
+
+Summary of what you reported:
+{self.build_symptom_summary(session)}
+
+Now let me search our repair database for solutions that match your device and these symptoms."""
+    
+    @staticmethod
+    def _repair_step_text(repair_step: str) -> str:
+        return f"""{repair_step}
+
+**After completing this step:**
+Did this resolve your issue? (yes/no)"""
+    
+    def render_transcript(self, session: RepairSession) -> List[Dict[str, str]]:
+        """Rebuild the chat messages of the retained history from session state"""
+        messages = []
+        for entry in session.conversation_history:
+            if entry.get("user_input"):
+                messages.append({"role": "user", "content": entry["user_input"]})
+            
+            if "response" in entry:
+                # Entry recorded before history was compacted
+                text = entry["response"].get("agent_response", "")
+            elif entry["stage"] == "device_discovery":
+                if entry["device_model"] and session.device_info and session.device_info.get("is_known"):
+                    text = self._device_found_text(session.device_info)
+                else:
+                    text = self._device_unknown_text(self.device_manager.suggest_devices(entry["user_input"]))
+            elif entry["stage"] == "symptom_discovery":
+                if entry["question"] > self.SYMPTOM_QUESTIONS:
+                    text = self._symptoms_complete_text(session)
+                else:
+                    text = self.task_router.run("symptom_question", question_number=entry["question"])
+            else:
+                text = self._repair_step_text(session.repair_attempts[entry["attempt"] - 1]["step"])
+            
+            messages.append({"role": "assistant", "content": text})
+        return messages
+    
+    def build_symptom_summary(self, session: RepairSession) -> str:
+        """Build readable symptom summary from Q&A"""
+        questions = {
+            1: "Start date",
+            2: "Symptoms",
+            3: "Recent changes",
+            4: "Error codes",
+            5: "Conditions",
+            6: "Troubleshooting tried",
+            7: "Environment"
+        }
+        
+        summary_lines = []
+        for q_num in range(1, self.SYMPTOM_QUESTIONS + 1):
+            if q_num in session.symptoms:
+                summary_lines.append(
+                    f"• {questions[q_num]}: {session.symptoms[q_num]}"
+                )
+        
+        return "\n".join(summary_lines) if summary_lines else "No symptoms recorded"
+    
+    def _generate_repair_step(
+        self,
+        session: RepairSession,
+        attempt_number: int,
+        rag_results: List[Dict],
+        previous_steps: List[Dict]
+    ) -> str:
+        """Generate repair step from RAG results"""
+        
+        # Step through the ranked candidates (the top result's steps first,
+        # then the next candidates'), steps that resolved this problem in
+        # earlier sessions moved ahead
+        tried = {attempt["step"] for attempt in previous_steps}
+        for step in self._ordered_steps(session, rag_results):
+            if step not in tried:
+                return step
+        
+        if self.use_llm_steps and self.llm_available:
+            try:
+                return self._generate_llm_step(session, attempt_number, previous_steps)
+            except Exception as e:
+                print(f"LLM step generation error: {e}")
+        
+        # Fallback generic steps
+        generic_steps = {
+            1: "Step 1: Reset the device - turn off power for 30 seconds, then turn back on and run a test cycle",
+            2: "Step 2: Check all visible connections - ensure power cord is firm, water/gas lines are connected",
+            3: "Step 3: Clean filters and strainers - remove any debris that could block normal operation",
+            4: "Step 4: Verify water/power supply - check that water inlet and electrical supply are working properly",
+            5: "Step 5: Test individual components - if you're comfortable, use a multimeter to check electrical components"
+        }
+        
+        return generic_steps.get(attempt_number, f"Step {attempt_number}: Unable to generate further steps - escalation recommended")
+    
+    def _generate_llm_step(self, session: RepairSession, attempt_number: int, previous_steps: List[Dict]) -> str:
+        """Generate a repair step with the repair guide agent, streaming to the sink"""
+        chunks = []
+        for chunk in self.task_router.stream(
+            "repair_guide",
+            device_model=session.device_info["device_model"],
+            symptoms_summary=self.build_symptom_summary(session),
+            attempt_number=attempt_number,
+            previous_steps=[attempt["step"] for attempt in previous_steps]
+        ):
+            chunks.append(chunk)
+            chunk_sink = getattr(self._local, "chunk_sink", None)
+            if chunk_sink is not None:
+                chunk_sink(chunk)
+        return "".join(chunks)
+    
+    def get_final_output(self, session: RepairSession) -> Dict:
+        """Generate final JSON output with all collected data"""
+        return {
+            "session_complete": session.session_complete,
+            "resolution": session.final_resolution,
+            "device": {
+                "model": session.device_info.get("device_model") if session.device_info else None,
+                "name": session.device_info.get("device_info", {}).get("full_name") if session.device_info else None,
+                "is_known": session.device_info.get("is_known") if session.device_info else False
+            },
+            "symptoms": session.symptoms,
+            "repair_log": session.repair_attempts,
+            "conversation_turns": session.turn_count,
+            "final_status": {
+                "resolved": session.final_resolution == "success",
+                "escalated": session.final_resolution == "escalated",
+                "attempts_made": len(session.repair_attempts)
+            }
+        }
+    
+    def is_complete(self, session: RepairSession) -> bool:
+        """Check if repair session is complete"""
+        return session.session_complete
+    
+    def get_state_json(self, session: RepairSession) -> str:
+        """Export complete state as JSON for persistence (restorable with restore_session)"""
+        return json.dumps({
+            "stage": session.current_stage,
+            **session.to_dict(),
+            "final_output": self.get_final_output(session)
+        }, indent=2)
+    
+    def restore_session(self, state) -> RepairSession:
+        """Rebuild a session from get_state_json() output (str or dict)"""
+        if isinstance(state, (str, bytes)):
+            state = json.loads(state)
+        return RepairSession.from_dict(state)
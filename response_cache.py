@@ -0,0 +1,233 @@
+"""Exact + semantic response cache for LLM-backed repair tasks"""
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class ResponseCache:
+    """
+    Two-layer cache in front of LLM task execution.
+
+    Layer 1 (exact): key = hash of the normalized task prompt inputs.
+    Layer 2 (semantic): within a partition of fields that must match exactly
+    (e.g. device + attempt number), reuse a response whose embedding is
+    similar above a threshold. Vectors live in a small local index.
+
+    Entries expire after a TTL and are evicted least-recently-used.
+    A query vector embedded by a missed get() is kept until the matching
+    put(), so a generated response is stored without embedding it again.
+    """
+
+    DEFAULT_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+    DEFAULT_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+    DEFAULT_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95"))
+    # Missed queries whose vectors wait for put() (requests in flight)
+    PENDING_VECTORS = 256
+
+    # Fields that must match exactly for a semantic hit; the remaining
+    # fields form the text that is embedded (escalation renders locally in
+    # TaskRouter and never reaches the cache)
+    PARTITION_FIELDS = {
+        "device_discovery": (),
+        "repair_guide": ("device_model", "attempt_number"),
+    }
+
+    _shared: Dict[Any, "ResponseCache"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        embed_fn: Optional[Callable[[str], Optional[List[float]]]] = None,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        similarity_threshold: float = DEFAULT_SIMILARITY
+    ):
+        """embed_fn enables the semantic layer; without it only exact hits are served"""
+        self.embed_fn = embed_fn
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+
+        self._lock = threading.Lock()
+        # key -> {"value", "expires_at", "partition"}
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        # partition -> {key: unit vector}
+        self._vectors: Dict[str, Dict[str, List[float]]] = {}
+        # exact key -> unit vector of a missed get(), consumed by put()
+        self._pending_vectors: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    @classmethod
+    def shared(cls, embed_fn: Optional[Callable[[str], Optional[List[float]]]] = None) -> "ResponseCache":
+        """
+        Process-wide cache per embedder, shared across sessions and engines
+        (semantic vectors from different embedders are not comparable)
+        """
+        with cls._shared_lock:
+            if embed_fn not in cls._shared:
+                cls._shared[embed_fn] = cls(embed_fn=embed_fn)
+            return cls._shared[embed_fn]
+
+    @staticmethod
+    def _normalize(value: Any) -> str:
+        text = json.dumps(value, sort_keys=True, default=str, ensure_ascii=False)
+        return re.sub(r"\s+", " ", text.lower()).strip()
+
+    def _split(self, task_name: str, params: Dict[str, Any]) -> Tuple[str, str, str]:
+        """Return (exact key, semantic partition, semantic text)"""
+        exact_key = hashlib.sha256(
+            f"{task_name}|{self._normalize(params)}".encode("utf-8")
+        ).hexdigest()
+
+        partition_fields = self.PARTITION_FIELDS.get(task_name, ())
+        partition = self._normalize(
+            [task_name] + [params.get(field) for field in partition_fields]
+        )
+        semantic_text = self._normalize(
+            {k: v for k, v in params.items() if k not in partition_fields}
+        )
+        return exact_key, partition, semantic_text
+
+    @staticmethod
+    def _unit(vector: List[float]) -> List[float]:
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def get(self, task_name: str, params: Dict[str, Any]) -> Optional[str]:
+        """Return a cached response for the task, or None on miss"""
+        exact_key, partition, semantic_text = self._split(task_name, params)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(exact_key)
+            if entry is not None:
+                if entry["expires_at"] > now:
+                    self._entries.move_to_end(exact_key)
+                    self._record(task_name, "exact_hits")
+                    return entry["value"]
+                self._remove(exact_key)
+            has_candidates = bool(self._vectors.get(partition))
+
+        if self.embed_fn is None or not has_candidates:
+            self._record(task_name, "misses")
+            return None
+
+        vector = self.embed_fn(semantic_text)
+        if not vector:
+            self._record(task_name, "misses")
+            return None
+        query = self._unit(vector)
+
+        # Score a snapshot of the partition outside the lock, so concurrent
+        # requests are not serialized behind the scan
+        with self._lock:
+            candidates = list(self._vectors.get(partition, {}).items())
+        best_key, best_score = None, self.similarity_threshold
+        for key, candidate in candidates:
+            score = sum(a * b for a, b in zip(query, candidate))
+            if score >= best_score:
+                best_key, best_score = key, score
+
+        with self._lock:
+            # The best entry may have been evicted while scoring
+            entry = self._entries.get(best_key) if best_key is not None else None
+            if entry is not None:
+                if entry["expires_at"] > now:
+                    self._entries.move_to_end(best_key)
+                    self._record(task_name, "semantic_hits")
+                    # Promote to an exact entry so repeats skip the embedding call
+                    self._store(exact_key, partition, entry["value"], query, now)
+                    return entry["value"]
+                self._remove(best_key)
+
+            self._pending_vectors[exact_key] = query
+            while len(self._pending_vectors) > self.PENDING_VECTORS:
+                self._pending_vectors.popitem(last=False)
+
+        self._record(task_name, "misses")
+        return None
+
+    def put(self, task_name: str, params: Dict[str, Any], value: str):
+        """Store a task response in both layers"""
+        exact_key, partition, semantic_text = self._split(task_name, params)
+        with self._lock:
+            vector = self._pending_vectors.pop(exact_key, None)
+        if vector is None and self.embed_fn is not None:
+            embedding = self.embed_fn(semantic_text)
+            vector = self._unit(embedding) if embedding else None
+
+        with self._lock:
+            self._store(exact_key, partition, value, vector, time.monotonic())
+
+    def _store(self, key: str, partition: str, value: str, vector: Optional[List[float]], now: float):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = {
+            "value": value,
+            "expires_at": now + self.ttl,
+            "partition": partition,
+        }
+        if vector is not None:
+            self._vectors.setdefault(partition, {})[key] = vector
+
+        while len(self._entries) > self.max_entries:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self._record_global("evictions")
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        vectors = self._vectors.get(entry["partition"])
+        if vectors is not None:
+            vectors.pop(key, None)
+            if not vectors:
+                del self._vectors[entry["partition"]]
+
+    def clear(self):
+        with self._lock, self._stats_lock:
+            self._entries.clear()
+            self._vectors.clear()
+            self._pending_vectors.clear()
+            self._stats.clear()
+
+    def _record(self, task_name: str, counter: str):
+        with self._stats_lock:
+            stats = self._stats.setdefault(
+                task_name, {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+            )
+            stats[counter] += 1
+
+    def _record_global(self, counter: str):
+        with self._stats_lock:
+            stats = self._stats.setdefault("_cache", {})
+            stats[counter] = stats.get(counter, 0) + 1
+
+    def get_metrics(self) -> Dict[str, Dict]:
+        """Per-task hit counts and hit rates"""
+        metrics = {}
+        with self._stats_lock:
+            snapshot = {name: dict(stats) for name, stats in self._stats.items()}
+        for task_name, stats in snapshot.items():
+            if task_name == "_cache":
+                continue
+            hits = stats["exact_hits"] + stats["semantic_hits"]
+            total = hits + stats["misses"]
+            metrics[task_name] = {
+                **stats,
+                "requests": total,
+                "hit_rate": hits / total if total else 0.0
+            }
+        metrics["_cache"] = {
+            "entries": len(self._entries),
+            "evictions": snapshot.get("_cache", {}).get("evictions", 0)
+        }
+        return metrics
@@ -0,0 +1,278 @@
+"""Append-only session journal (event sourcing) for crash recovery"""
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from repair_engine import RepairSession
+
+
+class SessionJournal:
+    """
+    Append-only log of repair turns.
+
+    Every engine step appends one compact JSON line:
+        {"t": "turn", "sid": ..., "stage": <index before>, "input": ...,
+         "outcome": {"stage": <index after>, "complete": ..., "step": ...}}
+
+    Writes are group-committed: appends queue up while a background thread
+    fsyncs the previous batch, so concurrent sessions share one fsync.
+    append_turn() returns once its line is durable.
+
+    Every `snapshot_every` turns of a session a full snapshot line is written,
+    so replay only re-applies the turns after the latest snapshot.
+    """
+
+    DEFAULT_SNAPSHOT_EVERY = int(os.getenv("SESSION_JOURNAL_SNAPSHOT_EVERY", "8"))
+    DEFAULT_COMMIT_DELAY = float(os.getenv("SESSION_JOURNAL_COMMIT_DELAY_MS", "0")) / 1000
+
+    _shared: Dict[str, "SessionJournal"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        path: str = "sessions.journal",
+        snapshot_every: int = DEFAULT_SNAPSHOT_EVERY,
+        commit_delay: float = DEFAULT_COMMIT_DELAY,
+        group_commit: bool = True
+    ):
+        """
+        commit_delay: extra seconds the flusher waits to collect a larger batch.
+        group_commit=False fsyncs every append inline (for comparison).
+        """
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.commit_delay = commit_delay
+        self.group_commit = group_commit
+
+        self._file = open(path, "ab")
+        self._terminate_torn_line()
+        self._cond = threading.Condition()
+        self._pending: List[bytes] = []
+        self._enqueued = 0
+        self._durable = 0
+        self._error: Optional[Exception] = None
+        self._closed = False
+        # session_id -> turns appended since its last snapshot (open sessions
+        # only; guarded by _cond)
+        self._since_snapshot: Dict[str, int] = {}
+
+        self._flusher = None
+        if group_commit:
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+
+    def _terminate_torn_line(self):
+        """Start appends on a fresh line if a crash left a partial one"""
+        if self._file.tell() == 0:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                self._file.write(b"\n")
+                self._file.flush()
+
+    @classmethod
+    def shared(cls, path: str = "sessions.journal") -> "SessionJournal":
+        """Process-wide journal per path"""
+        with cls._shared_lock:
+            if path not in cls._shared:
+                cls._shared[path] = cls(path)
+            return cls._shared[path]
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def append_turn(self, session: RepairSession, stage_index: int, user_input: str, response: Dict):
+        """Record one engine step (called by RepairEngine.step)"""
+        outcome = {
+            "stage": session.current_stage_index,
+            "complete": session.session_complete
+        }
+        if "repair_step" in response:
+            # The only non-deterministic part of a turn (RAG / LLM output)
+            attempt = session.repair_attempts[-1]
+            outcome["step"] = attempt["step"]
+            outcome["sources"] = attempt["rag_sources"]
+
+        records = [{
+            "t": "turn",
+            "sid": session.session_id,
+            "stage": stage_index,
+            "input": user_input,
+            "outcome": outcome,
+            "ts": round(time.time(), 3)
+        }]
+
+        with self._cond:
+            if session.session_complete:
+                # No further turns: replay needs no snapshot to stay short
+                self._since_snapshot.pop(session.session_id, None)
+            else:
+                count = self._since_snapshot.get(session.session_id, 0) + 1
+                if count >= self.snapshot_every:
+                    records.append(self._snapshot_record(session))
+                    count = 0
+                self._since_snapshot[session.session_id] = count
+
+        self._append(records)
+
+    def snapshot(self, session: RepairSession):
+        """Write a full snapshot of the session"""
+        with self._cond:
+            if not session.session_complete:
+                self._since_snapshot[session.session_id] = 0
+        self._append([self._snapshot_record(session)])
+
+    @staticmethod
+    def _snapshot_record(session: RepairSession) -> Dict:
+        return {"t": "snapshot", "sid": session.session_id, "state": session.to_dict()}
+
+    def _append(self, records: Iterable[Dict]):
+        data = b"".join(
+            json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode("utf-8") + b"\n"
+            for record in records
+        )
+
+        if not self.group_commit:
+            with self._cond:
+                self._file.write(data)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            return
+
+        with self._cond:
+            if self._closed:
+                raise ValueError("Journal is closed")
+            self._pending.append(data)
+            self._enqueued += 1
+            ticket = self._enqueued
+            self._cond.notify_all()
+            while self._durable < ticket and self._error is None:
+                self._cond.wait()
+            if self._error is not None:
+                raise IOError(f"Journal write failed: {self._error}")
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    return
+
+            if self.commit_delay:
+                time.sleep(self.commit_delay)
+
+            with self._cond:
+                batch, self._pending = self._pending, []
+                target = self._enqueued
+
+            try:
+                self._file.write(b"".join(batch))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except Exception as e:
+                with self._cond:
+                    self._error = e
+                    self._cond.notify_all()
+                return
+
+            with self._cond:
+                self._durable = target
+                self._cond.notify_all()
+
+    def close(self):
+        """Flush outstanding appends and close the file"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._flusher is not None:
+            self._flusher.join()
+        self._file.close()
+
+    # ------------------------------------------------------------------
+    # Recovery
+    # ------------------------------------------------------------------
+
+    def _read_records(self) -> Iterable[Dict]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A crash mid-write can leave a torn last line
+                    print(f"⚠ Skipping unreadable journal line {line_number}")
+
+    def replay(self, engine, session_ids: Optional[Iterable[str]] = None) -> Dict[str, RepairSession]:
+        """
+        Rebuild sessions from the journal: start from each session's latest
+        snapshot and re-apply the turns recorded after it through the engine
+        (recorded repair steps are reused, RAG and the LLM are not called).
+        """
+        wanted = set(session_ids) if session_ids is not None else None
+        snapshots: Dict[str, Dict] = {}
+        turns: Dict[str, List[Dict]] = {}
+
+        for record in self._read_records():
+            sid = record.get("sid")
+            if wanted is not None and sid not in wanted:
+                continue
+            if record["t"] == "snapshot":
+                snapshots[sid] = record["state"]
+                turns[sid] = []
+            elif record["t"] == "turn":
+                turns.setdefault(sid, []).append(record)
+
+        sessions = {}
+        for sid, pending_turns in turns.items():
+            if sid in snapshots:
+                session = RepairSession.from_dict(snapshots[sid])
+            else:
+                session = RepairSession(session_id=sid)
+
+            for turn in pending_turns:
+                if turn["stage"] != session.current_stage_index:
+                    print(f"⚠ Journal turn out of order for session {sid}, replay stopped")
+                    break
+                engine.apply_event(session, turn)
+                if session.current_stage_index != turn["outcome"]["stage"]:
+                    print(f"⚠ Journal replay diverged for session {sid}")
+
+            sessions[sid] = session
+            with self._cond:
+                if not session.session_complete:
+                    self._since_snapshot[sid] = len(pending_turns)
+
+        return sessions
+
+    def compact(self, engine) -> int:
+        """
+        Rewrite the journal as one snapshot per open session (bounds file
+        size). Completed sessions are dropped. Returns the sessions kept.
+        """
+        tmp_path = self.path + ".compact"
+        with self._cond:
+            # Block new appends and wait for the in-flight batch
+            while self._durable < self._enqueued and self._error is None:
+                self._cond.wait()
+
+            sessions = {
+                sid: session for sid, session in self.replay(engine).items()
+                if not session.session_complete
+            }
+            with open(tmp_path, "wb") as f:
+                for session in sessions.values():
+                    line = json.dumps(self._snapshot_record(session), separators=(",", ":"), ensure_ascii=False)
+                    f.write(line.encode("utf-8") + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "ab")
+            self._since_snapshot = {sid: 0 for sid in sessions}
+        return len(sessions)
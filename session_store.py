@@ -0,0 +1,167 @@
+"""Pluggable persistent storage for repair sessions"""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+from repair_engine import RepairSession
+
+# Serialized layout: 1 format byte + zlib-compressed compact JSON
+FORMAT_ZLIB_JSON = 1
+
+
+class StaleSessionError(Exception):
+    """Raised when saving a session whose version is behind the stored one"""
+
+
+def serialize_session(session: RepairSession, version: Optional[int] = None) -> bytes:
+    """Encode a session into a compact binary blob (optionally stamping a version)"""
+    state = session.to_dict()
+    if version is not None:
+        state["version"] = version
+    payload = json.dumps(state, separators=(",", ":"), ensure_ascii=False)
+    return bytes([FORMAT_ZLIB_JSON]) + zlib.compress(payload.encode("utf-8"), 1)
+
+
+def deserialize_session(blob: bytes) -> RepairSession:
+    """Decode a blob produced by serialize_session"""
+    if blob[0] != FORMAT_ZLIB_JSON:
+        raise ValueError(f"Unknown session format: {blob[0]}")
+    return RepairSession.from_dict(json.loads(zlib.decompress(blob[1:])))
+
+
+class SessionStore(ABC):
+    """
+    Session store interface with optimistic versioning.
+
+    save() succeeds only if the stored version equals session.version
+    (0 = new session); it then stores version + 1 and updates the session.
+    A concurrent writer that saved first causes StaleSessionError.
+    """
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[RepairSession]:
+        """The stored session, or None if unknown"""
+
+    @abstractmethod
+    def save(self, session: RepairSession) -> int:
+        """Persist the session, returning its new version"""
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        """Remove the session (no error if unknown)"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of stored sessions"""
+
+
+class InMemorySessionStore(SessionStore):
+    """LRU-bounded in-process store (sessions kept serialized)"""
+
+    def __init__(self, max_sessions: int = 10000):
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        # session_id -> (version, blob)
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def load(self, session_id: str) -> Optional[RepairSession]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            self._sessions.move_to_end(session_id)
+        return deserialize_session(entry[1])
+
+    def save(self, session: RepairSession) -> int:
+        new_version = session.version + 1
+        blob = serialize_session(session, version=new_version)
+
+        with self._lock:
+            entry = self._sessions.get(session.session_id)
+            stored_version = entry[0] if entry else 0
+            if stored_version != session.version:
+                raise StaleSessionError(
+                    f"Session {session.session_id} is at version {stored_version}, "
+                    f"save was based on {session.version}"
+                )
+            self._sessions[session.session_id] = (new_version, blob)
+            self._sessions.move_to_end(session.session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+        session.version = new_version
+        return new_version
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite-backed store shared by worker processes and surviving restarts"""
+
+    def __init__(self, path: str = "sessions.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+
+    def load(self, session_id: str) -> Optional[RepairSession]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return deserialize_session(row[0]) if row else None
+
+    def save(self, session: RepairSession) -> int:
+        new_version = session.version + 1
+        blob = serialize_session(session, version=new_version)
+
+        with self._lock:
+            if session.version == 0:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO sessions (session_id, version, data, updated_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (session.session_id, new_version, blob, time.time())
+                )
+            else:
+                cursor = self._conn.execute(
+                    "UPDATE sessions SET version = ?, data = ?, updated_at = ? "
+                    "WHERE session_id = ? AND version = ?",
+                    (new_version, blob, time.time(), session.session_id, session.version)
+                )
+        if cursor.rowcount != 1:
+            raise StaleSessionError(
+                f"Session {session.session_id} was modified since version {session.version}"
+            )
+
+        session.version = new_version
+        return new_version
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
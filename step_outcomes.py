@@ -0,0 +1,142 @@
+"""Outcome-learned success statistics for repair steps"""
+import atexit
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from error_codes import symptom_error_codes
+
+# Symptom question describing the problem in the user's words
+SYMPTOM_QUESTION = 2
+
+
+def symptom_signature(symptoms: Dict) -> str:
+    """
+    Coarse key for "the same problem": the reported error codes, or else the
+    distinct words of the symptom description
+    """
+    symptoms = {int(q): a for q, a in symptoms.items()}
+    codes = symptom_error_codes(symptoms)
+    if codes:
+        return "codes:" + ",".join(sorted(codes))
+    words = sorted(set(re.findall(r"[a-z0-9]{3,}", (symptoms.get(SYMPTOM_QUESTION) or "").lower())))
+    return "text:" + " ".join(words[:8])
+
+
+class StepOutcomeTable:
+    """
+    Per (device_model, symptom signature) success counts for each repair step,
+    fed incrementally with completed get_final_output() records.
+
+    Each step tried in a session counts one try; the last step of a resolved
+    session counts one success. Steps are ranked by smoothed success rate
+    (successes + 1) / (tries + 2), so untried steps (0.5) stay ahead of steps
+    that keep failing.
+
+    The table is bounded (least recently updated keys are dropped) and saved
+    to `path` as compact JSON every `save_every` records.
+    """
+
+    DEFAULT_MAX_KEYS = int(os.getenv("STEP_OUTCOMES_MAX_KEYS", "10000"))
+
+    _shared: Optional["StepOutcomeTable"] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path: Optional[str] = None, max_keys: int = DEFAULT_MAX_KEYS, save_every: int = 20):
+        self.path = path
+        self.max_keys = max_keys
+        self.save_every = save_every
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        # "device|signature" -> {step: [successes, tries]}
+        self._table: "OrderedDict[str, Dict[str, List[int]]]" = OrderedDict()
+        self._unsaved = 0
+        if path and os.path.exists(path):
+            self.load()
+        if path:
+            atexit.register(self.save)
+
+    @classmethod
+    def shared(cls) -> "StepOutcomeTable":
+        """Process-wide table, persisted to STEP_OUTCOMES_PATH when set"""
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls(path=os.getenv("STEP_OUTCOMES_PATH"))
+        return cls._shared
+
+    @staticmethod
+    def _key(device_model: str, symptoms: Dict) -> str:
+        return f"{(device_model or '').upper()}|{symptom_signature(symptoms)}"
+
+    def record(self, final_output: Dict):
+        """Consume one completed session (get_final_output() record)"""
+        if not final_output.get("session_complete") or not final_output["device"].get("model"):
+            return
+        steps = [attempt["step"] for attempt in final_output.get("repair_log", [])]
+        if not steps:
+            return
+        resolved = final_output["final_status"]["resolved"]
+        key = self._key(final_output["device"]["model"], final_output.get("symptoms") or {})
+
+        with self._lock:
+            stats = self._table.pop(key, {})
+            for step in steps:
+                stats.setdefault(step, [0, 0])[1] += 1
+            if resolved:
+                stats[steps[-1]][0] += 1
+            self._table[key] = stats
+            while len(self._table) > self.max_keys:
+                self._table.popitem(last=False)
+            self._unsaved += 1
+            should_save = self.path and self._unsaved >= self.save_every
+
+        if should_save:
+            self.save()
+
+    def order_steps(self, device_model: str, symptoms: Dict, steps: List[str]) -> List[str]:
+        """Steps sorted by historical success for this problem (stable for ties)"""
+        with self._lock:
+            stats = self._table.get(self._key(device_model, symptoms))
+            if not stats:
+                return list(steps)
+            stats = dict(stats)
+
+        def score(step):
+            successes, tries = stats.get(step, (0, 0))
+            return (successes + 1) / (tries + 2)
+
+        return sorted(steps, key=score, reverse=True)
+
+    def get_stats(self, device_model: str, symptoms: Dict) -> Dict[str, List[int]]:
+        """{step: [successes, tries]} for a device and symptom set"""
+        with self._lock:
+            return {step: list(counts) for step, counts in self._table.get(self._key(device_model, symptoms), {}).items()}
+
+    def save(self):
+        """Write the table to disk (atomic replace)"""
+        if not self.path:
+            return
+        with self._lock:
+            payload = json.dumps(self._table, separators=(",", ":"), ensure_ascii=False)
+            self._unsaved = 0
+        tmp_path = self.path + ".tmp"
+        with self._save_lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp_path, self.path)
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                table = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠ Could not load step outcomes from {self.path}: {e}")
+            return
+        with self._lock:
+            self._table = OrderedDict(table)
+
+    def __len__(self) -> int:
+        return len(self._table)
@@ -0,0 +1,26 @@
+"""Shared fixtures: an offline RepairEngine whose repair steps come from a fake streaming chat model"""
+import contextlib
+import io
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from benchmarks import OfflineRAG, SESSION_SCRIPT
+from device_manager import DeviceManager
+from repair_engine import RepairEngine
+from step_outcomes import StepOutcomeTable
+
+LLM_STEP = "Step 1: Unplug the unit and inspect the water inlet screen for debris."
+
+# Device and symptom answers; the next input ("") starts the problem solver
+SYMPTOM_SCRIPT = SESSION_SCRIPT[:1 + RepairEngine.SYMPTOM_QUESTIONS]
+
+
+@pytest.fixture
+def engine():
+    """Engine without network access: no manuals, LLM steps from FakeListChatModel"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = RepairEngine(device_manager=DeviceManager(), rag=OfflineRAG(), outcomes=StepOutcomeTable())
+    engine.use_llm_steps = True
+    engine.llm_available = True
+    engine.task_router.cache = None
+    engine.task_router.stream_llm = FakeListChatModel(responses=[LLM_STEP])
+    return engine
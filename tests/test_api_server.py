@@ -0,0 +1,64 @@
+"""Turn endpoint: a turn rejected by the store's version check leaves no side effects"""
+import pytest
+from starlette.testclient import TestClient
+import api_server
+from session_journal import SessionJournal
+from session_store import InMemorySessionStore
+from tests.conftest import SYMPTOM_SCRIPT
+
+
+class RacingStore(InMemorySessionStore):
+    """Saves a concurrent writer's copy of the session right before the next save"""
+
+    race = False
+
+    def save(self, session):
+        if self.race:
+            self.race = False
+            super().save(self.load(session.session_id))
+        return super().save(session)
+
+
+@pytest.fixture
+def client(engine, tmp_path):
+    engine.journal = SessionJournal(str(tmp_path / "sessions.journal"))
+    state = api_server.app.state
+    state.engine = engine
+    state.store = RacingStore()
+    state.live_sessions = api_server.LiveSessions(engine)
+    with TestClient(api_server.app) as client:
+        yield client
+    for name in ("engine", "store", "live_sessions"):
+        delattr(state, name)
+    engine.journal.close()
+
+
+def journal_turns(journal, session_id):
+    return [record for record in journal._read_records() if record["t"] == "turn" and record["sid"] == session_id]
+
+
+@pytest.mark.parametrize("path", ["/sessions/{}/turns", "/sessions/{}/turns/stream"])
+def test_stale_turn_records_nothing(client, path):
+    engine, store = client.app.state.engine, client.app.state.store
+    session_id = client.post("/sessions").json()["session_id"]
+    for user_input in SYMPTOM_SCRIPT + [""]:
+        assert client.post(f"/sessions/{session_id}/turns", json={"input": user_input}).status_code == 200
+    turns_before = len(journal_turns(engine.journal, session_id))
+    device_model = store.load(session_id).device_info["device_model"]
+    symptoms = store.load(session_id).symptoms
+
+    store.race = True
+    response = client.post(path.format(session_id), json={"input": "yes"})
+
+    if path.endswith("/stream"):
+        assert "event: error" in response.text and '"status": 409' in response.text
+    else:
+        assert response.status_code == 409
+    assert len(journal_turns(engine.journal, session_id)) == turns_before
+    assert engine.outcomes.get_stats(device_model, symptoms) == {}
+
+    # The retry, based on the stored version, completes and records its outcome
+    response = client.post(f"/sessions/{session_id}/turns", json={"input": "yes"})
+    assert response.status_code == 200 and response.json()["resolved"]
+    assert len(journal_turns(engine.journal, session_id)) == turns_before + 1
+    assert list(engine.outcomes.get_stats(device_model, symptoms).values()) == [[1, 1]]
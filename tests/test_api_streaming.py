@@ -0,0 +1,122 @@
+"""Streaming API endpoints: Server-Sent Events and WebSocket event order"""
+import json
+import pytest
+from starlette.testclient import TestClient
+import api_server
+from session_store import InMemorySessionStore
+from tests.conftest import LLM_STEP, SYMPTOM_SCRIPT
+
+
+@pytest.fixture
+def client(engine):
+    state = api_server.app.state
+    state.engine = engine
+    state.store = InMemorySessionStore()
+    state.live_sessions = api_server.LiveSessions(engine)
+    with TestClient(api_server.app) as client:
+        yield client
+    for name in ("engine", "store", "live_sessions"):
+        delattr(state, name)
+
+
+def create_session(client):
+    response = client.post("/sessions")
+    assert response.status_code == 201
+    return response.json()["session_id"]
+
+
+def post_turn_stream(client, session_id, user_input):
+    """(event, data) pairs of one SSE turn"""
+    response = client.post(f"/sessions/{session_id}/turns/stream", json={"input": user_input})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = []
+    for message in response.text.split("\n\n"):
+        if not message:
+            continue
+        event_line, data_line = message.split("\n")
+        assert event_line.startswith("event: ") and data_line.startswith("data: ")
+        events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+
+def websocket_turn(websocket, user_input):
+    """(event, data) pairs of one WebSocket turn, through its closing done/error event"""
+    websocket.send_json({"input": user_input})
+    events = []
+    while not events or events[-1][0] not in ("done", "error"):
+        message = websocket.receive_json()
+        events.append((message["event"], message["data"]))
+    return events
+
+
+def names(events):
+    return [event for event, _ in events]
+
+
+def test_sse_device_turn(client):
+    session_id = create_session(client)
+    events = post_turn_stream(client, session_id, SYMPTOM_SCRIPT[0])
+
+    assert names(events) == ["stage", "question", "done"]
+    assert events[0][1]["stage"] == "symptom_discovery"
+    assert events[1][1]["question_number"] == 1
+    assert events[-1][1]["session_id"] == session_id
+    assert events[-1][1]["version"] == 2
+
+
+def test_sse_llm_step_streams_chunks_before_events(client):
+    session_id = create_session(client)
+    for user_input in SYMPTOM_SCRIPT:
+        assert client.post(f"/sessions/{session_id}/turns", json={"input": user_input}).status_code == 200
+
+    events = post_turn_stream(client, session_id, "")
+
+    chunk_count = names(events).count("chunk")
+    assert chunk_count > 1
+    assert names(events) == ["chunk"] * chunk_count + ["attempt", "done"]
+    assert "".join(data["text"] for _, data in events[:chunk_count]) == LLM_STEP
+    assert events[-2][1] == {"attempt": 1, "max_attempts": client.app.state.engine.MAX_REPAIR_ATTEMPTS}
+    assert events[-1][1]["repair_step"] == LLM_STEP
+
+
+def test_sse_errors(client):
+    events = post_turn_stream(client, "missing", "hello")
+    assert names(events) == ["error"]
+    assert events[0][1]["status"] == 404
+    session_id = create_session(client)
+    assert client.post(f"/sessions/{session_id}/turns/stream", json={"text": "hello"}).status_code == 400
+
+
+def test_websocket_session(client):
+    session_id = create_session(client)
+    with client.websocket_connect(f"/sessions/{session_id}/ws") as websocket:
+        events = websocket_turn(websocket, SYMPTOM_SCRIPT[0])
+        assert names(events) == ["stage", "question", "done"]
+
+        for user_input in SYMPTOM_SCRIPT[1:-1]:
+            events = websocket_turn(websocket, user_input)
+            assert names(events) == ["question", "done"]
+        events = websocket_turn(websocket, SYMPTOM_SCRIPT[-1])
+        assert names(events) == ["stage", "done"]
+        assert events[0][1]["stage"] == "problem_solver"
+
+        events = websocket_turn(websocket, "")
+        chunk_count = names(events).count("chunk")
+        assert chunk_count > 1
+        assert names(events) == ["chunk"] * chunk_count + ["attempt", "done"]
+        assert "".join(data["text"] for _, data in events[:chunk_count]) == LLM_STEP
+
+        events = websocket_turn(websocket, "yes")
+        assert names(events) == ["complete", "done"]
+        assert events[0][1] == {"resolved": True, "escalated": False}
+
+
+def test_websocket_rejects_malformed_message(client):
+    session_id = create_session(client)
+    with client.websocket_connect(f"/sessions/{session_id}/ws") as websocket:
+        websocket.send_json({"text": "hello"})
+        message = websocket.receive_json()
+        assert message == {"event": "error", "data": {"status": 400, "error": 'Send {"input": "<text>"}'}}
+        # The connection stays usable
+        assert names(websocket_turn(websocket, SYMPTOM_SCRIPT[0])) == ["stage", "question", "done"]
@@ -0,0 +1,43 @@
+"""Error code extraction from free-text symptom answers"""
+import pytest
+from error_codes import extract_error_codes, symptom_error_codes
+from step_outcomes import symptom_signature
+
+
+@pytest.mark.parametrize("text, codes", [
+    ("E:15", ["E15"]),
+    ("Display flashes E15 after filling", ["E15"]),
+    ("F 21", ["F21"]),
+    ("e-25", ["E25"]),
+    ("error 15", ["15"]),
+    ("fault code 4C", ["4C"]),
+    ("error code E15", ["E15"]),
+])
+def test_extracts_codes(text, codes):
+    assert extract_error_codes([text]) == codes
+
+
+@pytest.mark.parametrize("text", [
+    "It stops at 5 pm",
+    "started on 3 March",
+    "in 2 days",
+    "a 20 minute cycle",
+    "A 20 minute cycle",
+    "pH 7 water",
+    "pH7 water",
+    "IT STOPS AT 5",
+    "one of 3 trays",
+    "No water comes in",
+])
+def test_ignores_plain_numbers(text):
+    assert extract_error_codes([text]) == []
+
+
+def test_symptom_codes_ignore_other_answers_noise():
+    symptoms = {1: "started on 3 March", 2: "It stops at 5 pm", 4: "E:15", 5: "a 20 minute cycle", 7: "pH 7 water"}
+    assert symptom_error_codes(symptoms) == ["E15"]
+    assert symptom_signature(symptoms) == "codes:E15"
+
+
+def test_signature_without_codes_uses_symptom_words():
+    assert symptom_signature({1: "in 2 days", 2: "No ice", 4: "none"}).startswith("text:")
@@ -0,0 +1,9 @@
+"""Import-time budget of the module the UI and API start from (IMPORT_BUDGET_MS)"""
+from benchmarks import check_import_budget
+
+
+def test_flow_manager_import_within_budget(capsys):
+    met = check_import_budget("flow_manager")
+    report = capsys.readouterr().out
+    assert met, report
+    assert "repair_engine" in report.split("Heaviest direct imports:")[1]
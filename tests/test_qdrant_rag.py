@@ -0,0 +1,76 @@
+"""QdrantRAG chunk storage and grouping against an in-process Qdrant (qdrant-client local mode)"""
+import contextlib
+import io
+from types import SimpleNamespace
+import pytest
+from qdrant_client.models import FieldCondition, Filter, MatchValue
+from loadgen import StandInEmbedder, StandInVectorStore
+from qdrant_rag import QdrantRAG
+
+MANUAL = {
+    "id": "ice-maker-1",
+    "device_model": "PRODIGY",
+    "device_name": "Scotsman Prodigy Cuber",
+    "symptoms": "no ice production after harvest",
+    "steps": [f"Step {i}: check harvest component {i}" for i in range(1, 7)],
+    "resolution": "Replace the harvest assist solenoid"
+}
+
+pytestmark = pytest.mark.filterwarnings("ignore:Payload indexes have no effect")
+
+
+@pytest.fixture
+def rag():
+    with contextlib.redirect_stdout(io.StringIO()):
+        rag = QdrantRAG()
+        rag.attach_clients(StandInVectorStore(), StandInEmbedder())
+    return rag
+
+
+def manual_points(rag, parent_id):
+    points, _ = rag.client.scroll(
+        collection_name=rag.collection_name,
+        scroll_filter=Filter(must=[FieldCondition(key="parent_id", match=MatchValue(value=parent_id))]),
+        limit=100,
+        with_payload=True
+    )
+    return points
+
+
+def test_reingest_removes_stale_chunks(rag):
+    parent_id = rag.ingest_manual(MANUAL)
+    assert len(manual_points(rag, parent_id)) == 1 + 6
+
+    rag.ingest_manual({**MANUAL, "steps": MANUAL["steps"][:3]})
+    points = manual_points(rag, parent_id)
+    assert len(points) == 1 + 3
+    assert sorted(p.payload["step_index"] for p in points if p.payload["chunk_type"] == "step") == [0, 1, 2]
+
+
+def test_step_hits_return_the_full_procedure(rag):
+    parent_id = rag.ingest_manual(MANUAL)
+    # Matches steps 5 and 2 (in that score order) and nothing else of the manual
+    points = sorted(
+        (point for point in manual_points(rag, parent_id) if point.payload.get("step_index") in (4, 1)),
+        key=lambda point: -point.payload["step_index"]
+    )
+    hits = [
+        SimpleNamespace(id=point.id, payload=point.payload, score=0.9 - rank / 10)
+        for rank, point in enumerate(points)
+    ]
+
+    solutions = rag._group_by_manual(hits, top_k=3)
+
+    assert len(solutions) == 1
+    assert solutions[0]["manual_id"] == parent_id
+    assert solutions[0]["steps"] == MANUAL["steps"]
+    assert [chunk["step_index"] for chunk in solutions[0]["chunks"]] == [4, 1]
+
+
+def test_search_ranks_manuals_and_returns_ordered_steps(rag):
+    parent_id = rag.ingest_manual(MANUAL)
+
+    solutions = rag.search_solutions("PRODIGY", "harvest component 5 no ice production", top_k=3)
+
+    assert solutions[0]["manual_id"] == parent_id
+    assert solutions[0]["steps"] == MANUAL["steps"]
@@ -0,0 +1,54 @@
+"""ResponseCache exact and semantic layers"""
+from response_cache import ResponseCache
+
+PARAMS = {"device_model": "SMS6EDI06E", "attempt_number": 1, "symptoms_summary": "no water entry"}
+
+
+def embed(text):
+    """Two-dimensional stand-in: every repair_guide text lands on the same direction"""
+    return [1.0, 0.0] if "water" in text else [0.0, 1.0]
+
+
+def test_exact_and_semantic_hits():
+    cache = ResponseCache(embed_fn=embed)
+    assert cache.get("repair_guide", PARAMS) is None
+    cache.put("repair_guide", PARAMS, "Step 1: Check the inlet valve")
+
+    assert cache.get("repair_guide", PARAMS) == "Step 1: Check the inlet valve"
+    similar = {**PARAMS, "symptoms_summary": "water does not enter"}
+    assert cache.get("repair_guide", similar) == "Step 1: Check the inlet valve"
+    # Partition fields must match exactly
+    assert cache.get("repair_guide", {**similar, "attempt_number": 2}) is None
+
+    metrics = cache.get_metrics()["repair_guide"]
+    assert (metrics["exact_hits"], metrics["semantic_hits"], metrics["misses"]) == (1, 1, 2)
+
+
+def test_semantic_scan_runs_outside_the_lock():
+    cache = ResponseCache(embed_fn=embed)
+    cache.put("repair_guide", PARAMS, "Step 1: Check the inlet valve")
+    held_during_scan = []
+
+    class Vector(list):
+        def __iter__(self):
+            held_during_scan.append(cache._lock.locked())
+            if not cache._lock.locked():
+                # Evicted by another request while this one scores
+                cache.clear()
+            return super().__iter__()
+
+    partition = next(iter(cache._vectors))
+    key = next(iter(cache._vectors[partition]))
+    cache._vectors[partition][key] = Vector(cache._vectors[partition][key])
+
+    assert cache.get("repair_guide", {**PARAMS, "symptoms_summary": "water does not enter"}) is None
+    assert held_during_scan == [False]
+
+
+def test_shared_cache_per_embedder():
+    def other_embed(text):
+        return [0.0, 1.0]
+
+    assert ResponseCache.shared(embed) is ResponseCache.shared(embed)
+    assert ResponseCache.shared(other_embed) is not ResponseCache.shared(embed)
+    assert ResponseCache.shared(other_embed).embed_fn is other_embed
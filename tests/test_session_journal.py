@@ -0,0 +1,55 @@
+"""SessionJournal bookkeeping and compaction"""
+import pytest
+from session_journal import SessionJournal
+from tests.conftest import SYMPTOM_SCRIPT
+
+
+@pytest.fixture
+def journal(engine, tmp_path):
+    journal = SessionJournal(str(tmp_path / "sessions.journal"), snapshot_every=4)
+    engine.journal = journal
+    yield journal
+    journal.close()
+
+
+def run_session(engine, inputs):
+    session = engine.new_session()
+    for user_input in inputs:
+        engine.step(session, user_input)
+    return session
+
+
+def test_completed_sessions_leave_no_snapshot_counter(engine, journal):
+    open_session = run_session(engine, SYMPTOM_SCRIPT[:3])
+    finished = run_session(engine, SYMPTOM_SCRIPT + ["", "yes"])
+
+    assert finished.session_complete
+    assert set(journal._since_snapshot) == {open_session.session_id}
+
+    journal.replay(engine)
+    assert set(journal._since_snapshot) == {open_session.session_id}
+
+
+def test_compact_drops_finished_sessions(engine, journal):
+    for _ in range(5):
+        run_session(engine, SYMPTOM_SCRIPT + ["", "no", "yes"])
+    open_session = run_session(engine, SYMPTOM_SCRIPT[:5])
+    size_before = journal._file.tell()
+
+    assert journal.compact(engine) == 1
+    assert journal._file.tell() < size_before / 5
+
+    sessions = journal.replay(engine)
+    assert list(sessions) == [open_session.session_id]
+    assert sessions[open_session.session_id].to_dict() == open_session.to_dict()
+
+
+def test_compact_of_finished_sessions_empties_journal(engine, journal):
+    for _ in range(3):
+        run_session(engine, SYMPTOM_SCRIPT + ["", "yes"])
+    size_before = journal._file.tell()
+
+    assert size_before > 0
+    assert journal.compact(engine) == 0
+    assert journal._file.tell() == 0
+    assert journal.replay(engine) == {}
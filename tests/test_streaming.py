@@ -0,0 +1,89 @@
+"""RepairEngine.stream_step and stage_events with a fake chat model"""
+import threading
+from types import SimpleNamespace
+from tests.conftest import LLM_STEP, SYMPTOM_SCRIPT
+
+
+def run_turn(engine, session, user_input):
+    stage_before = session.current_stage_index
+    chunks = list(engine.stream_step(session, user_input))
+    return chunks, engine.stage_events(session, stage_before, session.last_response)
+
+
+def test_device_turn_events(engine):
+    session = engine.new_session()
+    chunks, events = run_turn(engine, session, SYMPTOM_SCRIPT[0])
+
+    assert "".join(chunks) == session.last_response["agent_response"]
+    assert [event for event, _ in events] == ["stage", "question"]
+    assert events[0][1]["stage"] == "symptom_discovery"
+    assert events[0][1]["previous_stage"] == "device_discovery"
+    assert events[1][1]["question_number"] == 1
+    assert events[1][1]["total_questions"] == engine.SYMPTOM_QUESTIONS
+
+
+def test_symptom_turn_events(engine):
+    session = engine.new_session()
+    for user_input in SYMPTOM_SCRIPT[:-1]:
+        _, events = run_turn(engine, session, user_input)
+        assert [event for event, _ in events][-1] == "question"
+
+    _, events = run_turn(engine, session, SYMPTOM_SCRIPT[-1])
+    assert events == [("stage", {
+        "stage": "problem_solver",
+        "stage_index": 2,
+        "previous_stage": "symptom_discovery"
+    })]
+
+
+def test_llm_step_streams_token_chunks(engine):
+    session = engine.new_session()
+    for user_input in SYMPTOM_SCRIPT:
+        engine.step(session, user_input)
+
+    chunks, events = run_turn(engine, session, "")
+
+    # LLM tokens first (FakeListChatModel streams per character), then the footer
+    assert len(chunks) > 2
+    assert "".join(chunks[:-1]) == LLM_STEP
+    assert "".join(chunks) == session.last_response["agent_response"]
+    assert session.last_response["repair_step"] == LLM_STEP
+    assert events == [("attempt", {"attempt": 1, "max_attempts": engine.MAX_REPAIR_ATTEMPTS})]
+
+
+def test_chunks_arrive_before_llm_finishes(engine):
+    released = threading.Event()
+
+    class GatedChatModel:
+        """Emits one token, then waits until the consumer has received it"""
+
+        def stream(self, messages):
+            yield SimpleNamespace(content="Step 1: ")
+            # Without streaming the consumer only sees the first token after this times out
+            yield SimpleNamespace(content="Reseat the connector." if released.wait(timeout=5) else "(buffered)")
+
+    engine.task_router.stream_llm = GatedChatModel()
+    session = engine.new_session()
+    for user_input in SYMPTOM_SCRIPT:
+        engine.step(session, user_input)
+
+    chunks = engine.stream_step(session, "")
+    assert next(chunks) == "Step 1: "
+    assert not released.is_set()
+    released.set()
+    assert next(chunks) == "Reseat the connector."
+    rest = list(chunks)
+    assert rest and "Did this resolve your issue?" in rest[-1]
+
+
+def test_completion_events(engine):
+    session = engine.new_session()
+    for user_input in SYMPTOM_SCRIPT + [""]:
+        engine.step(session, user_input)
+
+    chunks, events = run_turn(engine, session, "yes")
+
+    assert "".join(chunks) == session.last_response["agent_response"]
+    assert session.session_complete
+    assert [event for event, _ in events] == ["complete"]
+    assert events[0][1] == {"resolved": True, "escalated": False}
@@ -0,0 +1,265 @@
+"""Per-turn latency tracing: spans around dependency calls, histograms and exporters"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+
+class _NoopSpan:
+    """Returned by Tracer.span() while tracing is disabled (no timing, no allocation)"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """One timed operation; spans opened inside it on the same thread become its children"""
+
+    __slots__ = ("tracer", "name", "attributes", "parent", "children", "start_ns", "end_ns",
+                 "wall_start_ns", "trace_id", "span_id")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.parent: Optional[Span] = None
+        self.children: List[Span] = []
+        self.start_ns = self.end_ns = 0
+        self.wall_start_ns = 0
+        self.trace_id = self.span_id = None
+
+    def __enter__(self) -> "Span":
+        local = self.tracer._local
+        self.parent = getattr(local, "current", None)
+        local.current = self
+        if self.parent is None:
+            self.wall_start_ns = time.time_ns()
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.end_ns = time.perf_counter_ns()
+        self.tracer._local.current = self.parent
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        if self.parent is not None:
+            self.parent.children.append(self)
+        self.tracer._finish(self)
+        return False
+
+    def set(self, **attributes):
+        """Add attributes (e.g. a result size or cache outcome) to the span"""
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self, _root_start_ns: Optional[int] = None) -> Dict:
+        """Span tree as plain data: name, start offset and duration (ms), attributes, children"""
+        root_start_ns = self.start_ns if _root_start_ns is None else _root_start_ns
+        tree = {
+            "name": self.name,
+            "start_ms": round((self.start_ns - root_start_ns) / 1e6, 3),
+            "duration_ms": round(self.duration_ms, 3)
+        }
+        if self.attributes:
+            tree["attributes"] = dict(self.attributes)
+        if self.children:
+            tree["children"] = [child.to_dict(root_start_ns) for child in self.children]
+        return tree
+
+
+class Tracer:
+    """
+    Spans around dependency calls, aggregated into per-span-name latency
+    histograms; the most recent root span trees are kept for export.
+
+    Disabled by default (TRACING_ENABLED=true): span() then returns a shared
+    no-op context manager, so instrumented code costs one attribute check.
+    Spans nest per thread; work handed to another thread starts a new trace.
+    """
+
+    # Histogram bucket upper bounds (seconds)
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    METRIC_NAME = "repair_span_duration_seconds"
+    SERVICE_NAME = "service-repair-bot"
+
+    _shared: Optional["Tracer"] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, enabled: Optional[bool] = None, keep_traces: Optional[int] = None):
+        if enabled is None:
+            enabled = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+        if keep_traces is None:
+            keep_traces = int(os.getenv("TRACING_KEEP_TRACES", "100"))
+        self.enabled = enabled
+        self.traces: Deque[Span] = deque(maxlen=keep_traces)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # span name -> [per-bucket counts (last: +Inf), sum of seconds, count]
+        self._histograms: Dict[str, List] = {}
+        self._start_ns = time.time_ns()
+
+    @classmethod
+    def shared(cls) -> "Tracer":
+        """Process-wide tracer used by the engine and its services"""
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
+
+    def span(self, name: str, **attributes):
+        """Context manager timing one operation: `with tracer.span("qdrant.search", top_k=3):`"""
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def current_span(self):
+        """Innermost open span on this thread (a no-op span when there is none)"""
+        return getattr(self._local, "current", None) or NOOP_SPAN
+
+    def _finish(self, span: Span):
+        seconds = (span.end_ns - span.start_ns) / 1e9
+        bucket = 0
+        while bucket < len(self.BUCKETS) and seconds > self.BUCKETS[bucket]:
+            bucket += 1
+        with self._lock:
+            histogram = self._histograms.get(span.name)
+            if histogram is None:
+                histogram = self._histograms[span.name] = [[0] * (len(self.BUCKETS) + 1), 0.0, 0]
+            histogram[0][bucket] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+            if span.parent is None:
+                self.traces.append(span)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self.traces.clear()
+            self._start_ns = time.time_ns()
+
+    def histograms(self) -> Dict[str, Dict]:
+        """Snapshot: span name -> {"buckets": counts per BUCKETS bound + overflow, "sum", "count"}"""
+        with self._lock:
+            return {
+                name: {"buckets": list(counts), "sum": total, "count": count}
+                for name, (counts, total, count) in sorted(self._histograms.items())
+            }
+
+    # ------------------------------------------------------------------
+    # Exporters
+    # ------------------------------------------------------------------
+
+    def prometheus_text(self) -> str:
+        """Histograms in the Prometheus text exposition format (cumulative buckets)"""
+        lines = [
+            f"# HELP {self.METRIC_NAME} Duration of traced operations by span name.",
+            f"# TYPE {self.METRIC_NAME} histogram"
+        ]
+        for name, histogram in self.histograms().items():
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(self.BUCKETS + ("+Inf",), histogram["buckets"]):
+                cumulative += count
+                lines.append(f'{self.METRIC_NAME}_bucket{{span="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.METRIC_NAME}_sum{{span="{label}"}} {histogram["sum"]:.9f}')
+            lines.append(f'{self.METRIC_NAME}_count{{span="{label}"}} {histogram["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def _resource(self) -> Dict:
+        return {"attributes": [_otlp_attribute("service.name", self.SERVICE_NAME)]}
+
+    def otlp_metrics(self) -> Dict:
+        """Histograms as an OTLP/JSON ExportMetricsServiceRequest (cumulative temporality)"""
+        now_ns = time.time_ns()
+        data_points = [{
+            "attributes": [_otlp_attribute("span", name)],
+            "startTimeUnixNano": str(self._start_ns),
+            "timeUnixNano": str(now_ns),
+            "count": str(histogram["count"]),
+            "sum": histogram["sum"],
+            "bucketCounts": [str(count) for count in histogram["buckets"]],
+            "explicitBounds": list(self.BUCKETS)
+        } for name, histogram in self.histograms().items()]
+        return {"resourceMetrics": [{
+            "resource": self._resource(),
+            "scopeMetrics": [{
+                "scope": {"name": __name__},
+                "metrics": [{
+                    "name": self.METRIC_NAME,
+                    "unit": "s",
+                    "histogram": {
+                        "aggregationTemporality": 2,  # AGGREGATION_TEMPORALITY_CUMULATIVE
+                        "dataPoints": data_points
+                    }
+                }]
+            }]
+        }]}
+
+    def otlp_traces(self) -> Dict:
+        """Recent traces as an OTLP/JSON ExportTraceServiceRequest"""
+        with self._lock:
+            roots = list(self.traces)
+        spans = []
+        for root in roots:
+            _export_span(root, root, None, spans)
+        return {"resourceSpans": [{
+            "resource": self._resource(),
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}]
+        }]}
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _export_span(span: Span, root: Span, parent_id: Optional[str], out: List[Dict]):
+    if span.span_id is None:
+        span.span_id = f"{random.getrandbits(64):016x}"
+    if root.trace_id is None:
+        root.trace_id = f"{random.getrandbits(128):032x}"
+    start_ns = root.wall_start_ns + (span.start_ns - root.start_ns)
+    out.append({
+        "traceId": root.trace_id,
+        "spanId": span.span_id,
+        "parentSpanId": parent_id or "",
+        "name": span.name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(start_ns),
+        "endTimeUnixNano": str(start_ns + span.end_ns - span.start_ns),
+        "attributes": [_otlp_attribute(k, v) for k, v in span.attributes.items()],
+        "status": {"code": 2 if "error" in span.attributes else 0}
+    })
+    for child in span.children:
+        _export_span(child, root, span.span_id, out)
+
+
+def format_trace(tree: Dict, indent: int = 0) -> str:
+    """Indented text of a Span.to_dict() tree, one span per line"""
+    attributes = " ".join(f"{k}={v}" for k, v in tree.get("attributes", {}).items())
+    lines = [f"{'  ' * indent}{tree['name']}  {tree['duration_ms']:.1f} ms  {attributes}".rstrip()]
+    for child in tree.get("children", []):
+        lines.append(format_trace(child, indent + 1))
+    return "\n".join(lines)